@@ -3,17 +3,14 @@ import os
 import platform
 import sys
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional
 
-import pandas as pd
 import typer
 from loguru import logger
 from rich import print
 
 from workbench.logging_setup import setup_logging
-from workbench.mcp_clients import context7_search, firecrawl_crawl, pages_to_dataframe
 from workbench.projects import Projects
-from workbench.warehouse import Warehouse
 
 app = typer.Typer(help="Codex Workbench: data, reports, APIs")
 warehouse_app = typer.Typer(help="Data warehouse commands")
@@ -22,17 +19,43 @@ projects_app = typer.Typer(help="Projects management commands")
 mcp_app = typer.Typer(help="MCP helper commands")
 workflow_app = typer.Typer(help="Sample end-to-end workflows")
 integrations_app = typer.Typer(help="Scaffold and manage external API clients")
+bench_app = typer.Typer(help="Warehouse benchmarks")
 
 
 @app.callback()
 def _configure(
+    ctx: typer.Context,
     verbose: int = typer.Option(
         0, "-v", "--verbose", count=True, help="Increase log verbosity (-v, -vv)"
     ),
+    profile: Optional[str] = typer.Option(
+        None,
+        "--profile",
+        help="Profile the command: cpu (cProfile), mem (tracemalloc) or both; writes to logs/",
+    ),
 ) -> None:
     """Global CLI configuration hook (logging, env, etc.)."""
     setup_logging(verbose)
     logger.debug("Logging configured (verbosity=%s)", verbose)
+    if profile:
+        _start_profiler(ctx, profile)
+
+
+def _start_profiler(ctx: typer.Context, mode: str) -> None:
+    """Profile the invoked command until the CLI context closes."""
+    from workbench.profiling import PROFILE_MODES, CommandProfiler, command_path
+
+    if mode not in PROFILE_MODES:
+        raise typer.BadParameter(f"choose from {', '.join(PROFILE_MODES)}", param_hint="--profile")
+    names = command_path(ctx.command, sys.argv[1:]) or [ctx.invoked_subcommand or "main"]
+    profiler = CommandProfiler(mode, command="_".join(names), project=Projects().current())
+    profiler.start()
+
+    def _finish() -> None:
+        for path in profiler.stop():
+            logger.info(f"Profile written: {path}")
+
+    ctx.call_on_close(_finish)
 
 
 @app.command()
@@ -172,6 +195,8 @@ def init_workspace(base: Path = Path(".")) -> None:
 @app.command("make-excel")
 def make_excel(output: Optional[Path] = None) -> None:
     """Generate a sample Excel file using pandas/openpyxl."""
+    import pandas as pd
+
     if output is None:
         pr = Projects()
         base = pr.current_root()
@@ -214,8 +239,39 @@ def main() -> None:
 # ----------------------
 
 
+def _parse_partition(partition: Optional[str]) -> Optional[Dict[str, str]]:
+    """Parse `k=v,k2=v2` into a partition dict (None when empty)."""
+    part_dict = {}
+    for pair in (partition or "").split(","):
+        if not pair:
+            continue
+        if "=" not in pair:
+            raise typer.BadParameter("Partition must be k=v pairs")
+        k, v = pair.split("=", 1)
+        part_dict[k] = v
+    return part_dict or None
+
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3}
+
+
+def _parse_size(size: str) -> int:
+    """Parse sizes like `256MB`, `1GB` or `1048576` into bytes."""
+    text = size.strip().upper().replace(" ", "")
+    num = text.rstrip("KMGB")
+    unit = text[len(num) :]
+    if not num or unit not in _SIZE_UNITS:
+        raise typer.BadParameter(f"Invalid size: {size}")
+    try:
+        return int(float(num) * _SIZE_UNITS[unit])
+    except ValueError:
+        raise typer.BadParameter(f"Invalid size: {size}")
+
+
 @warehouse_app.command("list")
 def warehouse_list() -> None:
+    from workbench.warehouse import Warehouse
+
     wh = Warehouse()
     datasets = wh.list_datasets()
     if not datasets:
@@ -223,7 +279,11 @@ def warehouse_list() -> None:
         raise typer.Exit()
     for name, ds in datasets.items():
         parts = ",".join(ds.partitioning or []) or "-"
-        logger.info(f"{name} format={ds.format} partitions={parts}")
+        st = wh.dataset_stats(name)
+        logger.info(
+            f"{name} format={ds.format} partitions={parts} "
+            f"files={st.files} rows={st.rows:,} bytes={st.bytes:,}"
+        )
 
 
 @warehouse_app.command("register")
@@ -233,6 +293,8 @@ def warehouse_register(
     partitioning: str = typer.Option("", "--partitioning", help="Comma-separated keys"),
     overwrite: bool = typer.Option(False, "--overwrite", help="Overwrite existing registration"),
 ) -> None:
+    from workbench.warehouse import Warehouse
+
     wh = Warehouse()
     parts = [p for p in (partitioning.split(",") if partitioning else []) if p]
     ds = wh.register_dataset(name, format=format, partitioning=parts, overwrite=overwrite)
@@ -248,6 +310,10 @@ def warehouse_write_sample(
     ),
     format: Optional[str] = typer.Option(None, "--format", help="Override dataset format"),
 ) -> None:
+    import pandas as pd
+
+    from workbench.warehouse import Warehouse
+
     wh = Warehouse()
     # Simple sample DataFrame
     df = pd.DataFrame(
@@ -257,16 +323,11 @@ def warehouse_write_sample(
             "note": ["sample", "sample"],
         }
     )
-    part_dict = {}
-    if partition:
-        for pair in partition.split(","):
-            if not pair:
-                continue
-            if "=" not in pair:
-                raise typer.BadParameter("Partition must be k=v pairs")
-            k, v = pair.split("=", 1)
-            part_dict[k] = v
-    path = wh.write_df(name, df, format=format, partition=part_dict or None)
+    try:
+        path = wh.write_df(name, df, format=format, partition=_parse_partition(partition))
+    except ValueError as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
     logger.success(f"Wrote sample batch: {path}")
 
 
@@ -274,9 +335,15 @@ def warehouse_write_sample(
 def warehouse_show(
     name: str = typer.Option(..., "--name", help="Dataset name"),
     limit: int = typer.Option(5, "--limit", help="Rows to show"),
+    columns: Optional[str] = typer.Option(
+        None, "--columns", help="Comma-separated columns to read (default: all)"
+    ),
 ) -> None:
+    from workbench.warehouse import Warehouse
+
     wh = Warehouse()
-    df = wh.read_df(name, limit=limit)
+    cols = [c for c in columns.split(",") if c] if columns else None
+    df = wh.read_df(name, columns=cols, limit=limit)
     if df.empty:
         logger.warning("Dataset is empty or not found.")
         raise typer.Exit()
@@ -290,10 +357,17 @@ def warehouse_sql(
     output: Optional[Path] = typer.Option(
         None, "--output", help="Save result as CSV/Parquet based on extension"
     ),
+    cache: bool = typer.Option(
+        False,
+        "--cache/--no-cache",
+        help="Reuse a stored result while the referenced files are unchanged (warehouse/cache/sql)",
+    ),
 ) -> None:
     """Run SQL against warehouse datasets using DuckDB.
 
-    Views `ds_<dataset>` are auto-created for every registered dataset.
+    Views `ds_<dataset>` are auto-created for every registered dataset. With --cache,
+    results are reused until a referenced dataset's files change; queries over other
+    sources or with volatile functions (now(), random()) always run.
     """
     try:
         from workbench.warehouse import Warehouse
@@ -301,7 +375,9 @@ def warehouse_sql(
         logger.error("Warehouse module not available")
         raise typer.Exit(code=1)
     wh = Warehouse()
-    df = wh.sql(query)
+    df = wh.sql(query, cache=cache)
+    if cache:
+        logger.info(f"SQL cache: {wh.cache_hits} hit(s), {wh.cache_misses} miss(es)")
     if limit is not None:
         df = df.head(limit)
     if output:
@@ -321,6 +397,306 @@ def warehouse_sql(
         print(df)
 
 
+@warehouse_app.command("reindex")
+def warehouse_reindex(
+    name: str = typer.Option(..., "--name", help="Dataset name"),
+) -> None:
+    """Rebuild a dataset's per-file statistics index (rows, bytes, column min/max)."""
+    from workbench.warehouse import Warehouse
+
+    wh = Warehouse()
+    try:
+        st = wh.reindex(name)
+    except KeyError as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    logger.success(f"Indexed {name}: files={st.files} rows={st.rows:,} bytes={st.bytes:,}")
+
+
+@warehouse_app.command("compact")
+def warehouse_compact(
+    name: str = typer.Option(..., "--name", help="Dataset name"),
+    partition: Optional[str] = typer.Option(
+        None, "--partition", help="Limit to a partition, k=v pairs (e.g., date=2025-01-01)"
+    ),
+    target_size: str = typer.Option("256MB", "--target-size", help="Target file size"),
+    row_group_rows: int = typer.Option(
+        131072, "--row-group-rows", help="Rows per Parquet row group"
+    ),
+) -> None:
+    """Merge small batch files of a Parquet dataset into a few large files per partition."""
+    from workbench.warehouse import Warehouse
+
+    wh = Warehouse()
+    try:
+        report = wh.compact(
+            name,
+            partition=_parse_partition(partition),
+            target_bytes=_parse_size(target_size),
+            row_group_rows=row_group_rows,
+        )
+    except (KeyError, ValueError) as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    if not report.partitions:
+        logger.info(f"Nothing to compact ({report.files_before} files already sized).")
+        return
+    logger.success(
+        f"Compacted {report.partitions} partition(s) of {name}: "
+        f"{report.files_before} files/{report.bytes_before:,} bytes -> "
+        f"{report.files_after} files/{report.bytes_after:,} bytes"
+    )
+
+
+@warehouse_app.command("dedupe")
+def warehouse_dedupe(
+    name: str = typer.Option(..., "--name", help="Dataset name"),
+    columns: str = typer.Option(
+        "title,snippet", "--columns", help="Comma-separated text columns to compare"
+    ),
+    threshold: float = typer.Option(
+        0.7, "--threshold", help="Min estimated Jaccard similarity of word pairs (0-1]"
+    ),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only count near-duplicates"),
+) -> None:
+    """Remove rows whose text near-duplicates an earlier row and rebuild the dedupe index."""
+    from workbench.warehouse import Warehouse
+
+    wh = Warehouse()
+    try:
+        report = wh.dedupe(
+            name,
+            columns=[c.strip() for c in columns.split(",") if c.strip()],
+            threshold=threshold,
+            dry_run=dry_run,
+        )
+    except (KeyError, ValueError, RuntimeError) as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    if dry_run:
+        logger.info(
+            f"{report.duplicates} near-duplicate row(s) of {report.rows} in {report.files} "
+            f"file(s) ({report.seconds:.2f}s); nothing changed."
+        )
+        return
+    logger.success(
+        f"Removed {report.removed} near-duplicate row(s) of {report.rows} from {name} "
+        f"({report.files} file(s) rewritten, {report.seconds:.2f}s)"
+    )
+
+
+@warehouse_app.command("search")
+def warehouse_search(
+    name: str = typer.Option(..., "--name", help="Dataset name"),
+    q: str = typer.Option(..., "--q", help="Words to find (all must match, stemmed)"),
+    columns: str = typer.Option(
+        "title,snippet", "--columns", help="Comma-separated text columns to index"
+    ),
+    limit: int = typer.Option(10, "--limit", help="Max rows to return"),
+    raw: bool = typer.Option(False, "--raw", help="Treat --q as an FTS5 query expression"),
+) -> None:
+    """Full-text search a dataset's text columns, best BM25 matches first."""
+    import sqlite3
+
+    from workbench.warehouse import Warehouse
+
+    wh = Warehouse()
+    try:
+        df = wh.search(
+            name,
+            q,
+            columns=[c.strip() for c in columns.split(",") if c.strip()],
+            limit=limit,
+            raw=raw,
+        )
+    except (KeyError, ValueError, sqlite3.OperationalError) as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    if df.empty:
+        logger.info("No matches.")
+        return
+    print(df)
+
+
+@warehouse_app.command("convert")
+def warehouse_convert(
+    name: str = typer.Option(..., "--name", help="Dataset name"),
+    to: str = typer.Option("parquet", "--to", help="Target format: parquet|csv|jsonl"),
+    codec: str = typer.Option(
+        "zstd", "--codec", help="Parquet codec: zstd|snappy|gzip|brotli|lz4|none"
+    ),
+    level: Optional[int] = typer.Option(None, "--level", help="Codec compression level"),
+    row_group_rows: int = typer.Option(
+        131072, "--row-group-rows", help="Rows per Parquet row group"
+    ),
+) -> None:
+    """Rewrite all files of a dataset in another format (or Parquet codec) and switch to it."""
+    from workbench.warehouse import Warehouse
+
+    wh = Warehouse()
+    try:
+        report = wh.convert(name, to=to, codec=codec, level=level, row_group_rows=row_group_rows)
+    except (KeyError, ValueError, RuntimeError) as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    ratio = report.bytes_before / report.bytes_after if report.bytes_after else 0.0
+    logger.success(
+        f"Converted {name} {report.from_format} -> {report.to_format}: "
+        f"{report.partitions} partition(s), {report.rows:,} rows; "
+        f"{report.files_before} files/{report.bytes_before:,} bytes -> "
+        f"{report.files_after} files/{report.bytes_after:,} bytes ({ratio:.1f}x smaller)"
+    )
+    logger.info(f"Full scan: {report.scan_seconds_before:.3f}s -> {report.scan_seconds_after:.3f}s")
+
+
+@warehouse_app.command("materialize")
+def warehouse_materialize(
+    name: str = typer.Option(..., "--name", help="Derived dataset name"),
+    query: str = typer.Option(..., "--query", help="DuckDB SQL over ds_<dataset> views"),
+    incremental_key: Optional[str] = typer.Option(
+        None,
+        "--incremental-key",
+        help="Ever-increasing source column (e.g., fetched_at) for incremental refresh",
+    ),
+) -> None:
+    """Register a dataset holding the result of a query and compute it."""
+    import duckdb
+
+    from workbench.warehouse import Warehouse
+
+    wh = Warehouse()
+    try:
+        report = wh.materialize(name, query, incremental_key=incremental_key)
+    except (KeyError, ValueError, RuntimeError, duckdb.Error) as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    logger.success(
+        f"Materialized {name}: {report.rows} rows from {report.files_scanned} file(s)"
+        + (f", watermark {report.watermark}" if report.watermark is not None else "")
+    )
+
+
+@warehouse_app.command("refresh")
+def warehouse_refresh(
+    name: str = typer.Option(..., "--name", help="Materialized dataset name"),
+    full: bool = typer.Option(False, "--full", help="Recompute from all source data"),
+) -> None:
+    """Update a materialized dataset with data landed since its last refresh."""
+    import duckdb
+
+    from workbench.warehouse import Warehouse
+
+    wh = Warehouse()
+    try:
+        report = wh.refresh(name, full=full)
+    except (KeyError, RuntimeError, duckdb.Error) as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    logger.success(
+        f"Refreshed {name} ({report.mode}): {report.rows} rows, "
+        f"{report.files_scanned} file(s) scanned"
+        + (f", watermark {report.watermark}" if report.watermark is not None else "")
+    )
+
+
+# ----------------------
+# Bench CLI commands
+# ----------------------
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+@bench_app.command("run")
+def bench_run(
+    rows: str = typer.Option("10000,100000", "--rows", help="Row counts (comma-separated)"),
+    files: str = typer.Option("1,8", "--files", help="Files per write (comma-separated)"),
+    fanout: str = typer.Option("1,4", "--fanout", help="Partition fan-outs (comma-separated)"),
+    formats: str = typer.Option("csv,jsonl,parquet", "--formats", help="Dataset formats"),
+    repeat: int = typer.Option(3, "--repeat", help="Runs per operation (median is kept)"),
+    seed: int = typer.Option(0, "--seed", help="Synthetic data seed"),
+    output: Optional[Path] = typer.Option(None, "--output", help="Results JSON path"),
+) -> None:
+    """Time write_df/read_df/sql/list_datasets over a synthetic sweep; write JSON results.
+
+    Each run happens in a fresh child process that reports wall time, peak RSS and
+    bytes read (Linux).
+    """
+    from datetime import datetime
+
+    from workbench.bench import Measurement, run, sweep
+
+    cases = sweep(
+        _int_list(rows), _int_list(files), _int_list(fanout), [f for f in formats.split(",") if f]
+    )
+
+    def show(m: Measurement) -> None:
+        rss = f"{m.peak_rss_mb:.0f}MB" if m.peak_rss_mb is not None else "n/a"
+        read = f"{m.bytes_read:,}B" if m.bytes_read is not None else "n/a"
+        logger.info(f"{m.case:<28} {m.op:<14} {m.wall_s * 1000:9.1f}ms  rss {rss}  read {read}")
+
+    try:
+        results = run(cases, repeat=repeat, seed=seed, progress=show)
+    except RuntimeError as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    if output is None:
+        output = Path("logs") / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    logger.success(f"Wrote {len(results['results'])} measurements: {output}")
+
+
+@bench_app.command("compare")
+def bench_compare(
+    before: Path = typer.Argument(..., help="Baseline results JSON"),
+    after: Path = typer.Argument(..., help="New results JSON"),
+    threshold: float = typer.Option(
+        0.1, "--threshold", help="Flag slowdowns/RSS growth above this fraction"
+    ),
+) -> None:
+    """Diff two `bench run` results; exits 1 when anything regressed beyond the threshold."""
+    from workbench.bench import compare, load_results
+
+    regressions = compare(load_results(before), load_results(after), threshold=threshold)
+    if not regressions:
+        logger.success(f"No regressions above {threshold:.0%}")
+        return
+    for c in regressions:
+        logger.warning(
+            f"{c.case:<28} {c.op:<14} {c.metric:<12} {c.before:.4g} -> {c.after:.4g} "
+            f"(+{c.change:.0%})"
+        )
+    logger.error(f"{len(regressions)} regression(s) above {threshold:.0%}")
+    raise typer.Exit(code=1)
+
+
+@bench_app.command("startup")
+def bench_startup(
+    budget_ms: float = typer.Option(
+        500.0, "--budget-ms", help="Max median startup time per light command"
+    ),
+    runs: int = typer.Option(5, "--runs", help="Runs per command"),
+) -> None:
+    """Time light commands (hello, projects list, --help); exits 1 when over budget."""
+    from workbench.bench import startup_times
+
+    try:
+        times = startup_times(runs=runs)
+    except RuntimeError as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    over = {cmd: ms for cmd, ms in times.items() if ms > budget_ms}
+    for cmd, ms in times.items():
+        log = logger.warning if cmd in over else logger.info
+        log(f"{cmd:<16} {ms:7.1f}ms (budget {budget_ms:.0f}ms)")
+    if over:
+        logger.error(f"{len(over)} command(s) over the startup budget")
+        raise typer.Exit(code=1)
+    logger.success("Startup within budget")
+
+
 # ----------------------
 # Projects CLI commands
 # ----------------------
@@ -388,24 +764,6 @@ def projects_context(json_out: bool = typer.Option(False, "--json")) -> None:
 # ----------------------
 
 
-def _jinja_env() -> Any:
-    from jinja2 import Environment, FileSystemLoader, select_autoescape
-
-    # Search precedence: project templates (if current) then global templates
-    loaders = []
-    pr = Projects()
-    base_dir = Path(__file__).resolve().parent
-    cur = pr.current_root()
-    if cur and (cur / "templates").exists():
-        loaders.append(str(cur / "templates"))
-    loaders.append(str(base_dir / "templates"))
-    env = Environment(
-        loader=FileSystemLoader(loaders),
-        autoescape=select_autoescape(["html", "xml"]),
-    )
-    return env
-
-
 @reports_app.command("render-html")
 def reports_render_html(
     template: str = typer.Option(
@@ -413,35 +771,182 @@ def reports_render_html(
     ),
     output: Optional[Path] = typer.Option(None, "--output", help="Output HTML path"),
     title: str = typer.Option("Codex Workbench Report", "--title"),
+    query: Optional[str] = typer.Option(
+        None, "--query", help="DuckDB SQL whose rows are streamed into the report"
+    ),
+    page_rows: Optional[int] = typer.Option(
+        None, "--page-rows", help="Split rows into numbered pages of N rows plus an index"
+    ),
 ) -> None:
+    """Render an HTML report (sample rows, or a warehouse query's result with --query).
+
+    Rows are streamed from the query cursor through the template into the output file,
+    so memory stays flat however large the result is.
+    """
     from datetime import datetime
 
-    env = _jinja_env()
-    tpl = env.get_template(template)
-    df = pd.DataFrame({"item": ["alpha", "beta", "gamma"], "value": [1, 2, 3]})
-    rows = df.to_dict(orient="records")
-    html = tpl.render(
-        title=title, generated_at=datetime.utcnow().isoformat() + "Z", table=df, rows=rows
-    )
+    import pandas as pd
+
+    from workbench.reports import render_stream
+
+    if page_rows is not None and page_rows <= 0:
+        raise typer.BadParameter("must be a positive number of rows", param_hint="--page-rows")
+    table = None
+    batches: Any
+    if query:
+        from workbench.warehouse import Warehouse
+
+        batches = Warehouse().sql_batches(query)
+    else:
+        table = pd.DataFrame({"item": ["alpha", "beta", "gamma"], "value": [1, 2, 3]})
+        batches = [table]
     pr = Projects()
     base = pr.current_root()
     out = output or (
         (base / "reports/html/sample.html") if base else Path("reports/html/sample.html")
     )
-    out.parent.mkdir(parents=True, exist_ok=True)
-    out.write_text(html, encoding="utf-8")
-    logger.success(f"Rendered HTML: {out}")
+    try:
+        pages = render_stream(
+            template,
+            batches,
+            out,
+            context={
+                "title": title,
+                "generated_at": datetime.utcnow().isoformat() + "Z",
+                "table": table,
+            },
+            page_rows=page_rows,
+        )
+    except Exception as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    if page_rows is None:
+        logger.success(f"Rendered HTML: {out}")
+    else:
+        rows = sum(p.rows for p in pages)
+        logger.success(f"Rendered {rows} rows into {len(pages)} page(s); index: {out}")
+
+
+@reports_app.command("render-batch")
+def reports_render_batch(
+    query: str = typer.Option(..., "--query", help="DuckDB SQL over ds_<dataset> views"),
+    group_by: str = typer.Option(..., "--group-by", help="Column with one report per value"),
+    template: str = typer.Option(
+        "sample.html.j2", "--template", help="Template filename under templates/"
+    ),
+    out_dir: Optional[Path] = typer.Option(
+        None, "--out-dir", help="Output directory (default: reports/html/batch)"
+    ),
+    title: str = typer.Option("Codex Workbench Report", "--title"),
+) -> None:
+    """Render one HTML report per `--group-by` value of a query result.
+
+    The template is compiled once and reused for every report; each page gets its
+    group's rows as `table`/`rows` and the group value as `key`.
+    """
+    import time
+    from datetime import datetime, timezone
+
+    from jinja2 import TemplateError
+
+    from workbench.reports import jinja_environment, render_batch, safe_filename
+    from workbench.warehouse import Warehouse
+
+    wh = Warehouse()
+    try:
+        df = wh.sql(query)
+    except Exception as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    if group_by not in df.columns:
+        raise typer.BadParameter(
+            f"not a result column; choose from {', '.join(map(str, df.columns))}",
+            param_hint="--group-by",
+        )
+    base = Projects().current_root()
+    out = out_dir or ((base / "reports/html/batch") if base else Path("reports/html/batch"))
+    jobs = (
+        (
+            out / f"{safe_filename(key)}.html",
+            {"title": f"{title} — {key}", "key": key, "table": g, "rows": g.to_dict("records")},
+        )
+        for key, g in df.groupby(group_by, sort=True)
+    )
+    start = time.perf_counter()
+    try:
+        results = render_batch(
+            template,
+            jobs,
+            env=jinja_environment(),
+            common={"generated_at": datetime.now(timezone.utc).isoformat()},
+        )
+    except TemplateError as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    logger.success(
+        f"Rendered {len(results)} report(s) into {out} in {time.perf_counter() - start:.2f}s"
+    )
 
 
 @reports_app.command("export-pdf")
 def reports_export_pdf(
     html: Optional[Path] = typer.Option(None, "--html", help="Input HTML file"),
     output: Optional[Path] = typer.Option(None, "--output", help="Output PDF path"),
+    pattern: Optional[str] = typer.Option(
+        None,
+        "--glob",
+        help="Export every matching HTML file (e.g. 'projects/*/reports/html/*.html')",
+    ),
+    workers: int = typer.Option(
+        os.cpu_count() or 1, "--workers", help="Renderer processes for --glob"
+    ),
+    force: bool = typer.Option(False, "--force", help="Re-export PDFs newer than their HTML"),
 ) -> None:
-    """Export an HTML file to PDF via WeasyPrint or pdfkit.
+    """Export HTML to PDF via WeasyPrint or pdfkit (whichever is installed, probed once).
 
+    With --glob, each `.../html/x.html` becomes `.../pdf/x.pdf` (next to the HTML
+    otherwise); PDFs newer than their HTML are skipped and the rest are converted by a
+    pool of --workers processes that load the backend once.
     Codex CLI may install `weasyprint` or `pdfkit` + system `wkhtmltopdf` as needed.
     """
+    import glob
+    import time
+
+    from workbench.pdf_export import PdfBackendMissing, export_many, export_pdf, pdf_path_for
+
+    if pattern is not None:
+        if html is not None or output is not None:
+            raise typer.BadParameter("cannot be combined with --html/--output", param_hint="--glob")
+        if workers < 1:
+            raise typer.BadParameter("must be at least 1", param_hint="--workers")
+        sources = sorted(Path(p) for p in glob.glob(pattern, recursive=True) if p.endswith(".html"))
+        if not sources:
+            logger.warning(f"No HTML files match {pattern}")
+            return
+        start = time.perf_counter()
+        counts = {"written": 0, "skipped": 0, "failed": 0}
+        try:
+            for r in export_many(
+                [(src, pdf_path_for(src)) for src in sources], workers=workers, force=force
+            ):
+                counts[r.status] += 1
+                if r.status == "written":
+                    logger.info(f"{r.pdf} ({r.seconds:.2f}s)")
+                elif r.status == "failed":
+                    logger.error(f"{r.html}: {r.error}")
+                else:
+                    logger.debug(f"Up to date: {r.pdf}")
+        except PdfBackendMissing as e:
+            logger.error(str(e))
+            raise typer.Exit(code=1)
+        logger.success(
+            f"PDFs: {counts['written']} written, {counts['skipped']} up to date, "
+            f"{counts['failed']} failed in {time.perf_counter() - start:.2f}s"
+        )
+        if counts["failed"]:
+            raise typer.Exit(code=1)
+        return
+
     pr = Projects()
     base = pr.current_root()
     if html is None:
@@ -451,29 +956,12 @@ def reports_export_pdf(
         if base
         else Path("reports/pdf/sample_from_html.pdf")
     )
-    out.parent.mkdir(parents=True, exist_ok=True)
-    try:
-        import weasyprint
-
-        pdf = weasyprint.HTML(filename=str(html)).write_pdf()
-        out.write_bytes(pdf)
-        logger.success(f"Wrote PDF via WeasyPrint: {out}")
-        return
-    except Exception:
-        pass
     try:
-        import pdfkit
-
-        pdfkit.from_file(str(html), str(out))
-        logger.success(f"Wrote PDF via pdfkit: {out}")
-        return
-    except Exception:
-        logger.error(
-            "No HTML->PDF backend available. Install one of: "
-            "`uv add weasyprint` (may need system deps) or "
-            "`uv add pdfkit` and install `wkhtmltopdf`."
-        )
+        backend = export_pdf(html, out)
+    except Exception as e:
+        logger.error(str(e))
         raise typer.Exit(code=1)
+    logger.success(f"Wrote PDF via {backend}: {out}")
 
 
 # ----------------------
@@ -507,8 +995,38 @@ def mcp_info() -> None:
 # ----------------------
 
 
+def _try_export_pdf(html: Path, out: Path) -> None:
+    """Export a rendered report to PDF if a backend is installed; warn otherwise."""
+    from workbench.pdf_export import PdfBackendMissing, export_pdf
+
+    try:
+        backend = export_pdf(html, out)
+    except PdfBackendMissing:
+        logger.warning(
+            "PDF export skipped: install `weasyprint` or `pdfkit`+`wkhtmltopdf` to enable."
+        )
+    except Exception as e:
+        logger.warning(f"PDF export failed: {e}")
+    else:
+        logger.success(f"Wrote PDF via {backend}: {out}")
+
+
+def _register_mcp_pages(wh: Any) -> None:
+    """Register `mcp_pages` as Parquet before its first write (no-op once it exists).
+
+    Both MCP workflows land Arrow tables there and `workflow mcp-bulk` can only batch
+    into Parquet, so whichever workflow runs first must not leave it as CSV.
+    """
+    wh.register_dataset("mcp_pages", format="parquet", partitioning=["date", "source"])
+
+
 @workflow_app.command("sample")
-def workflow_sample() -> None:
+def workflow_sample(
+    cache: bool = typer.Option(False, "--cache/--no-cache", help="Use the SQL result cache"),
+    page_rows: Optional[int] = typer.Option(
+        None, "--page-rows", help="Split the HTML report into pages of N rows plus an index"
+    ),
+) -> None:
     """Run a sample end-to-end workflow using current project if set.
 
     Steps:
@@ -519,6 +1037,14 @@ def workflow_sample() -> None:
     """
     from datetime import datetime, timezone
 
+    import pandas as pd
+
+    from workbench.reports import render_stream
+    from workbench.warehouse import Warehouse
+
+    if page_rows is not None and page_rows <= 0:
+        raise typer.BadParameter("must be a positive number of rows", param_hint="--page-rows")
+
     # 1) Generate data and land to warehouse
     wh = Warehouse()
     today = datetime.now(timezone.utc).date().isoformat()
@@ -529,8 +1055,11 @@ def workflow_sample() -> None:
     # 2) Run SQL aggregation
     agg = wh.sql(
         "select event, count(*) as n, sum(value) as sum_value "
-        "from ds_events_demo group by event order by event"
+        "from ds_events_demo group by event order by event",
+        cache=cache,
     )
+    if cache:
+        logger.info(f"SQL cache: {wh.cache_hits} hit(s), {wh.cache_misses} miss(es)")
 
     # Save aggregation as artifact (CSV) in project if available
     pr = Projects()
@@ -541,43 +1070,26 @@ def workflow_sample() -> None:
     logger.success(f"Saved aggregation: {art}")
 
     # 3) Render HTML + export PDF into project reports
-    env = _jinja_env()
-    tpl = env.get_template("sample.html.j2")
-    rows = agg.to_dict(orient="records")
-    html_text = tpl.render(
-        title="Sample Workflow Report",
-        generated_at=datetime.now(timezone.utc).isoformat(),
-        table=agg,
-        rows=rows,
-    )
     html_out = (base / "reports/html/workflow.html") if base else Path("reports/html/workflow.html")
-    html_out.parent.mkdir(parents=True, exist_ok=True)
-    html_out.write_text(html_text, encoding="utf-8")
+    pages = render_stream(
+        "sample.html.j2",
+        [agg],
+        html_out,
+        context={
+            "title": "Sample Workflow Report",
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "table": agg,
+        },
+        page_rows=page_rows,
+    )
     logger.success(f"Rendered HTML: {html_out}")
+    if page_rows is not None:
+        logger.info(f"PDF export skipped: report split into {len(pages)} page(s)")
+        return
 
     # Try PDF
-    try:
-        import weasyprint
-
-        pdf_bytes = weasyprint.HTML(string=html_text).write_pdf()
-        pdf_out = (base / "reports/pdf/workflow.pdf") if base else Path("reports/pdf/workflow.pdf")
-        pdf_out.parent.mkdir(parents=True, exist_ok=True)
-        pdf_out.write_bytes(pdf_bytes)
-        logger.success(f"Wrote PDF via WeasyPrint: {pdf_out}")
-    except Exception:
-        try:
-            import pdfkit
-
-            pdf_out = (
-                (base / "reports/pdf/workflow.pdf") if base else Path("reports/pdf/workflow.pdf")
-            )
-            pdf_out.parent.mkdir(parents=True, exist_ok=True)
-            pdfkit.from_string(html_text, str(pdf_out))
-            logger.success(f"Wrote PDF via pdfkit: {pdf_out}")
-        except Exception:
-            logger.warning(
-                "PDF export skipped: install `weasyprint` or `pdfkit`+`wkhtmltopdf` to enable."
-            )
+    pdf_out = (base / "reports/pdf/workflow.pdf") if base else Path("reports/pdf/workflow.pdf")
+    _try_export_pdf(html_out, pdf_out)
 
 
 @workflow_app.command("mcp-web")
@@ -585,42 +1097,123 @@ def workflow_mcp_web(
     url: str = typer.Option(..., "--url", help="Seed URL to crawl with Firecrawl"),
     limit: int = typer.Option(5, "--limit", help="Max pages to collect"),
     query: Optional[str] = typer.Option(None, "--c7-query", help="Optional Context7 search query"),
+    cache_mode: str = typer.Option(
+        "use",
+        "--cache-mode",
+        help="API cache for finished crawls and Context7 searches: use (replay/revalidate), "
+        "refresh (refetch and overwrite), off",
+    ),
+    dedupe: str = typer.Option(
+        "skip",
+        "--dedupe",
+        help="Near-duplicate pages: skip (don't land), flag (land, record match), off",
+    ),
 ) -> None:
     """MCP-backed workflow: crawl via Firecrawl and optionally search via Context7.
 
-    - Writes crawled pages to warehouse dataset `mcp_pages` partitioned by date/source.
+    - Writes crawled pages to warehouse dataset `mcp_pages` (Parquet, partitioned by
+      date/source), one file per batch as the crawl job returns them. Progress is kept in
+      `<project>/state/`, so rerunning after a crash resumes the crawl.
+    - Pages whose title/snippet near-duplicate an already landed page are skipped (or
+      only recorded with `--dedupe flag`) using `warehouse/dedupe/mcp_pages.sqlite`.
     - Renders an HTML report (and tries to export PDF) under the current project.
+    - Finished crawls and Context7 responses are cached under `warehouse/cache/http/`;
+      repeating a crawl of the same URL and limit within a day replays the cached pages
+      without starting a Firecrawl job (see `--cache-mode`).
     """
+    import asyncio
+    import hashlib
     from datetime import datetime, timezone
 
+    from workbench.dedupe import DEDUPE_MODES, NearDupIndex, dedupe_pages, index_path
+    from workbench.http_cache import CACHE_MODES, ResponseCache
+    from workbench.mcp_clients import (
+        Context7Doc,
+        CrawledPage,
+        context7_search_async,
+        firecrawl_crawl_batches_async,
+        pages_to_table,
+    )
+    from workbench.reports import jinja_environment
+    from workbench.transport import HttpSession
+    from workbench.warehouse import Warehouse
+
+    if cache_mode not in CACHE_MODES:
+        raise typer.BadParameter(f"choose from {', '.join(CACHE_MODES)}", param_hint="--cache-mode")
+    if dedupe not in DEDUPE_MODES:
+        raise typer.BadParameter(f"choose from {', '.join(DEDUPE_MODES)}", param_hint="--dedupe")
     today = datetime.now(timezone.utc).date().isoformat()
-
-    # 1) Firecrawl crawl
-    pages = firecrawl_crawl(url, limit=limit)
-    df = pages_to_dataframe(pages)
     wh = Warehouse()
-    if not df.empty:
-        p = wh.write_df("mcp_pages", df, partition={"date": today, "source": "firecrawl"})
-        logger.success(f"Landed Firecrawl pages: {p}")
+    _register_mcp_pages(wh)
+    base = Projects().current_root()
+    state_dir = (base / "state") if base else Path("state")
+    cursor_path = state_dir / f"firecrawl_{hashlib.sha256(url.encode()).hexdigest()[:16]}.json"
+    report_max_pages = 200  # the report lists the first pages; the dataset has all of them
+    pages: List[CrawledPage] = []
+    landed = 0
+
+    # 1) Stream the Firecrawl crawl into the warehouse while Context7 is searched concurrently
+    async def fetch() -> List[Context7Doc]:
+        nonlocal landed
+        cache = ResponseCache(wh.base_path / "cache" / "http")
+        session = HttpSession(cache=cache, cache_mode=cache_mode)
+        search = (
+            asyncio.ensure_future(context7_search_async(query, limit=limit, session=session))
+            if query
+            else None
+        )
+        try:
+            async for batch in firecrawl_crawl_batches_async(
+                url, limit=limit, session=session, cursor_path=cursor_path
+            ):
+                batch, seen = await asyncio.to_thread(dedupe_pages, index, batch, dedupe)
+                if not batch:
+                    index.commit(seen)
+                    continue
+                path = await asyncio.to_thread(
+                    wh.write_arrow,
+                    "mcp_pages",
+                    pages_to_table(batch),
+                    partition={"date": today, "source": "firecrawl"},
+                )
+                # pages are landed: index them before the crawl cursor moves past them
+                await asyncio.to_thread(index.commit, seen)
+                landed += len(batch)
+                pages.extend(batch[: report_max_pages - len(pages)])
+                logger.info(f"Landed {len(batch)} Firecrawl pages ({landed} total): {path}")
+            return await search if search else []
+        finally:
+            if search is not None:
+                # a failed crawl must not leave the search running (or its error unread)
+                # while the session closes
+                search.cancel()
+                await asyncio.gather(search, return_exceptions=True)
+            await session.aclose()
+            session.log_stats()
+
+    with NearDupIndex(index_path(wh.base_path, "mcp_pages")) as index:
+        c7_docs = asyncio.run(fetch())
+
+    # 2) Land the Context7 results
+    if landed:
+        logger.success(f"Landed {landed} Firecrawl pages into mcp_pages")
     else:
         logger.warning("No Firecrawl pages collected.")
-
-    # 2) Optional Context7 search
-    c7_docs = []
     if query:
-        c7_docs = context7_search(query, limit=limit)
         if c7_docs:
-            df_c7 = pd.DataFrame([d.model_dump() for d in c7_docs])
-            p2 = wh.write_df("mcp_pages", df_c7, partition={"date": today, "source": "context7"})
+            import pyarrow as pa
+
+            tbl_c7 = pa.Table.from_pylist([d.model_dump() for d in c7_docs])
+            p2 = wh.write_arrow(
+                "mcp_pages", tbl_c7, partition={"date": today, "source": "context7"}
+            )
             logger.success(f"Landed Context7 docs: {p2}")
         else:
             logger.warning("No Context7 results.")
 
     # 3) Render a combined report at project path
-    env = _jinja_env()
+    env = jinja_environment()
     tpl = env.get_template("mcp_report.html.j2")
-    pr = Projects()
-    base = pr.current_root()
     html_out = (
         (base / "reports/html/mcp_report.html") if base else Path("reports/html/mcp_report.html")
     )
@@ -630,26 +1223,144 @@ def workflow_mcp_web(
         generated_at=datetime.now(timezone.utc).isoformat(),
         url=url,
         pages=[p.model_dump() for p in pages],
+        pages_total=landed,
         context7=[d.model_dump() for d in c7_docs],
     )
     html_out.write_text(html_text, encoding="utf-8")
     logger.success(f"Rendered MCP HTML: {html_out}")
 
     # Try PDF export
+    pdf_out = (base / "reports/pdf/mcp_report.pdf") if base else Path("reports/pdf/mcp_report.pdf")
+    _try_export_pdf(html_out, pdf_out)
+
+
+@workflow_app.command("mcp-bulk")
+def workflow_mcp_bulk(
+    seeds: Path = typer.Option(..., "--seeds", help="File with one seed URL per line"),
+    concurrency: int = typer.Option(8, "--concurrency", help="Seeds crawled at the same time"),
+    limit: int = typer.Option(5, "--limit", help="Max pages to collect per seed"),
+    cache_mode: str = typer.Option(
+        "use",
+        "--cache-mode",
+        help="API cache for finished crawls and Context7 searches: use (replay/revalidate), "
+        "refresh (refetch and overwrite), off",
+    ),
+    dedupe: str = typer.Option(
+        "skip",
+        "--dedupe",
+        help="Near-duplicate pages: skip (don't land), flag (land, record match), off",
+    ),
+) -> None:
+    """Crawl many seeds with Firecrawl in one process and land the pages in `mcp_pages`.
+
+    - Seeds are normalized and de-duplicated; blank lines and `#` comments are skipped.
+    - `--concurrency` workers share one pooled, rate-limited HTTP session.
+    - Pages are buffered into large Parquet files (`mcp_pages` must be Parquet; see
+      `warehouse convert`) under `date=<today>/source=firecrawl`.
+    - Near-duplicate pages are skipped or flagged as in `workflow mcp-web`, and seeds
+      crawled within the last day are replayed from the cache (see `--cache-mode`).
+    - Per-seed timing, page counts and failures go to `logs/mcp_bulk_<stamp>.jsonl`
+      (under the current project); the command fails only if every seed failed.
+    """
+    import asyncio
+    import logging
+    import threading
+    from datetime import datetime, timezone
+
+    from workbench.bulk_crawl import crawl_seeds, read_seeds, summarize
+    from workbench.dedupe import (
+        DEDUPE_MODES,
+        NearDupIndex,
+        PendingBatch,
+        dedupe_pages,
+        index_path,
+    )
+    from workbench.http_cache import CACHE_MODES, ResponseCache
+    from workbench.mcp_clients import CrawledPage, pages_to_table
+    from workbench.transport import HttpSession
+    from workbench.warehouse import Warehouse
+
+    if cache_mode not in CACHE_MODES:
+        raise typer.BadParameter(f"choose from {', '.join(CACHE_MODES)}", param_hint="--cache-mode")
+    if dedupe not in DEDUPE_MODES:
+        raise typer.BadParameter(f"choose from {', '.join(DEDUPE_MODES)}", param_hint="--dedupe")
+    if concurrency < 1:
+        raise typer.BadParameter("must be at least 1", param_hint="--concurrency")
     try:
-        import weasyprint
+        seed_list = read_seeds(seeds)
+    except OSError as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+    for bad in seed_list.invalid:
+        logger.warning(f"Skipping invalid seed: {bad}")
+    logger.info(
+        f"{len(seed_list.seeds)} unique seeds ({seed_list.duplicates} duplicates, "
+        f"{len(seed_list.invalid)} invalid)"
+    )
+    if not seed_list.seeds:
+        return
 
-        pdf_bytes = weasyprint.HTML(string=html_text).write_pdf()
-        pdf_out = (
-            (base / "reports/pdf/mcp_report.pdf") if base else Path("reports/pdf/mcp_report.pdf")
+    # one log line per request drowns thousands of seeds (and costs time on the event loop)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    now = datetime.now(timezone.utc)
+    base = Projects().current_root()
+    run_log = (base or Path(".")) / "logs" / f"mcp_bulk_{now.strftime('%Y%m%d_%H%M%S')}.jsonl"
+    wh = Warehouse()
+    _register_mcp_pages(wh)
+    try:
+        writer = wh.writer(
+            "mcp_pages", partition={"date": now.date().isoformat(), "source": "firecrawl"}
         )
-        pdf_out.parent.mkdir(parents=True, exist_ok=True)
-        pdf_out.write_bytes(pdf_bytes)
-        logger.success(f"Wrote MCP PDF via WeasyPrint: {pdf_out}")
-    except Exception:
-        logger.warning(
-            "PDF export skipped: install `weasyprint` or `pdfkit`+`wkhtmltopdf` to enable."
+    except (ValueError, RuntimeError) as e:
+        logger.error(str(e))
+        raise typer.Exit(code=1)
+
+    # dedupe signatures are committed only once their pages sit in a finalized file
+    appended: List[PendingBatch] = []
+    sink_lock = threading.Lock()
+
+    def sink(seed: str, pages: List[CrawledPage]) -> None:
+        pages, seen = dedupe_pages(index, pages, dedupe)
+        with sink_lock:
+            files = len(writer.paths)
+            if pages:
+                writer.append(pages_to_table(pages))
+            if seen is not None:
+                appended.append(seen)
+            if len(writer.paths) > files:  # a flush finalized everything appended so far
+                for pending in appended:
+                    index.commit(pending)
+                appended.clear()
+
+    async def run() -> Any:
+        session = HttpSession(
+            cache=ResponseCache(wh.base_path / "cache" / "http"), cache_mode=cache_mode
         )
+        try:
+            return await crawl_seeds(
+                seed_list.seeds,
+                sink,
+                limit=limit,
+                concurrency=concurrency,
+                session=session,
+                run_log=run_log,
+            )
+        finally:
+            await session.aclose()
+            session.log_stats()
+
+    with NearDupIndex(index_path(wh.base_path, "mcp_pages")) as index:
+        with writer:
+            results = asyncio.run(run())
+        for pending in appended:  # closing the index drops them if the writer failed
+            index.commit(pending)
+    ok, failed, pages = summarize(results)
+    logger.success(
+        f"Crawled {ok} seeds ({failed} failed), {pages} pages; landed {writer.rows_written} "
+        f"in {len(writer.paths)} file(s); run log: {run_log}"
+    )
+    if failed and not ok:
+        raise typer.Exit(code=1)
 
 
 @workflow_app.command("first-project")
@@ -679,12 +1390,14 @@ def workflow_first_project(
     logger.success(f"Project ready: {name}")
 
     # Run the standard sample workflow (project-aware paths already used by commands)
-    workflow_sample()
+    workflow_sample(cache=False, page_rows=None)
 
     # Optional MCP step
     if include_mcp and os.getenv("FIRECRAWL_API_KEY"):
         try:
-            workflow_mcp_web(url="https://example.com", limit=3, query=None)
+            workflow_mcp_web(
+                url="https://example.com", limit=3, query=None, cache_mode="use", dedupe="skip"
+            )
         except Exception:
             logger.warning("Skipping MCP web step due to errors.")
 
@@ -696,6 +1409,7 @@ app.add_typer(projects_app, name="projects")
 app.add_typer(mcp_app, name="mcp")
 app.add_typer(workflow_app, name="workflow")
 app.add_typer(integrations_app, name="integrations")
+app.add_typer(bench_app, name="bench")
 
 
 if __name__ == "__main__":
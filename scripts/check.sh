@@ -10,5 +10,8 @@ uv run ruff check . --fix
 echo "[check] Running mypy..."
 uv run mypy --config-file mypy.ini .
 
+echo "[check] Checking CLI startup budget..."
+uv run python main.py bench startup --budget-ms 500
+
 echo "[check] OK"
 
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import unittest
+from typing import Callable, List
+
+import httpx
+
+from workbench.transport import HttpSession
+
+URL = "https://api.example.com/v1/crawl"
+
+
+def session(handler: Callable[[httpx.Request], httpx.Response], calls: List[str]) -> HttpSession:
+    def record(request: httpx.Request) -> httpx.Response:
+        calls.append(request.method)
+        return handler(request)
+
+    return HttpSession(transport=httpx.MockTransport(record), rate=100, max_attempts=2)
+
+
+def fail(exc: type[httpx.TransportError]) -> Callable[[httpx.Request], httpx.Response]:
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise exc("boom", request=request)
+
+    return handler
+
+
+class RetryTest(unittest.TestCase):
+    def test_post_is_not_resent_after_a_server_error(self) -> None:
+        calls: List[str] = []
+        sess = session(lambda r: httpx.Response(503), calls)
+        self.assertEqual(sess.request("POST", URL).status_code, 503)
+        self.assertEqual(calls, ["POST"])
+        self.assertEqual(sum(st.errors for st in sess.stats().values()), 1)
+
+    def test_post_is_not_resent_after_a_read_timeout(self) -> None:
+        calls: List[str] = []
+        sess = session(fail(httpx.ReadTimeout), calls)
+        with self.assertRaises(httpx.ReadTimeout):
+            sess.request("POST", URL)
+        self.assertEqual(calls, ["POST"])
+        self.assertEqual(sum(st.errors for st in sess.stats().values()), 1)
+
+    def test_post_is_retried_when_it_never_connected(self) -> None:
+        calls: List[str] = []
+        with self.assertRaises(httpx.ConnectError):
+            session(fail(httpx.ConnectError), calls).request("POST", URL)
+        self.assertEqual(calls, ["POST", "POST"])
+
+    def test_post_is_retried_on_429(self) -> None:
+        calls: List[str] = []
+        responses = [httpx.Response(429), httpx.Response(200, json={"id": "x"})]
+        sess = session(lambda r: responses.pop(0), calls)
+        self.assertEqual(sess.request("POST", URL).status_code, 200)
+        self.assertEqual(calls, ["POST", "POST"])
+
+    def test_get_is_retried_on_server_errors_and_timeouts(self) -> None:
+        calls: List[str] = []
+        self.assertEqual(
+            session(lambda r: httpx.Response(503), calls).request("GET", URL).status_code, 503
+        )
+        with self.assertRaises(httpx.ReadTimeout):
+            session(fail(httpx.ReadTimeout), calls).request("GET", URL)
+        self.assertEqual(calls, ["GET"] * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import threading
+import unittest
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Generator, List, cast
+from unittest import mock
+
+import pandas as pd
+
+from workbench.warehouse import Warehouse, _hive_partition, _partition_value
+
+DAYS = ("2025-01-01", "2025-01-02", "2025-01-03")
+
+
+class WarehouseTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.wh = Warehouse(Path(self._tmp.name) / "warehouse")
+
+    def tearDown(self) -> None:
+        self.wh.close()
+        self._tmp.cleanup()
+
+
+class PartitionListingTest(WarehouseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        for day in DAYS:
+            self.wh.write_df(
+                "events", pd.DataFrame({"n": [1, 2]}), format="parquet", partition={"date": day}
+            )
+
+    def listed(self, read: Callable[[], Any]) -> List[str]:
+        """Names of the dataset directories `read` lists."""
+        names: List[str] = []
+        scandir = os.scandir
+
+        def spy(path: Any) -> Any:
+            names.append(Path(path).name)
+            return scandir(path)
+
+        with mock.patch("workbench.warehouse.os.scandir", side_effect=spy):
+            read()
+        return names
+
+    def test_read_df_lists_only_matching_partitions(self) -> None:
+        frames: List[pd.DataFrame] = []
+        names = self.listed(
+            lambda: frames.append(self.wh.read_df("events", filters=[("date", "=", DAYS[1])]))
+        )
+        self.assertEqual(len(frames[0]), 2)
+        self.assertEqual(set(frames[0]["date"]), {DAYS[1]})
+        self.assertIn(f"date={DAYS[1]}", names)
+        self.assertNotIn(f"date={DAYS[0]}", names)
+        self.assertNotIn(f"date={DAYS[2]}", names)
+
+    def test_read_df_range_filter_prunes_directories(self) -> None:
+        names = self.listed(lambda: self.wh.read_df("events", filters=[("date", ">=", DAYS[1])]))
+        self.assertEqual(
+            sorted(n for n in names if n.startswith("date=")), [f"date={d}" for d in DAYS[1:]]
+        )
+
+    def test_sql_lists_only_matching_partitions(self) -> None:
+        results: List[pd.DataFrame] = []
+        names = self.listed(
+            lambda: results.append(
+                self.wh.sql(f"SELECT count(*) AS n FROM ds_events WHERE date = '{DAYS[2]}'")
+            )
+        )
+        self.assertEqual(int(results[0]["n"][0]), 2)
+        self.assertIn(f"date={DAYS[2]}", names)
+        self.assertNotIn(f"date={DAYS[0]}", names)
+        self.assertNotIn(f"date={DAYS[1]}", names)
+
+    def test_sql_without_matching_partition_returns_no_rows(self) -> None:
+        df = self.wh.sql("SELECT count(*) AS n FROM ds_events WHERE date = '2024-12-31'")
+        self.assertEqual(int(df["n"][0]), 0)
+
+    def test_sql_keeps_partitions_the_typed_comparison_may_match(self) -> None:
+        # DuckDB reads the hive column as DATE, so '2025-1-2' still means 2025-01-02
+        df = self.wh.sql("SELECT count(*) AS n FROM ds_events WHERE date = '2025-1-2'")
+        self.assertEqual(int(df["n"][0]), 2)
+
+
+class PartitionValueTest(WarehouseTestCase):
+    def test_datetime_partitions_round_trip_without_colons(self) -> None:
+        when = [
+            datetime(2025, 1, 1, 9, 30, tzinfo=timezone.utc),
+            datetime(2025, 1, 1, 9, 30, 15, 250000, tzinfo=timezone.utc),
+        ]
+        self.wh.write_df("events", pd.DataFrame({"when": when, "v": [1, 2]}), partition_by=["when"])
+        root = self.wh.dataset_dir("events")
+        parsed = []
+        for path in root.glob("when=*/*"):
+            raw = _hive_partition(path.relative_to(root))["when"]
+            self.assertNotIn(":", raw)
+            parsed.append(datetime.fromisoformat(raw))
+        self.assertEqual(sorted(parsed), when)
+
+    def test_dates_stay_iso(self) -> None:
+        self.assertEqual(_partition_value(date(2025, 1, 1)), "2025-01-01")
+
+
+class DatasetWriterTest(WarehouseTestCase):
+    def test_null_first_column_gets_its_type_later(self) -> None:
+        with self.wh.writer("rows", flush_rows=1) as w:
+            w.append([{"a": 1, "b": None}])
+            w.append([{"a": 2, "b": "x"}])
+        self.assertEqual(len(w.paths), 2)  # the null-typed file was finished, not cast into
+        df = self.wh.sql("SELECT a, b FROM ds_rows ORDER BY a")
+        self.assertEqual(df["b"].tolist(), [None, "x"])
+
+    def test_int_column_widens_to_float(self) -> None:
+        with self.wh.writer("rows", flush_rows=1) as w:
+            w.append([{"a": 1}])
+            w.append([{"a": 2.5}])
+        self.assertEqual(sorted(self.wh.read_df("rows")["a"]), [1.0, 2.5])
+
+    def test_incompatible_types_raise_and_leave_no_partial_file(self) -> None:
+        with self.assertRaises(ValueError):
+            with self.wh.writer("rows", flush_rows=1) as w:
+                w.append([{"a": 1}])
+                w.append([{"a": "x"}])
+        self.assertEqual(list(self.wh.dataset_dir("rows").glob("*.tmp")), [])
+
+
+class MaintenanceLockTest(WarehouseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        for n in range(3):
+            self.wh.write_df("events", pd.DataFrame({"n": [n]}), format="parquet")
+        self.files = sorted(p.name for p in self.wh.dataset_dir("events").iterdir())
+
+    def assert_untouched(self) -> None:
+        self.assertEqual(
+            sorted(p.name for p in self.wh.dataset_dir("events").iterdir()), self.files
+        )
+
+    def test_compact_fails_before_rewriting_while_this_thread_reads(self) -> None:
+        reader = cast(Generator[Any, None, None], self.wh.iter_batches("events", batch_rows=1))
+        next(reader)
+        with mock.patch("workbench.warehouse._write_parquet_files") as write:
+            with self.assertRaises(RuntimeError):
+                self.wh.compact("events")
+        write.assert_not_called()
+        reader.close()
+        self.assert_untouched()
+
+    def test_failed_swap_removes_rewritten_files(self) -> None:
+        started, release = threading.Event(), threading.Event()
+
+        def read_in_other_thread() -> None:
+            reader = cast(Generator[Any, None, None], self.wh.iter_batches("events", batch_rows=1))
+            next(reader)
+            started.set()
+            release.wait(10)
+            reader.close()
+
+        thread = threading.Thread(target=read_in_other_thread)
+        thread.start()
+        started.wait(10)
+        try:
+            with mock.patch("workbench.warehouse.IN_PROCESS_LOCK_WAIT_S", 0.1):
+                with self.assertRaises(RuntimeError):
+                    self.wh.compact("events")
+                with self.assertRaises(RuntimeError):
+                    self.wh.convert("events", to="csv")
+                with self.assertRaises(RuntimeError):
+                    self.wh.drop_rows(
+                        "events", {self.wh.dataset_dir("events") / self.files[0]: [0]}
+                    )
+            self.assert_untouched()
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(len(self.wh.read_df("events")), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import itertools
+import json
+import multiprocessing
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+BENCH_DATASET = "bench"
+OPERATIONS = ("write_df", "read_df", "read_df_limit", "sql_agg", "list_datasets")
+DEFAULT_ROWS = (10_000, 100_000)
+DEFAULT_FILES = (1, 8)
+DEFAULT_FANOUT = (1, 4)
+DEFAULT_FORMATS = ("csv", "jsonl", "parquet")
+LIST_DATASETS_CALLS = 100
+SQL_AGG = "select event, count(*) as n, sum(value) as total from ds_bench group by event"
+# commands that must not import the data stack; `bench startup` keeps them under budget
+LIGHT_COMMANDS = (("hello",), ("projects", "list"), ("--help",))
+MAIN_SCRIPT = Path(__file__).resolve().parent.parent / "main.py"
+
+
+@dataclass(frozen=True)
+class BenchCase:
+    rows: int
+    files: int
+    fanout: int
+    format: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.format}-r{self.rows}-f{self.files}-p{self.fanout}"
+
+
+@dataclass
+class Measurement:
+    case: str
+    op: str
+    wall_s: float
+    peak_rss_mb: Optional[float]
+    bytes_read: Optional[int]
+    runs: List[float] = field(default_factory=list)
+
+
+def sweep(
+    rows: List[int], files: List[int], fanout: List[int], formats: List[str]
+) -> List[BenchCase]:
+    return [BenchCase(*combo) for combo in itertools.product(rows, files, fanout, formats)]
+
+
+def synthetic_frame(rows: int, fanout: int, seed: int) -> Any:
+    """Deterministic event-like frame; `part` takes `fanout` distinct values."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "id": np.arange(rows, dtype="int64"),
+            "event": rng.choice([f"event_{i}" for i in range(8)], rows),
+            "value": rng.random(rows),
+            "ts": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 86_400, rows), "s"),
+            "part": rng.integers(0, fanout, rows).astype(str),
+        }
+    )
+
+
+def _read_bytes() -> Optional[int]:
+    """Bytes read by this process so far (`rchar` of /proc/self/io; Linux only)."""
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _write(case: BenchCase, root: Path, seed: int) -> Callable[[], Any]:
+    from .warehouse import Warehouse
+
+    wh = Warehouse(root)
+    wh.register_dataset(BENCH_DATASET, format=case.format, partitioning=["part"])
+    chunks = [
+        synthetic_frame(case.rows // case.files, case.fanout, seed + i) for i in range(case.files)
+    ]
+    return lambda: [wh.write_df(BENCH_DATASET, df, partition_by=["part"]) for df in chunks]
+
+
+def _operation(op: str, case: BenchCase, root: Path, seed: int) -> Callable[[], Any]:
+    """Prepare `op` (outside the timed region) and return the call to time."""
+    if op == "write_df":
+        return _write(case, root, seed)
+    from .warehouse import Warehouse
+
+    wh = Warehouse(root)
+    if op == "read_df":
+        return lambda: wh.read_df(BENCH_DATASET)
+    if op == "read_df_limit":
+        return lambda: wh.read_df(BENCH_DATASET, limit=100)
+    if op == "sql_agg":
+        return lambda: wh.sql(SQL_AGG)
+    if op == "list_datasets":
+        return lambda: [wh.list_datasets() for _ in range(LIST_DATASETS_CALLS)]
+    raise ValueError(f"Unknown benchmark operation: {op}")
+
+
+def _child(op: str, case: BenchCase, root: str, seed: int, conn: Any) -> None:
+    """Run one timed operation in a fresh interpreter and report through `conn`."""
+    try:
+        call = _operation(op, case, Path(root), seed)
+        before = _read_bytes()
+        start = time.perf_counter()
+        call()
+        wall = time.perf_counter() - start
+        after = _read_bytes()
+        read = after - before if before is not None and after is not None else None
+        conn.send({"wall_s": wall, "peak_rss_mb": _peak_rss_mb(), "bytes_read": read})
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def _measure_once(op: str, case: BenchCase, root: Path, seed: int) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(op, case, str(root), seed, child))
+    proc.start()
+    child.close()
+    result: Dict[str, Any] = parent.recv() if parent.poll(3600) else {"error": "timed out"}
+    proc.join()
+    if "error" in result:
+        raise RuntimeError(f"{case.key} {op}: {result['error']}")
+    return result
+
+
+def run_case(
+    case: BenchCase, workdir: Path, *, repeat: int = 3, seed: int = 0
+) -> List[Measurement]:
+    """Time every operation for `case`; each run happens in its own child process.
+
+    The write is repeated into fresh warehouses; reads use the last written one.
+    Wall time is the median of `repeat` runs, peak RSS the maximum.
+    """
+    out = []
+    root = workdir
+    for op in OPERATIONS:
+        runs = []
+        for i in range(repeat):
+            if op == "write_df":
+                root = workdir / f"{case.key}-{i}"
+            runs.append(_measure_once(op, case, root, seed))
+        rss = [r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None]
+        read = [r["bytes_read"] for r in runs if r["bytes_read"] is not None]
+        out.append(
+            Measurement(
+                case=case.key,
+                op=op,
+                wall_s=statistics.median(r["wall_s"] for r in runs),
+                peak_rss_mb=max(rss) if rss else None,
+                bytes_read=int(statistics.median(read)) if read else None,
+                runs=[r["wall_s"] for r in runs],
+            )
+        )
+    return out
+
+
+def run(
+    cases: List[BenchCase],
+    *,
+    repeat: int = 3,
+    seed: int = 0,
+    workdir: Optional[Path] = None,
+    progress: Optional[Callable[[Measurement], None]] = None,
+) -> Dict[str, Any]:
+    """Run the sweep and return a JSON-serializable results document."""
+    results: List[Measurement] = []
+    with tempfile.TemporaryDirectory(prefix="wb-bench-", dir=workdir) as tmp:
+        for case in cases:
+            for m in run_case(case, Path(tmp), repeat=repeat, seed=seed):
+                results.append(m)
+                if progress:
+                    progress(m)
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": [asdict(m) for m in results],
+    }
+
+
+@dataclass
+class Comparison:
+    case: str
+    op: str
+    metric: str
+    before: float
+    after: float
+
+    @property
+    def change(self) -> float:
+        return (self.after - self.before) / self.before if self.before else 0.0
+
+
+def compare(
+    before: Dict[str, Any], after: Dict[str, Any], *, threshold: float = 0.1
+) -> List[Comparison]:
+    """Wall time / peak RSS changes of `after` vs `before` that exceed `threshold` (0.1=10%).
+
+    Positive `change` is a regression; operations present in only one file are ignored.
+    """
+    old = {(r["case"], r["op"]): r for r in before.get("results", [])}
+    flagged = []
+    for r in after.get("results", []):
+        prev = old.get((r["case"], r["op"]))
+        if prev is None:
+            continue
+        for metric in ("wall_s", "peak_rss_mb"):
+            a, b = prev.get(metric), r.get(metric)
+            if a is None or b is None:
+                continue
+            c = Comparison(r["case"], r["op"], metric, float(a), float(b))
+            if c.change > threshold:
+                flagged.append(c)
+    return flagged
+
+
+def startup_times(
+    commands: Sequence[Sequence[str]] = LIGHT_COMMANDS,
+    *,
+    runs: int = 5,
+    script: Path = MAIN_SCRIPT,
+) -> Dict[str, float]:
+    """Median wall time in milliseconds of `python main.py <command>` for each command.
+
+    Commands run in a scratch directory so workspace files they create are discarded.
+    """
+    times: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory(prefix="wb-startup-") as cwd:
+        for cmd in commands:
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                proc = subprocess.run(
+                    [sys.executable, str(script), *cmd], capture_output=True, text=True, cwd=cwd
+                )
+                samples.append((time.perf_counter() - start) * 1000)
+                if proc.returncode != 0:
+                    raise RuntimeError(f"`{' '.join(cmd)}` exited {proc.returncode}: {proc.stderr}")
+            times[" ".join(cmd)] = statistics.median(samples)
+    return times
+
+
+def load_results(path: Path) -> Dict[str, Any]:
+    return dict(json.loads(path.read_text(encoding="utf-8")))
+
+
+__all__ = [
+    "BenchCase",
+    "Comparison",
+    "Measurement",
+    "compare",
+    "load_results",
+    "run",
+    "run_case",
+    "startup_times",
+    "sweep",
+    "synthetic_frame",
+]
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from loguru import logger
+
+from .mcp_clients import CrawledPage, firecrawl_crawl_batches_async, normalize_url
+from .transport import HttpSession
+
+DEFAULT_CONCURRENCY = 8
+
+
+@dataclass
+class SeedList:
+    seeds: List[str] = field(default_factory=list)
+    duplicates: int = 0
+    invalid: List[str] = field(default_factory=list)
+
+
+def read_seeds(path: Path) -> SeedList:
+    """Normalized, de-duplicated seeds from a file with one URL per line.
+
+    Blank lines and `#` comments are skipped; order of first occurrence is kept.
+    """
+    out = SeedList()
+    seen = set()
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            text = line.split("#", 1)[0].strip()
+            if not text:
+                continue
+            url = normalize_url(text)
+            if url is None:
+                out.invalid.append(text)
+            elif url in seen:
+                out.duplicates += 1
+            else:
+                seen.add(url)
+                out.seeds.append(url)
+    return out
+
+
+@dataclass
+class SeedResult:
+    seed: str
+    pages: int
+    seconds: float
+    started_at: str
+    error: Optional[str] = None
+
+
+BatchSink = Callable[[str, List[CrawledPage]], None]
+
+
+async def crawl_seeds(
+    seeds: List[str],
+    sink: BatchSink,
+    *,
+    limit: int = 5,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    session: Optional[HttpSession] = None,
+    run_log: Optional[Path] = None,
+) -> List[SeedResult]:
+    """Crawl `seeds` with `concurrency` workers sharing one pooled, rate-limited session.
+
+    Every page batch is handed to `sink(seed, pages)` (run in a worker thread) as it
+    arrives. One `SeedResult` per seed, with its timing and error if it failed, is
+    appended to the JSONL `run_log` as soon as the seed finishes.
+    """
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for seed in seeds:
+        queue.put_nowait(seed)
+    results: List[SeedResult] = []
+    if run_log is not None:
+        run_log.parent.mkdir(parents=True, exist_ok=True)
+
+    async def crawl_one(seed: str) -> SeedResult:
+        started = datetime.now(timezone.utc).isoformat()
+        start = time.perf_counter()
+        pages = 0
+        error = None
+        try:
+            async for batch in firecrawl_crawl_batches_async(
+                seed, limit=limit, session=session, strict=True
+            ):
+                await asyncio.to_thread(sink, seed, batch)
+                pages += len(batch)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.warning(f"Seed {seed} failed after {pages} pages: {error}")
+        return SeedResult(seed, pages, time.perf_counter() - start, started, error)
+
+    async def worker() -> None:
+        while True:
+            try:
+                seed = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = await crawl_one(seed)
+            results.append(result)
+            if run_log is not None:
+                with run_log.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(asdict(result)) + "\n")
+            if len(results) % 100 == 0:
+                logger.info(f"{len(results)}/{len(seeds)} seeds crawled")
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(seeds))))))
+    return results
+
+
+def summarize(results: List[SeedResult]) -> Tuple[int, int, int]:
+    """(seeds crawled, seeds failed, pages landed)."""
+    failed = sum(1 for r in results if r.error)
+    return len(results) - failed, failed, sum(r.pages for r in results)
+
+
+__all__ = [
+    "DEFAULT_CONCURRENCY",
+    "SeedList",
+    "SeedResult",
+    "crawl_seeds",
+    "normalize_url",
+    "read_seeds",
+    "summarize",
+]
@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import hashlib
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+DEDUPE_MODES = ("skip", "flag", "off")
+DEFAULT_TEXT_COLUMNS = ("title", "snippet")
+DEFAULT_THRESHOLD = 0.7
+# word pairs: one changed word in a 30-word snippet still leaves ~0.85 similarity
+SHINGLE_WORDS = 2
+# 64 MinHash values in 16 LSH bands of 4: pages with Jaccard similarity 0.7 share a band
+# with probability 1 - (1 - 0.7**4)**16 ~ 0.99, unrelated pages (< 0.3) rarely do
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_WORD_RE = re.compile(r"\w+")
+# fixed seed: signatures must stay comparable across runs and processes
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+del _rng
+
+
+def page_text(*parts: Optional[str]) -> str:
+    return " ".join(p for p in parts if p)
+
+
+def shingles(text: str) -> List[str]:
+    """Lowercased word shingles (`SHINGLE_WORDS` words each) of `text`."""
+    words = _WORD_RE.findall(text.lower())
+    n = max(len(words) - SHINGLE_WORDS + 1, 1) if words else 0
+    return list({" ".join(words[i : i + SHINGLE_WORDS]) for i in range(n)})
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash signature (`NUM_PERM` uint32 values) of the shingles of `text`.
+
+    Each value is the minimum of one multiply-shift hash over all shingles; the share
+    of equal values between two signatures estimates their Jaccard similarity. None if
+    the text has no words.
+    """
+    grams = shingles(text)
+    if not grams:
+        return None
+    base = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little")
+            for g in grams
+        ),
+        dtype=np.uint64,
+        count=len(grams),
+    )
+    with np.errstate(over="ignore"):
+        hashed = (_A[:, None] * base[None, :] + _B[:, None]) >> np.uint64(32)
+    return hashed.min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def _buckets(sig: np.ndarray) -> List[int]:
+    """One signed 64-bit bucket id per LSH band (band number mixed into the hash)."""
+    out = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS : (band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+        out.append(int.from_bytes(digest, "little", signed=True))
+    return out
+
+
+@dataclass
+class Match:
+    key: str
+    similarity: float
+
+
+@dataclass
+class PendingBatch:
+    """Signatures (and `flag`-mode matches) of one lookup, held back until committed."""
+
+    id: int
+    flagged: List[Tuple[str, str, float, str]] = field(default_factory=list)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class NearDupIndex:
+    """Persistent MinHash LSH index answering "was near-identical text seen before?".
+
+    Signatures live in SQLite (`<warehouse>/dedupe/<dataset>.sqlite`) with one bucket
+    row per LSH band, so a lookup is a single indexed `IN` query over 16 bucket ids and
+    a comparison against the few signatures it returns. Texts whose estimated Jaccard
+    similarity to an indexed text reaches `threshold` are near-duplicates. Matches found
+    in `flag` mode are recorded in the `flagged` table.
+
+    `lookup` stores new signatures as pending rows owned by this index instance: later
+    lookups through it see them, other processes do not. `commit` makes them permanent
+    once the pages are durably landed; `discard`, `close` or a crash (cleaned up when the
+    index is next opened) drops them, so pages that never landed are not treated as
+    duplicates later.
+    """
+
+    def __init__(self, path: Path, *, threshold: float = DEFAULT_THRESHOLD) -> None:
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold must be in (0, 1]")
+        self.path = Path(path)
+        self.threshold = threshold
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._batches = itertools.count(1)
+        self._con = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._con:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute("PRAGMA synchronous=NORMAL")
+            self._con.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS signatures (
+                    id INTEGER PRIMARY KEY, sig BLOB NOT NULL, key TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS buckets (
+                    bucket INTEGER NOT NULL, sig_id INTEGER NOT NULL,
+                    PRIMARY KEY (bucket, sig_id)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS flagged (
+                    key TEXT NOT NULL, dup_of TEXT NOT NULL, similarity REAL NOT NULL,
+                    seen_at TEXT NOT NULL
+                );
+                """
+            )
+            cols = {r[1] for r in self._con.execute("PRAGMA table_info(signatures)")}
+            if "owner" not in cols:  # indexes created before pending rows existed
+                self._con.execute("ALTER TABLE signatures ADD COLUMN owner TEXT")
+                self._con.execute("ALTER TABLE signatures ADD COLUMN batch INTEGER")
+            self._con.execute(
+                "CREATE INDEX IF NOT EXISTS signatures_pending ON signatures (owner, batch) "
+                "WHERE owner IS NOT NULL"
+            )
+            owners = [r[0] for r in self._con.execute("SELECT DISTINCT owner FROM signatures")]
+            for owner in owners:
+                if owner is not None and not _pid_alive(int(owner.split(":", 1)[0])):
+                    self._drop_pending(owner, None)
+        self._query = (
+            "SELECT s.sig, s.key FROM signatures s WHERE s.id IN "
+            f"(SELECT sig_id FROM buckets WHERE bucket IN ({', '.join('?' * BANDS)})) "
+            "AND (s.owner IS NULL OR s.owner = ?)"
+        )
+
+    def __enter__(self) -> NearDupIndex:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Drop this instance's uncommitted signatures and close the database."""
+        with self._lock:
+            with self._con:
+                self._drop_pending(self._owner, None)
+            self._con.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(
+                self._con.execute("SELECT count(*) FROM signatures WHERE owner IS NULL").fetchone()[
+                    0
+                ]
+            )
+
+    def _drop_pending(self, owner: str, batch: Optional[int]) -> None:
+        cond = "owner = ?" + (" AND batch = ?" if batch is not None else "")
+        args: Tuple[Any, ...] = (owner,) if batch is None else (owner, batch)
+        self._con.execute(
+            f"DELETE FROM buckets WHERE sig_id IN (SELECT id FROM signatures WHERE {cond})", args
+        )
+        self._con.execute(f"DELETE FROM signatures WHERE {cond}", args)
+
+    def _find(self, sig: np.ndarray, buckets: List[int]) -> Optional[Match]:
+        best: Optional[Match] = None
+        for blob, key in self._con.execute(self._query, [*buckets, self._owner]):
+            sim = similarity(sig, np.frombuffer(blob, dtype=np.uint32))
+            if sim >= self.threshold and (best is None or sim > best.similarity):
+                best = Match(key, sim)
+        return best
+
+    def _add(self, sig: np.ndarray, buckets: List[int], key: str, batch: int) -> None:
+        cur = self._con.execute(
+            "INSERT INTO signatures (sig, key, owner, batch) VALUES (?, ?, ?, ?)",
+            (sig.tobytes(), key, self._owner, batch),
+        )
+        self._con.executemany(
+            "INSERT OR IGNORE INTO buckets (bucket, sig_id) VALUES (?, ?)",
+            [(b, cur.lastrowid) for b in buckets],
+        )
+
+    def find(self, text: str) -> Optional[Match]:
+        sig = minhash(text)
+        if sig is None:
+            return None
+        with self._lock:
+            return self._find(sig, _buckets(sig))
+
+    def lookup(
+        self, texts: Sequence[str], keys: Sequence[str], *, flag: bool = False
+    ) -> Tuple[List[Optional[Match]], PendingBatch]:
+        """Match each text against the index and hold the new ones back as pending.
+
+        Later texts in the same call are compared against earlier ones too. Texts
+        without words are never matched or indexed. Pass the returned batch to `commit`
+        once the texts' pages are landed (or to `discard` if they never will be).
+        """
+        sigs = [minhash(t) for t in texts]  # hashing needs no lock
+        out: List[Optional[Match]] = []
+        pending = PendingBatch(next(self._batches))
+        seen_at = datetime.now(timezone.utc).isoformat()
+        with self._lock, self._con:
+            for sig, key in zip(sigs, keys):
+                if sig is None:
+                    out.append(None)
+                    continue
+                buckets = _buckets(sig)
+                match = self._find(sig, buckets)
+                if match is None:
+                    self._add(sig, buckets, key, pending.id)
+                elif flag:
+                    pending.flagged.append((key, match.key, match.similarity, seen_at))
+                out.append(match)
+        return out, pending
+
+    def commit(self, pending: Optional[PendingBatch]) -> None:
+        """Make a lookup's signatures permanent and record its flagged matches."""
+        if pending is None:
+            return
+        with self._lock, self._con:
+            self._con.execute(
+                "UPDATE signatures SET owner = NULL, batch = NULL WHERE owner = ? AND batch = ?",
+                (self._owner, pending.id),
+            )
+            self._con.executemany(
+                "INSERT INTO flagged (key, dup_of, similarity, seen_at) VALUES (?, ?, ?, ?)",
+                pending.flagged,
+            )
+
+    def discard(self, pending: Optional[PendingBatch]) -> None:
+        """Forget a lookup's signatures (its pages were not landed)."""
+        if pending is None:
+            return
+        with self._lock, self._con:
+            self._drop_pending(self._owner, pending.id)
+
+    def check(
+        self, texts: Sequence[str], keys: Sequence[str], *, flag: bool = False
+    ) -> List[Optional[Match]]:
+        """`lookup` and `commit` in one step; returns the match per text (None if new)."""
+        matches, pending = self.lookup(texts, keys, flag=flag)
+        self.commit(pending)
+        return matches
+
+
+def index_path(warehouse_root: Path, name: str) -> Path:
+    return Path(warehouse_root) / "dedupe" / f"{name}.sqlite"
+
+
+def remove_index(path: Path) -> None:
+    """Delete an index database with its WAL side files."""
+    for p in (Path(path), Path(f"{path}-wal"), Path(f"{path}-shm")):
+        p.unlink(missing_ok=True)
+
+
+def dedupe_pages(
+    index: NearDupIndex, pages: Sequence[Any], mode: str
+) -> Tuple[List[Any], Optional[PendingBatch]]:
+    """Pages (with url/title/snippet) to land under `mode`, and the index batch to commit.
+
+    `skip` drops near-duplicates of already indexed pages, `flag` keeps them and records
+    the match, `off` returns `pages` unchanged (and no batch). New pages only count as
+    seen once the caller lands them and passes the batch to `NearDupIndex.commit`.
+    """
+    if mode == "off" or not pages:
+        return list(pages), None
+    matches, pending = index.lookup(
+        [page_text(p.title, p.snippet) for p in pages],
+        [p.url for p in pages],
+        flag=mode == "flag",
+    )
+    dups = sum(1 for m in matches if m is not None)
+    if dups:
+        verb = "Skipped" if mode == "skip" else "Flagged"
+        logger.info(f"{verb} {dups} near-duplicate page(s) of {len(pages)}")
+    if mode == "skip":
+        return [p for p, m in zip(pages, matches) if m is None], pending
+    return list(pages), pending
+
+
+__all__ = [
+    "DEDUPE_MODES",
+    "DEFAULT_TEXT_COLUMNS",
+    "DEFAULT_THRESHOLD",
+    "Match",
+    "NearDupIndex",
+    "PendingBatch",
+    "dedupe_pages",
+    "index_path",
+    "minhash",
+    "page_text",
+    "remove_index",
+    "similarity",
+]
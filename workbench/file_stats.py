@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import math
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, cast
+
+import numpy as np
+import pandas as pd
+
+# Per-column statistics: {"min": v, "max": v, "type": t, "nulls": n}; min/max are JSON
+# scalars (temporal values as ISO strings) and `type` is their logical type, one of
+# "number", "bool", "str", "date" or "datetime"
+ColumnStats = Dict[str, Dict[str, Any]]
+
+
+def _tagged(value: Any) -> Tuple[Any, Optional[str]]:
+    """A scalar as a JSON-friendly value plus its logical type; (None, None) if unordered."""
+    if isinstance(value, np.datetime64):
+        value = pd.Timestamp(value)
+    elif hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if isinstance(value, datetime):
+        return value.isoformat(), "datetime"
+    if isinstance(value, date):
+        return value.isoformat(), "date"
+    if isinstance(value, bool):
+        return value, "bool"
+    if isinstance(value, float) and math.isnan(value):
+        return None, None
+    if isinstance(value, (int, float)):
+        return value, "number"
+    if isinstance(value, str):
+        return value, "str"
+    return None, None
+
+
+def value_type(value: Any) -> Optional[str]:
+    """Logical type of a filter operand, matching the `type` tags of column statistics."""
+    if isinstance(value, np.datetime64):
+        return "datetime"
+    return _tagged(value)[1]
+
+
+def typed_value(value: Any, kind: Optional[str]) -> Any:
+    """Parse an ISO string the warehouse serialized back into the temporal `kind`."""
+    if not isinstance(value, str):
+        return value
+    try:
+        if kind == "datetime":
+            return pd.Timestamp(value).to_pydatetime()
+        if kind == "date":
+            return date.fromisoformat(value)
+    except ValueError:
+        pass
+    return value
+
+
+def _set_range(entry: Dict[str, Any], lo: Any, hi: Any) -> None:
+    (lo_v, lo_t), (hi_v, hi_t) = _tagged(lo), _tagged(hi)
+    if lo_t is not None and lo_t == hi_t:
+        entry["min"], entry["max"], entry["type"] = lo_v, hi_v, lo_t
+
+
+def frame_stats(df: pd.DataFrame) -> ColumnStats:
+    """Min/max/null counts for every column of a DataFrame."""
+    stats: ColumnStats = {}
+    for col in df.columns:
+        series = df[col]
+        entry: Dict[str, Any] = {"nulls": int(series.isna().sum())}
+        values = series.dropna()
+        if len(values):
+            try:
+                _set_range(entry, values.min(), values.max())
+            except TypeError:  # mixed object column
+                pass
+        stats[str(col)] = entry
+    return stats
+
+
+def arrow_stats(batch: Any) -> ColumnStats:
+    """Min/max/null counts for every column of a pyarrow RecordBatch or Table."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    stats: ColumnStats = {}
+    for name, col in zip(batch.schema.names, batch.columns):
+        entry: Dict[str, Any] = {"nulls": int(col.null_count)}
+        if len(col) > col.null_count:
+            try:
+                mm = pc.min_max(col).as_py()
+            except (pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                mm = None
+            if mm is not None:
+                _set_range(entry, mm["min"], mm["max"])
+        stats[name] = entry
+    return stats
+
+
+def parquet_stats(path: Path) -> Tuple[int, ColumnStats]:
+    """Row count and column statistics from a Parquet footer (no data pages are read)."""
+    import pyarrow.parquet as pq
+
+    md = pq.read_metadata(path)
+    stats: ColumnStats = {}
+    for i in range(md.num_columns):
+        col_path = md.schema.column(i).path
+        if "." in col_path:  # nested leaf
+            continue
+        entry: Dict[str, Any] = {"nulls": 0}
+        lo: Any = None
+        hi: Any = None
+        complete = True
+        for rg in range(md.num_row_groups):
+            chunk_stats = md.row_group(rg).column(i).statistics
+            if chunk_stats is None:
+                complete = False
+                continue
+            entry["nulls"] += chunk_stats.null_count or 0
+            if not chunk_stats.has_min_max:
+                # all-null row groups carry no range but do not invalidate the others
+                complete = complete and chunk_stats.null_count == md.row_group(rg).num_rows
+                continue
+            cmin, cmax = chunk_stats.min, chunk_stats.max
+            if _tagged(cmin)[1] is None or _tagged(cmax)[1] is None:
+                complete = False
+                continue
+            try:
+                lo = cmin if lo is None else min(lo, cmin)
+                hi = cmax if hi is None else max(hi, cmax)
+            except TypeError:
+                complete = False
+        if complete and lo is not None:
+            _set_range(entry, lo, hi)
+        stats[col_path] = entry
+    return md.num_rows, stats
+
+
+def merge_stats(a: ColumnStats, b: ColumnStats) -> ColumnStats:
+    """Combine statistics of two row sets stored in the same file."""
+    merged: ColumnStats = {}
+    for col in set(a) | set(b):
+        x, y = a.get(col), b.get(col)
+        if x is None or y is None:
+            merged[col] = {"nulls": (x or y or {}).get("nulls", 0)}
+            continue
+        entry: Dict[str, Any] = {"nulls": x.get("nulls", 0) + y.get("nulls", 0)}
+        if "min" in x and "min" in y and _stats_type(x) == _stats_type(y) is not None:
+            # ISO strings of one temporal type order like the values they encode
+            entry["min"], entry["max"] = min(x["min"], y["min"]), max(x["max"], y["max"])
+            entry["type"] = _stats_type(x)
+        merged[col] = entry
+    return merged
+
+
+def may_match(entry: Dict[str, Any], filters: Iterable[Tuple[str, str, Any]]) -> bool:
+    """False only when the file's min/max ranges prove no row can satisfy all filters.
+
+    Unknown columns, `!=`/`not in`, and operands whose logical type differs from the
+    column's (e.g. a string compared with a timestamp) always count as a possible match.
+    """
+    columns = entry.get("columns", {})
+    for col, op, value in filters:
+        st = columns.get(col)
+        if st is None or op in ("!=", "not in"):
+            continue
+        if "min" not in st:
+            if st.get("nulls") == entry.get("rows"):  # only nulls: no comparison holds
+                return False
+            continue
+        kind = _stats_type(st)
+        operands = value if op == "in" else [value]
+        if kind is None or any(value_type(v) != kind for v in operands):
+            continue
+        lo, hi = typed_value(st["min"], kind), typed_value(st["max"], kind)
+        if kind in ("date", "datetime"):
+            value = [_temporal(v) for v in operands] if op == "in" else _temporal(operands[0])
+        try:
+            if op in ("=", "=="):
+                ok = lo <= value <= hi
+            elif op == "<":
+                ok = lo < value
+            elif op == "<=":
+                ok = lo <= value
+            elif op == ">":
+                ok = hi > value
+            elif op == ">=":
+                ok = hi >= value
+            elif op == "in":
+                ok = any(lo <= v <= hi for v in value)
+            else:
+                ok = True
+        except TypeError:
+            ok = True
+        if not ok:
+            return False
+    return True
+
+
+def _stats_type(st: Dict[str, Any]) -> Optional[str]:
+    """The `type` tag of column statistics; entries written before tags existed only
+    keep types whose JSON form is unambiguous (strings may be serialized timestamps)."""
+    if "type" in st:
+        return cast(Optional[str], st["type"])
+    kind = value_type(st.get("min"))
+    return kind if kind in ("number", "bool") else None
+
+
+def _temporal(value: Any) -> Any:
+    if isinstance(value, np.datetime64):
+        return pd.Timestamp(value).to_pydatetime()
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+def file_entry(path: Path, rows: int, columns: ColumnStats) -> Dict[str, Any]:
+    st = path.stat()
+    return {"rows": rows, "bytes": st.st_size, "mtime_ns": st.st_mtime_ns, "columns": columns}
+
+
+def entry_is_current(entry: Optional[Dict[str, Any]], path: Path) -> bool:
+    """True when the indexed size/mtime still describe the file on disk."""
+    if not entry:
+        return False
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return False
+    return bool(entry.get("bytes") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns)
+
+
+def can_skip(
+    entry: Optional[Dict[str, Any]], path: Path, filters: Iterable[Tuple[str, str, Any]]
+) -> bool:
+    """True when a current index entry proves `path` holds no rows matching `filters`."""
+    return entry is not None and entry_is_current(entry, path) and not may_match(entry, filters)
+
+
+__all__ = [
+    "ColumnStats",
+    "arrow_stats",
+    "can_skip",
+    "entry_is_current",
+    "file_entry",
+    "frame_stats",
+    "may_match",
+    "merge_stats",
+    "parquet_stats",
+    "typed_value",
+    "value_type",
+]
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+from loguru import logger
+
+CACHE_MODES = ("use", "refresh", "off")
+DEFAULT_HTTP_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL_S = 3600.0
+# seconds an entry is served without asking the server again, by URL path suffix
+DEFAULT_TTLS: Dict[str, float] = {
+    "/v1/crawl": 24 * 3600.0,  # finished crawl results (job submissions are never cached)
+    "/v1/search": 6 * 3600.0,
+}
+TMP_SUFFIX = ".tmp"
+# response headers kept with an entry; the rest (dates, cookies, hop-by-hop) are dropped
+_KEPT_HEADERS = ("content-type", "etag", "last-modified")
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: Dict[str, str]
+    content: bytes
+    stored_at: float
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("etag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.headers.get("last-modified")
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def to_response(self, method: str, url: str) -> httpx.Response:
+        return httpx.Response(
+            self.status_code,
+            headers=self.headers,
+            content=self.content,
+            request=httpx.Request(method, url),
+        )
+
+
+def _canonical_url(url: str, params: Any) -> str:
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        items = params.items() if isinstance(params, Mapping) else params
+        query += [(str(k), str(v)) for k, v in items]
+    path = parts.path.rstrip("/") or "/"
+    qs = "&".join(f"{k}={v}" for k, v in sorted(query))
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{path}?{qs}"
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of successful API responses.
+
+    Entries live in `root/<key>.http` (a JSON header line followed by the raw body) keyed
+    by the SHA-256 of method, normalized URL and query parameters, and canonical JSON
+    body. Credentials are not part of the key. An entry is fresh for the TTL of the
+    first `ttls` suffix its path ends with; stale entries carrying an ETag or
+    Last-Modified are revalidated with a conditional request. Least recently used
+    entries are evicted past `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        root: Path | str = Path("warehouse") / "cache" / "http",
+        *,
+        max_bytes: int = DEFAULT_HTTP_CACHE_BYTES,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl_s: float = DEFAULT_TTL_S,
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl_s = default_ttl_s
+        self._lock = threading.Lock()
+
+    def key(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Any = None,
+        json_body: Any = None,
+        content: Optional[bytes] = None,
+    ) -> str:
+        payload = {
+            "method": method.upper(),
+            "url": _canonical_url(url, params),
+            "json": json_body,
+            "content": hashlib.sha256(content).hexdigest() if content else None,
+        }
+        text = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def ttl(self, url: str) -> float:
+        path = urlsplit(url).path.rstrip("/")
+        for suffix, ttl in self.ttls.items():
+            if path.endswith(suffix.rstrip("/")):
+                return ttl
+        return self.default_ttl_s
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.http"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        path = self._path(key)
+        try:
+            raw = path.read_bytes()
+            header, _, body = raw.partition(b"\n")
+            meta = json.loads(header)
+            entry = CachedResponse(
+                status_code=int(meta["status_code"]),
+                headers=dict(meta["headers"]),
+                content=body,
+                stored_at=float(meta["stored_at"]),
+            )
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # corrupt or unreadable entry: treat as a miss
+            logger.debug(f"Dropping unreadable HTTP cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path)  # mtime doubles as the LRU clock
+        return entry
+
+    def _write(self, key: str, entry: CachedResponse) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}{TMP_SUFFIX}")
+        meta = {
+            "status_code": entry.status_code,
+            "headers": entry.headers,
+            "stored_at": entry.stored_at,
+        }
+        tmp.write_bytes(json.dumps(meta).encode("utf-8") + b"\n" + entry.content)
+        os.replace(tmp, path)
+        self._evict()
+
+    def put(self, key: str, resp: httpx.Response) -> None:
+        """Store a successful response (other statuses are ignored)."""
+        if not 200 <= resp.status_code < 300:
+            return
+        headers = {h: resp.headers[h] for h in _KEPT_HEADERS if h in resp.headers}
+        self._write(key, CachedResponse(resp.status_code, headers, resp.content, time.time()))
+
+    def touch(self, key: str, entry: CachedResponse, resp: httpx.Response) -> None:
+        """Restart an entry's TTL after the server confirmed it unchanged (304)."""
+        for h in ("etag", "last-modified"):
+            if h in resp.headers:
+                entry.headers[h] = resp.headers[h]
+        entry.stored_at = time.time()
+        self._write(key, entry)
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits `max_bytes`."""
+        with self._lock:
+            entries = []
+            for p in self.root.glob("*.http"):
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, p))
+            total = sum(size for _, size, _ in entries)
+            for _, size, p in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                p.unlink(missing_ok=True)
+                total -= size
+
+    def clear(self) -> int:
+        """Remove every cached response; returns the number of entries deleted."""
+        removed = 0
+        for p in self.root.glob("*.http*"):
+            p.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+
+__all__ = [
+    "CACHE_MODES",
+    "CachedResponse",
+    "DEFAULT_TTLS",
+    "ResponseCache",
+]
@@ -2,24 +2,39 @@ from __future__ import annotations
 
 import logging
 import sys
-from typing import Any
+from types import TracebackType
+from typing import Any, Optional, Type
 
 from loguru import logger as loguru_logger
 from rich.console import Console
 from rich.logging import RichHandler
-from rich.traceback import install as rich_traceback_install
+
+
+def _rich_excepthook(
+    exc_type: Type[BaseException], exc: BaseException, tb: Optional[TracebackType]
+) -> None:
+    """Install rich tracebacks on the first uncaught exception, then render it.
+
+    Importing `rich.traceback` (and pygments) costs tens of milliseconds, so commands
+    that finish normally never pay for it.
+    """
+    from rich.traceback import install as rich_traceback_install
+
+    rich_traceback_install(show_locals=False, width=120, extra_lines=2)
+    sys.excepthook(exc_type, exc, tb)
 
 
 def setup_logging(verbosity: int = 0) -> None:
     """Configure logging with Rich formatting and Loguru integration.
 
-    - Installs rich tracebacks (with locals).
+    - Installs rich tracebacks lazily (on the first uncaught exception).
     - Configures stdlib logging to use RichHandler.
     - Forwards Loguru logs through stdlib logging so formatting is consistent.
     - `verbosity` increases log level (0=INFO, 1=DEBUG, >=2=TRACE via Loguru).
     """
     console = Console(stderr=True)
-    rich_traceback_install(show_locals=False, width=120, extra_lines=2)
+    if sys.excepthook is sys.__excepthook__:
+        sys.excepthook = _rich_excepthook
 
     # Determine level
     if verbosity >= 2:
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import os
+import time
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
-from typing import List, Optional
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 import httpx
 import pandas as pd
 from loguru import logger
 
 from .models import StrictBaseModel
+from .transport import HttpSession, default_session
 
 
 class CrawledPage(StrictBaseModel):
@@ -21,47 +28,357 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def firecrawl_crawl(url: str, *, limit: int = 5, timeout_s: int = 30) -> List[CrawledPage]:
-    """Fetch pages via Firecrawl API.
-
-    Requires FIRECRAWL_API_KEY. Optionally configure base via FIRECRAWL_BASE_URL.
-    Returns up to `limit` pages with url/title/snippet.
-    """
+def _firecrawl_config() -> Optional[Tuple[str, Dict[str, str]]]:
     api_key = os.getenv("FIRECRAWL_API_KEY")
     base = os.getenv("FIRECRAWL_BASE_URL", "https://api.firecrawl.dev")
     if not api_key:
         logger.warning("FIRECRAWL_API_KEY not set; skipping Firecrawl crawl.")
-        return []
+        return None
     headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-    client = httpx.Client(base_url=base, headers=headers, timeout=timeout_s)
+    return base.rstrip("/"), headers
+
+
+FIRECRAWL_POLL_INTERVAL_S = 2.0
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+# query parameters that only track the visit and never change the page
+_TRACKING_PARAMS = ("utm_", "gclid", "fbclid", "mc_cid", "mc_eid")
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Canonical form of a seed URL, or None if it is not an http(s) URL.
+
+    Lowercases scheme and host, assumes https when the scheme is missing, drops default
+    ports, fragments, tracking parameters and a trailing slash, and sorts the query.
+    """
+    raw = url.strip()
+    if not raw:
+        return None
+    if "://" not in raw:
+        raw = f"https://{raw}"
     try:
-        # This endpoint may differ by plan; adjust if needed.
-        # Fallback to search when crawl endpoint not available.
-        resp = client.post(
-            "/v1/crawl",
-            json={"url": url, "depth": 1, "include_subdomains": False, "max_pages": limit},
-        )
+        parts = urlsplit(raw)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if scheme not in _DEFAULT_PORTS or not host:
+        return None
+    netloc = host if port in (None, _DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    )
+    path = parts.path.rstrip("/")
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def _firecrawl_page(it: Dict[str, Any], seed: str) -> CrawledPage:
+    # Common fields may vary by API version; v1 jobs nest url/title under `metadata`.
+    meta = it.get("metadata") or {}
+    text = it.get("content") or it.get("markdown") or ""
+    return CrawledPage(
+        url=it.get("url") or it.get("link") or meta.get("sourceURL") or seed,
+        title=it.get("title") or meta.get("title"),
+        snippet=(it.get("snippet") or text[:200]) or None,
+    )
+
+
+def _firecrawl_body(url: str, limit: int) -> Dict[str, Any]:
+    # This endpoint may differ by plan; adjust if needed.
+    return {"url": url, "depth": 1, "include_subdomains": False, "max_pages": limit}
+
+
+@dataclass
+class CrawlCursor:
+    """Progress of one Firecrawl crawl job, saved after every landed batch."""
+
+    seed: str
+    limit: int
+    job_id: Optional[str] = None
+    status_url: Optional[str] = None
+    consumed: int = 0
+    done: bool = False
+
+    @classmethod
+    def load(cls, path: Optional[Path], seed: str, limit: int) -> CrawlCursor:
+        """The unfinished cursor for `seed`/`limit` at `path`, else a fresh one."""
+        if path is None or not path.exists():
+            return cls(seed, limit)
+        try:
+            cursor = cls(**json.loads(path.read_text(encoding="utf-8")))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable crawl cursor {path}: {e}")
+            return cls(seed, limit)
+        if cursor.seed != seed or cursor.limit != limit or cursor.done:
+            return cls(seed, limit)
+        return cursor
+
+    def save(self, path: Optional[Path]) -> None:
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(asdict(self), indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+class _CrawlJob:
+    """Request/response steps of a Firecrawl crawl job, shared by the sync and async drivers.
+
+    Submitting returns a job id whose status endpoint is polled with `skip=<consumed>`
+    until the job completes. An API that answers the submission with the pages directly
+    (the older synchronous crawl endpoint) yields them as the only batch, which is also
+    how a cached result of an earlier crawl is replayed.
+    """
+
+    def __init__(
+        self, base: str, headers: Dict[str, str], cursor: CrawlCursor, poll_interval_s: float
+    ) -> None:
+        self.base = base
+        self.headers = headers
+        self.cursor = cursor
+        self.poll_interval_s = poll_interval_s
+        self.error: Optional[str] = None
+        # a resumed job misses the pages landed before the restart, so it is not cached
+        self.cacheable = cursor.job_id is None
+        self.pages: List[CrawledPage] = []
+
+    def _take(self, items: List[Dict[str, Any]]) -> List[CrawledPage]:
+        room = max(self.cursor.limit - self.cursor.consumed, 0)
+        self.cursor.consumed += len(items)
+        if self.cursor.consumed >= self.cursor.limit:
+            self.cursor.done = True
+        pages = [_firecrawl_page(it, self.cursor.seed) for it in items[:room]]
+        if self.cacheable:
+            self.pages.extend(pages)
+        return pages
+
+    def result_kwargs(self) -> Dict[str, Any]:
+        """Request arguments keying the finished crawl in the response cache.
+
+        The seed is normalized, so `Example.com/` and `https://example.com` share a result.
+        """
+        seed = normalize_url(self.cursor.seed) or self.cursor.seed
+        return {"json": _firecrawl_body(seed, self.cursor.limit)}
+
+    def replaying(self) -> None:
+        logger.info(f"Replaying cached Firecrawl crawl of {self.cursor.seed}")
+        self.cacheable = False
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        """The crawl's pages to cache, if the job ran from submission to a clean finish."""
+        if not self.cacheable or not self.cursor.done or self.error is not None:
+            return None
+        return {"pages": [p.model_dump() for p in self.pages]}
+
+    def submit_kwargs(self) -> Dict[str, Any]:
+        return {
+            "headers": self.headers,
+            "json": _firecrawl_body(self.cursor.seed, self.cursor.limit),
+        }
+
+    def submitted(self, resp: httpx.Response) -> List[CrawledPage]:
         if resp.status_code >= 400:
-            logger.warning("Firecrawl crawl failed (%s): %s", resp.status_code, resp.text[:200])
+            logger.warning(f"Firecrawl crawl failed ({resp.status_code}): {resp.text[:200]}")
+            self.error = f"crawl submission failed: HTTP {resp.status_code}"
+            self.cursor.done = True
             return []
         data = resp.json()
-        items = data.get("pages") or data.get("data") or []
-        results: List[CrawledPage] = []
-        for it in items[:limit]:
-            # Common fields may vary by API; attempt to map.
-            results.append(
-                CrawledPage(
-                    url=it.get("url") or it.get("link") or url,
-                    title=it.get("title"),
-                    snippet=(it.get("snippet") or (it.get("content") or "")[:200]) or None,
+        job_id = data.get("id")
+        if not job_id:
+            self.cursor.done = True
+            return self._take(data.get("pages") or data.get("data") or [])
+        self.cursor.job_id = str(job_id)
+        self.cursor.status_url = f"{self.base}/v1/crawl/{job_id}"
+        return []
+
+    def poll_kwargs(self) -> Dict[str, Any]:
+        return {"headers": self.headers, "params": {"skip": self.cursor.consumed}}
+
+    def polled(self, resp: httpx.Response) -> Tuple[List[CrawledPage], float]:
+        """Pages in a status response and the delay before the next poll."""
+        if resp.status_code >= 400:
+            logger.warning(f"Firecrawl status check failed ({resp.status_code}): {resp.text[:200]}")
+            self.error = f"status check failed: HTTP {resp.status_code}"
+            self.cursor.done = True
+            return [], 0.0
+        data = resp.json()
+        status = data.get("status")
+        items = data.get("data") or []
+        pages = self._take(items)
+        if status in ("failed", "cancelled"):
+            logger.warning(f"Firecrawl job {self.cursor.job_id} {status}")
+            self.error = f"job {self.cursor.job_id} {status}"
+            self.cursor.done = True
+        elif status == "completed" and not data.get("next"):
+            self.cursor.done = True
+        return pages, 0.0 if items or data.get("next") else self.poll_interval_s
+
+
+def firecrawl_crawl_batches(
+    url: str,
+    *,
+    limit: int = 5,
+    timeout_s: int = 30,
+    session: Optional[HttpSession] = None,
+    cursor_path: Optional[Path] = None,
+    poll_interval_s: float = FIRECRAWL_POLL_INTERVAL_S,
+    strict: bool = False,
+) -> Iterator[List[CrawledPage]]:
+    """Crawl `url` as a Firecrawl job, yielding pages batch by batch as results arrive.
+
+    With `cursor_path`, progress is saved there after each batch has been consumed, and
+    an unfinished crawl of the same seed/limit resumes from it instead of resubmitting,
+    so a batch being processed when the process died is fetched again (at-least-once).
+    When the session has a `ResponseCache`, a crawl that finished cleanly is stored
+    under its normalized seed, limit and options, and repeating it within the
+    `/v1/crawl` TTL replays the pages from disk without submitting a new job.
+    Request failures are logged and end the iteration, leaving the cursor resumable;
+    with `strict=True` they are raised instead (error responses as `RuntimeError`).
+    """
+    config = _firecrawl_config()
+    if config is None:
+        return
+    base, headers = config
+    sess = session or default_session()
+    job = _CrawlJob(base, headers, CrawlCursor.load(cursor_path, url, limit), poll_interval_s)
+    try:
+        if job.cursor.job_id:
+            logger.info(
+                f"Resuming Firecrawl job {job.cursor.job_id} after {job.cursor.consumed} pages"
+            )
+        else:
+            cached = sess.cached_result("POST", f"{base}/v1/crawl", **job.result_kwargs())
+            if cached is not None:
+                job.replaying()
+                resp = cached
+            else:
+                # the submission itself is never cached: it would hand back an old job id
+                resp = sess.request(
+                    "POST", f"{base}/v1/crawl", timeout=timeout_s, **job.submit_kwargs()
                 )
+            batch = job.submitted(resp)
+            if batch:
+                yield batch
+            job.cursor.save(cursor_path)
+        while not job.cursor.done and job.cursor.status_url:
+            resp = sess.request(
+                "GET", job.cursor.status_url, timeout=timeout_s, **job.poll_kwargs()
             )
-        return results
+            batch, delay = job.polled(resp)
+            if batch:
+                yield batch
+            job.cursor.save(cursor_path)
+            if delay and not job.cursor.done:
+                time.sleep(delay)
+        result = job.result()
+        if result is not None:
+            sess.store_result("POST", f"{base}/v1/crawl", result, **job.result_kwargs())
     except Exception as e:
-        logger.warning("Firecrawl request failed: %s", e)
-        return []
-    finally:
-        client.close()
+        if strict:
+            raise
+        logger.warning(f"Firecrawl request failed: {e}")
+    if strict and job.error:
+        raise RuntimeError(f"Firecrawl {job.error}")
+
+
+async def firecrawl_crawl_batches_async(
+    url: str,
+    *,
+    limit: int = 5,
+    timeout_s: int = 30,
+    session: Optional[HttpSession] = None,
+    cursor_path: Optional[Path] = None,
+    poll_interval_s: float = FIRECRAWL_POLL_INTERVAL_S,
+    strict: bool = False,
+) -> AsyncIterator[List[CrawledPage]]:
+    """Async `firecrawl_crawl_batches` on the session's pooled AsyncClient."""
+    config = _firecrawl_config()
+    if config is None:
+        return
+    base, headers = config
+    sess = session or default_session()
+    job = _CrawlJob(base, headers, CrawlCursor.load(cursor_path, url, limit), poll_interval_s)
+    try:
+        if job.cursor.job_id:
+            logger.info(
+                f"Resuming Firecrawl job {job.cursor.job_id} after {job.cursor.consumed} pages"
+            )
+        else:
+            cached = sess.cached_result("POST", f"{base}/v1/crawl", **job.result_kwargs())
+            if cached is not None:
+                job.replaying()
+                resp = cached
+            else:
+                # the submission itself is never cached: it would hand back an old job id
+                resp = await sess.arequest(
+                    "POST", f"{base}/v1/crawl", timeout=timeout_s, **job.submit_kwargs()
+                )
+            batch = job.submitted(resp)
+            if batch:
+                yield batch
+            job.cursor.save(cursor_path)
+        while not job.cursor.done and job.cursor.status_url:
+            resp = await sess.arequest(
+                "GET", job.cursor.status_url, timeout=timeout_s, **job.poll_kwargs()
+            )
+            batch, delay = job.polled(resp)
+            if batch:
+                yield batch
+            job.cursor.save(cursor_path)
+            if delay and not job.cursor.done:
+                await asyncio.sleep(delay)
+        result = job.result()
+        if result is not None:
+            sess.store_result("POST", f"{base}/v1/crawl", result, **job.result_kwargs())
+    except Exception as e:
+        if strict:
+            raise
+        logger.warning(f"Firecrawl request failed: {e}")
+    if strict and job.error:
+        raise RuntimeError(f"Firecrawl {job.error}")
+
+
+def firecrawl_crawl(
+    url: str,
+    *,
+    limit: int = 5,
+    timeout_s: int = 30,
+    session: Optional[HttpSession] = None,
+) -> List[CrawledPage]:
+    """Fetch pages via Firecrawl API.
+
+    Requires FIRECRAWL_API_KEY. Optionally configure base via FIRECRAWL_BASE_URL.
+    Returns up to `limit` pages with url/title/snippet, collected from
+    `firecrawl_crawl_batches`. Connections are pooled in `session` (the process-wide
+    default session when omitted), which also rate-limits the endpoint, retries
+    429/5xx responses with backoff and, when it has a `ResponseCache`, replays the result
+    of a recent identical crawl from disk instead of starting a new job.
+    """
+    return [
+        page
+        for batch in firecrawl_crawl_batches(url, limit=limit, timeout_s=timeout_s, session=session)
+        for page in batch
+    ]
+
+
+async def firecrawl_crawl_async(
+    url: str,
+    *,
+    limit: int = 5,
+    timeout_s: int = 30,
+    session: Optional[HttpSession] = None,
+) -> List[CrawledPage]:
+    """Async `firecrawl_crawl` on the session's pooled AsyncClient."""
+    pages: List[CrawledPage] = []
+    async for batch in firecrawl_crawl_batches_async(
+        url, limit=limit, timeout_s=timeout_s, session=session
+    ):
+        pages.extend(batch)
+    return pages
 
 
 def pages_to_dataframe(pages: List[CrawledPage]) -> pd.DataFrame:
@@ -71,13 +388,54 @@ def pages_to_dataframe(pages: List[CrawledPage]) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 
+def pages_to_table(pages: List[CrawledPage]) -> Any:
+    """Arrow-native twin of `pages_to_dataframe` (a `pyarrow.Table`, no pandas involved)."""
+    import pyarrow as pa
+
+    fetched_at = _now_iso()
+    return pa.table(
+        {
+            "url": pa.array([p.url for p in pages], pa.string()),
+            "title": pa.array([p.title for p in pages], pa.string()),
+            "snippet": pa.array([p.snippet for p in pages], pa.string()),
+            "fetched_at": pa.array([fetched_at] * len(pages), pa.string()),
+        }
+    )
+
+
 class Context7Doc(StrictBaseModel):
     title: Optional[str] = None
     url: Optional[str] = None
     snippet: Optional[str] = None
 
 
-def context7_search(query: str, *, limit: int = 5, timeout_s: int = 30) -> List[Context7Doc]:
+def _context7_config() -> Optional[Tuple[str, Dict[str, str]]]:
+    api_key = os.getenv("CONTEXT7_API_KEY")
+    base = os.getenv("CONTEXT7_BASE_URL", "https://api.context7.com")
+    if not api_key:
+        logger.warning("CONTEXT7_API_KEY not set; skipping Context7 search.")
+        return None
+    return base.rstrip("/"), {"Authorization": f"Bearer {api_key}"}
+
+
+def _context7_docs(resp: httpx.Response, limit: int) -> List[Context7Doc]:
+    if resp.status_code >= 400:
+        logger.warning(f"Context7 search failed ({resp.status_code}): {resp.text[:200]}")
+        return []
+    items = resp.json().get("results", [])
+    return [
+        Context7Doc(title=it.get("title"), url=it.get("url"), snippet=it.get("snippet"))
+        for it in items[:limit]
+    ]
+
+
+def context7_search(
+    query: str,
+    *,
+    limit: int = 5,
+    timeout_s: int = 30,
+    session: Optional[HttpSession] = None,
+) -> List[Context7Doc]:
     """Search via Context7 HTTP API if available. Falls back to empty list.
 
     Env vars:
@@ -85,35 +443,63 @@ def context7_search(query: str, *, limit: int = 5, timeout_s: int = 30) -> List[
     - CONTEXT7_BASE_URL (optional), default "https://api.context7.com"
     Endpoint assumed: GET /v1/search?q=...&limit=...
     """
-    api_key = os.getenv("CONTEXT7_API_KEY")
-    base = os.getenv("CONTEXT7_BASE_URL", "https://api.context7.com")
-    if not api_key:
-        logger.warning("CONTEXT7_API_KEY not set; skipping Context7 search.")
+    config = _context7_config()
+    if config is None:
         return []
+    base, headers = config
     try:
-        resp = httpx.get(
+        resp = (session or default_session()).request(
+            "GET",
             f"{base}/v1/search",
             params={"q": query, "limit": limit},
-            headers={"Authorization": f"Bearer {api_key}"},
+            headers=headers,
             timeout=timeout_s,
+            cacheable=True,
         )
-        if resp.status_code >= 400:
-            logger.warning("Context7 search failed (%s): %s", resp.status_code, resp.text[:200])
-            return []
-        items = resp.json().get("results", [])
-        return [
-            Context7Doc(title=it.get("title"), url=it.get("url"), snippet=it.get("snippet"))
-            for it in items[:limit]
-        ]
+        return _context7_docs(resp, limit)
+    except Exception as e:
+        logger.warning(f"Context7 request failed: {e}")
+        return []
+
+
+async def context7_search_async(
+    query: str,
+    *,
+    limit: int = 5,
+    timeout_s: int = 30,
+    session: Optional[HttpSession] = None,
+) -> List[Context7Doc]:
+    """Async `context7_search` on the session's pooled AsyncClient."""
+    config = _context7_config()
+    if config is None:
+        return []
+    base, headers = config
+    try:
+        resp = await (session or default_session()).arequest(
+            "GET",
+            f"{base}/v1/search",
+            params={"q": query, "limit": limit},
+            headers=headers,
+            timeout=timeout_s,
+            cacheable=True,
+        )
+        return _context7_docs(resp, limit)
     except Exception as e:
-        logger.warning("Context7 request failed: %s", e)
+        logger.warning(f"Context7 request failed: {e}")
         return []
 
 
 __all__ = [
+    "CrawlCursor",
     "CrawledPage",
     "Context7Doc",
     "firecrawl_crawl",
+    "firecrawl_crawl_async",
+    "firecrawl_crawl_batches",
+    "firecrawl_crawl_batches_async",
+    "normalize_url",
     "context7_search",
+    "context7_search_async",
     "pages_to_dataframe",
+    "pages_to_table",
 ]
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+PDF_BACKENDS = ("weasyprint", "pdfkit")
+BACKEND_LABELS = {"weasyprint": "WeasyPrint", "pdfkit": "pdfkit"}
+INSTALL_HINT = (
+    "Install one of: `uv add weasyprint` (may need system deps) or "
+    "`uv add pdfkit` and install `wkhtmltopdf`."
+)
+
+
+class PdfBackendMissing(RuntimeError):
+    """Neither WeasyPrint nor pdfkit (with `wkhtmltopdf`) is usable."""
+
+    def __init__(self) -> None:
+        super().__init__(f"No HTML->PDF backend available. {INSTALL_HINT}")
+
+
+def _probe(backend: str) -> bool:
+    try:
+        if backend == "weasyprint":
+            import weasyprint  # noqa: F401
+        else:
+            import pdfkit
+
+            pdfkit.configuration()  # raises when the wkhtmltopdf binary is missing
+        return True
+    except Exception:
+        return False
+
+
+@lru_cache(maxsize=1)
+def detect_backend() -> Optional[str]:
+    """First usable backend in `PDF_BACKENDS` order (probed once per process), or None."""
+    return next((b for b in PDF_BACKENDS if _probe(b)), None)
+
+
+def _convert(backend: str, html: Path, out: Path) -> None:
+    """Write `out` from `html` via a temporary file, so a crash never leaves a fresh PDF."""
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f"{out.stem}.tmp{out.suffix}")
+    try:
+        if backend == "weasyprint":
+            import weasyprint
+
+            weasyprint.HTML(filename=str(html)).write_pdf(str(tmp))
+        else:
+            import pdfkit
+
+            pdfkit.from_file(str(html), str(tmp))
+        os.replace(tmp, out)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def export_pdf(html: Path, out: Path, *, backend: Optional[str] = None) -> str:
+    """Convert one HTML file to PDF; returns the backend label used.
+
+    Raises `PdfBackendMissing` when no backend is installed.
+    """
+    backend = backend or detect_backend()
+    if backend is None:
+        raise PdfBackendMissing()
+    _convert(backend, html, out)
+    return BACKEND_LABELS[backend]
+
+
+def pdf_path_for(html: Path) -> Path:
+    """Default PDF for an HTML report: `reports/html/x.html` -> `reports/pdf/x.pdf`."""
+    if html.parent.name == "html":
+        return html.parent.with_name("pdf") / f"{html.stem}.pdf"
+    return html.with_suffix(".pdf")
+
+
+def is_up_to_date(html: Path, out: Path) -> bool:
+    try:
+        return out.stat().st_mtime_ns >= html.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+@dataclass
+class ExportResult:
+    html: Path
+    pdf: Path
+    status: str  # "written" | "skipped" | "failed"
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+_worker_backend: Optional[str] = None
+
+
+def _init_worker(backend: str) -> None:
+    """Load the backend once per worker process and render a tiny page to warm it up."""
+    global _worker_backend
+    _worker_backend = backend
+    if backend == "weasyprint":
+        import weasyprint
+
+        weasyprint.HTML(string="<p>warm-up</p>").write_pdf()
+    else:
+        import pdfkit  # noqa: F401
+
+
+def _export_job(job: Tuple[str, str]) -> Tuple[float, Optional[str]]:
+    html, out = job
+    assert _worker_backend is not None
+    start = time.perf_counter()
+    try:
+        _convert(_worker_backend, Path(html), Path(out))
+    except Exception as e:
+        return time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    return time.perf_counter() - start, None
+
+
+def export_many(
+    jobs: Sequence[Tuple[Path, Path]],
+    *,
+    workers: int = 1,
+    force: bool = False,
+    backend: Optional[str] = None,
+) -> Iterator[ExportResult]:
+    """Convert `(html, pdf)` pairs, yielding one result per pair as it finishes.
+
+    PDFs at least as new as their HTML are skipped unless `force`. Conversions run
+    in `workers` processes that load the backend once at start-up (in-process when
+    `workers` is 1). Raises `PdfBackendMissing` before any work if no backend exists.
+    """
+    backend = backend or detect_backend()
+    if backend is None:
+        raise PdfBackendMissing()
+    todo: List[Tuple[Path, Path]] = []
+    for html, out in jobs:
+        if not force and is_up_to_date(html, out):
+            yield ExportResult(html, out, "skipped")
+        else:
+            todo.append((html, out))
+    if not todo:
+        return
+
+    def result(html: Path, out: Path, outcome: Tuple[float, Optional[str]]) -> ExportResult:
+        seconds, error = outcome
+        return ExportResult(html, out, "failed" if error else "written", seconds, error)
+
+    if workers <= 1 or len(todo) == 1:
+        _init_worker(backend)
+        for html, out in todo:
+            yield result(html, out, _export_job((str(html), str(out))))
+        return
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(todo)), initializer=_init_worker, initargs=(backend,)
+    ) as pool:
+        futures: Dict[Any, Tuple[Path, Path]] = {
+            pool.submit(_export_job, (str(h), str(o))): (h, o) for h, o in todo
+        }
+        for fut in as_completed(futures):
+            html, out = futures[fut]
+            yield result(html, out, fut.result())
+
+
+__all__ = [
+    "ExportResult",
+    "PDF_BACKENDS",
+    "PdfBackendMissing",
+    "detect_backend",
+    "export_many",
+    "export_pdf",
+    "is_up_to_date",
+    "pdf_path_for",
+]
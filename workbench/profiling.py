@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import re
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+
+PROFILE_MODES = ("cpu", "mem", "both")
+DEFAULT_TOP_N = 30
+
+
+def command_path(root: Any, argv: Sequence[str]) -> List[str]:
+    """Names of the (sub)commands `argv` invokes, resolved against a click/Typer group."""
+    names: List[str] = []
+    cmd = root
+    for tok in argv:
+        commands = getattr(cmd, "commands", None)
+        if commands is None:
+            break
+        if tok in commands:
+            names.append(tok)
+            cmd = commands[tok]
+    return names
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", text).strip("-") or "none"
+
+
+class CommandProfiler:
+    """Capture CPU (cProfile) and/or allocation (tracemalloc) profiles of one command.
+
+    `stop()` writes `profile_<command>_<project>_<stamp>.prof` (CPU modes) and a `.txt`
+    summary with the top-N cumulative hotspots and allocation sites into `out_dir`.
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        *,
+        command: str,
+        project: Optional[str] = None,
+        out_dir: Path = Path("logs"),
+        top: int = DEFAULT_TOP_N,
+    ) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(
+                f"Unknown profile mode: {mode} (choose from {', '.join(PROFILE_MODES)})"
+            )
+        self.mode = mode
+        self.command = command
+        self.project = project
+        self.out_dir = out_dir
+        self.top = top
+        self._cpu: Optional[cProfile.Profile] = None
+        self._started_tracemalloc = False
+        self._start = 0.0
+
+    @property
+    def cpu(self) -> bool:
+        return self.mode in ("cpu", "both")
+
+    @property
+    def mem(self) -> bool:
+        return self.mode in ("mem", "both")
+
+    def start(self) -> None:
+        if self.mem and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.cpu:
+            self._cpu = cProfile.Profile()
+            self._cpu.enable()
+        self._start = time.perf_counter()
+
+    def stop(self) -> List[Path]:
+        """Stop capturing and write the profile files; returns their paths."""
+        elapsed = time.perf_counter() - self._start
+        if self._cpu is not None:
+            self._cpu.disable()
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        stem = f"profile_{_slug(self.command)}_{_slug(self.project or 'none')}_{stamp}"
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        written: List[Path] = []
+        lines = [
+            f"command: {self.command}",
+            f"project: {self.project or '-'}",
+            f"mode: {self.mode}",
+            f"wall time: {elapsed:.3f}s",
+            "",
+        ]
+        if self._cpu is not None:
+            prof = self.out_dir / f"{stem}.prof"
+            self._cpu.dump_stats(str(prof))
+            written.append(prof)
+            buf = io.StringIO()
+            stats = pstats.Stats(self._cpu, stream=buf)
+            stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+            lines += [f"== CPU hotspots (top {self.top} by cumulative time) ==", buf.getvalue()]
+        if self.mem and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            lines += [
+                f"== Allocations (top {self.top} by size) ==",
+                f"traced now: {current / 1024**2:.1f} MiB, peak: {peak / 1024**2:.1f} MiB",
+            ]
+            lines += [str(st) for st in snapshot.statistics("lineno")[: self.top]]
+        summary = self.out_dir / f"{stem}.txt"
+        summary.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        written.append(summary)
+        return written
+
+
+__all__ = ["CommandProfiler", "DEFAULT_TOP_N", "PROFILE_MODES", "command_path"]
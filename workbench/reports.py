@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    Template,
+    select_autoescape,
+)
+
+from .projects import Projects
+
+GLOBAL_TEMPLATES = Path(__file__).resolve().parent.parent / "templates"
+DEFAULT_INDEX_TEMPLATE = "report_index.html.j2"
+_RECORD_CHUNK_ROWS = 10_000  # rows converted to dicts at a time from an in-memory frame
+_UNSAFE_NAME_RE = re.compile(r"[^\w.-]+")
+
+
+def template_search_path(project_root: Optional[Path] = None) -> Tuple[str, ...]:
+    """Template directories in lookup order: the project's `templates/`, then the global one."""
+    dirs = []
+    if project_root and (project_root / "templates").exists():
+        dirs.append(str((project_root / "templates").resolve()))
+    dirs.append(str(GLOBAL_TEMPLATES))
+    return tuple(dirs)
+
+
+@lru_cache(maxsize=16)
+def _environment(search_path: Tuple[str, ...], bytecode_dir: str) -> Environment:
+    Path(bytecode_dir).mkdir(parents=True, exist_ok=True)
+    return Environment(
+        loader=FileSystemLoader(list(search_path)),
+        autoescape=select_autoescape(["html", "xml"]),
+        # compiled templates persist across processes; an entry is keyed by template
+        # name and file and only used while the source checksum matches
+        bytecode_cache=FileSystemBytecodeCache(bytecode_dir),
+    )
+
+
+def jinja_environment(project_root: Optional[Path] = None) -> Environment:
+    """Process-wide Jinja environment for the current (or given) project.
+
+    One environment is kept per template search path, so each template is parsed and
+    compiled once per process (and re-checked by mtime on lookup). Compiled bytecode is
+    also stored under `<project>/.cache/jinja` for later runs.
+    """
+    root = project_root if project_root is not None else Projects().current_root()
+    cache_dir = (root / ".cache/jinja") if root else Path(".cache/jinja")
+    return _environment(template_search_path(root), str(cache_dir.resolve()))
+
+
+def clear_environments() -> None:
+    """Forget cached environments (e.g. after templates directories were added)."""
+    _environment.cache_clear()
+
+
+def safe_filename(value: Any) -> str:
+    """File name stem for a report key (anything but letters, digits, `.-_` becomes `_`)."""
+    return _UNSAFE_NAME_RE.sub("_", str(value)).strip("._") or "_"
+
+
+@dataclass
+class RenderResult:
+    path: Path
+    seconds: float
+
+
+def render_batch(
+    template: Union[str, Template],
+    jobs: Iterable[Tuple[Path, Mapping[str, Any]]],
+    *,
+    env: Optional[Environment] = None,
+    common: Optional[Mapping[str, Any]] = None,
+) -> List[RenderResult]:
+    """Render one compiled `template` once per `(output path, context)` job.
+
+    `common` values are shared by every render; a job's own context overrides them.
+    Output is streamed to each file rather than built as one string.
+    """
+    if isinstance(template, str):
+        template = (env or jinja_environment()).get_template(template)
+    results = []
+    for path, context in jobs:
+        start = time.perf_counter()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        template.stream({**(common or {}), **context}).dump(str(path), encoding="utf-8")
+        results.append(RenderResult(path, time.perf_counter() - start))
+    return results
+
+
+def _records(batches: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+    """Row dicts from DataFrames or `pyarrow.RecordBatch`es, one batch in memory at a time."""
+    for batch in batches:
+        if isinstance(batch, pd.DataFrame):
+            for start in range(0, len(batch), _RECORD_CHUNK_ROWS):
+                yield from batch.iloc[start : start + _RECORD_CHUNK_ROWS].to_dict(orient="records")
+        else:
+            yield from batch.to_pylist()
+
+
+class _RowStream:
+    """Row iterator that can look one row ahead."""
+
+    def __init__(self, rows: Iterator[Dict[str, Any]]) -> None:
+        self._rows = rows
+        self._head: List[Dict[str, Any]] = []
+
+    def has_more(self) -> bool:
+        if not self._head:
+            row = next(self._rows, None)
+            if row is not None:
+                self._head.append(row)
+        return bool(self._head)
+
+    def take(self, n: Optional[int]) -> Iterator[Dict[str, Any]]:
+        taken = 0
+        while (n is None or taken < n) and self.has_more():
+            yield self._head.pop()
+            taken += 1
+
+
+def page_path(out: Path, number: int) -> Path:
+    return out.with_name(f"{out.stem}_{number:04d}{out.suffix}")
+
+
+@dataclass
+class PageInfo:
+    number: int
+    path: Path
+    first_row: int  # 1-based
+    rows: int = 0
+
+
+class Page:
+    """Template view of one output page.
+
+    `rows` is consumed lazily while the template renders; `rows_rendered` and
+    `next_href` are only final after the template's row loop.
+    """
+
+    def __init__(self, info: PageInfo, stream: _RowStream, size: Optional[int], out: Path) -> None:
+        self.info = info
+        self._stream = stream
+        self._size = size
+        self._out = out
+
+    @property
+    def number(self) -> int:
+        return self.info.number
+
+    @property
+    def first_row(self) -> int:
+        return self.info.first_row
+
+    @property
+    def rows_rendered(self) -> int:
+        return self.info.rows
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        for row in self._stream.take(self._size):
+            self.info.rows += 1
+            yield row
+
+    @property
+    def index_href(self) -> str:
+        return self._out.name
+
+    @property
+    def prev_href(self) -> Optional[str]:
+        return page_path(self._out, self.number - 1).name if self.number > 1 else None
+
+    @property
+    def next_href(self) -> Optional[str]:
+        return page_path(self._out, self.number + 1).name if self._stream.has_more() else None
+
+
+def render_stream(
+    template: Union[str, Template],
+    batches: Iterable[Any],
+    out: Path,
+    *,
+    context: Optional[Mapping[str, Any]] = None,
+    columns: Optional[Sequence[str]] = None,
+    page_rows: Optional[int] = None,
+    index_template: Union[str, Template] = DEFAULT_INDEX_TEMPLATE,
+    env: Optional[Environment] = None,
+) -> List[PageInfo]:
+    """Render rows from `batches` (DataFrames or RecordBatches) straight into `out`.
+
+    The template gets `columns` and a lazy `rows` iterator and is written through
+    `Template.generate`, so neither the row list nor the HTML is ever held whole.
+    With `page_rows`, rows are split into `<stem>_0001<suffix>`, ... pages (each with a
+    `page` for navigation) and `out` becomes an index rendered with `index_template`.
+    Pages left over from an earlier, longer render are removed.
+    """
+    if page_rows is not None and page_rows <= 0:
+        raise ValueError("page_rows must be positive")
+    env = env or jinja_environment()
+    if isinstance(template, str):
+        template = env.get_template(template)
+    it = iter(batches)
+    first = next(it, None)
+    if columns is None:
+        if first is None:
+            columns = []
+        elif isinstance(first, pd.DataFrame):
+            columns = list(first.columns)
+        else:
+            columns = list(first.schema.names)
+    stream = _RowStream(_records(chain([first], it) if first is not None else ()))
+    base = {**(context or {}), "columns": list(columns)}
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if page_rows is None:
+        info = PageInfo(1, out, 1)
+        page = Page(info, stream, None, out)
+        template.stream({**base, "rows": page.rows()}).dump(str(out), encoding="utf-8")
+        return [info]
+    pages: List[PageInfo] = []
+    next_row = 1
+    while not pages or stream.has_more():
+        info = PageInfo(len(pages) + 1, page_path(out, len(pages) + 1), next_row)
+        page = Page(info, stream, page_rows, out)
+        context_page = {**base, "rows": page.rows(), "page": page}
+        template.stream(context_page).dump(str(info.path), encoding="utf-8")
+        pages.append(info)
+        next_row += info.rows
+    for stale in out.parent.glob(f"{out.stem}_[0-9][0-9][0-9][0-9]{out.suffix}"):
+        if int(stale.stem.rsplit("_", 1)[1]) > len(pages):
+            stale.unlink()
+    if isinstance(index_template, str):
+        index_template = env.get_template(index_template)
+    index_template.stream(
+        {**base, "pages": pages, "total_rows": next_row - 1, "page_rows": page_rows}
+    ).dump(str(out), encoding="utf-8")
+    return pages
+
+
+__all__ = [
+    "DEFAULT_INDEX_TEMPLATE",
+    "Page",
+    "PageInfo",
+    "RenderResult",
+    "clear_environments",
+    "jinja_environment",
+    "page_path",
+    "render_batch",
+    "render_stream",
+    "safe_filename",
+    "template_search_path",
+]
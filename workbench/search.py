@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import pandas as pd
+
+DEFAULT_SEARCH_COLUMNS = ("title", "snippet")
+DEFAULT_SEARCH_LIMIT = 10
+_TERM_RE = re.compile(r"\w+")
+_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# (path relative to the dataset dir, size, mtime_ns)
+FileKey = Tuple[str, int, int]
+FileReader = Callable[[str], Iterable[pd.DataFrame]]
+
+
+def fts_query(text: str) -> str:
+    """FTS5 query matching documents that contain every word of `text` (in any order).
+
+    Words are quoted, so punctuation and FTS5 operators in user input are literal.
+    """
+    terms = _TERM_RE.findall(text)
+    return " ".join(f'"{t}"' for t in terms)
+
+
+@dataclass
+class SyncReport:
+    files_added: int = 0
+    files_removed: int = 0
+    rows_added: int = 0
+
+
+class TextIndex:
+    """SQLite FTS5 index over text columns of one dataset (`warehouse/search/<name>.sqlite`).
+
+    Rows are stored with the file they came from and their position in it; a `files`
+    table records each indexed file's size and mtime, so `sync` only indexes new or
+    changed files and drops rows of files that disappeared (e.g. after compaction).
+    Text is tokenized with the Porter stemmer and results are ranked by BM25.
+    """
+
+    def __init__(self, path: Path, columns: Sequence[str]) -> None:
+        for c in columns:
+            if not _IDENT_RE.match(c) or c in ("file", "row", "key"):
+                raise ValueError(f"Cannot index column name: {c}")
+        if not columns:
+            raise ValueError("Need at least one column to index")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.columns = list(columns)
+        self._con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        self._con.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        row = self._con.execute("SELECT v FROM meta WHERE k = 'columns'").fetchone()
+        if row is not None and json.loads(row[0]) != self.columns:
+            # indexed with other columns: start over
+            self._con.execute("DROP TABLE IF EXISTS docs")
+            self._con.execute("DROP TABLE IF EXISTS files")
+        cols = ", ".join(self.columns)
+        self._con.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5("
+            f"key UNINDEXED, file UNINDEXED, row UNINDEXED, {cols}, "
+            "tokenize = 'porter unicode61 remove_diacritics 2')"
+        )
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, rows INTEGER)"
+        )
+        self._con.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('columns', ?)", (json.dumps(self.columns),)
+        )
+
+    def __enter__(self) -> TextIndex:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._con.close()
+
+    def indexed_files(self) -> Dict[str, Tuple[int, int]]:
+        return {
+            p: (size, mtime)
+            for p, size, mtime in self._con.execute("SELECT path, size, mtime_ns FROM files")
+        }
+
+    def sync(
+        self,
+        files: Sequence[FileKey],
+        read: FileReader,
+        *,
+        key_column: Optional[str] = None,
+    ) -> SyncReport:
+        """Bring the index in line with `files`.
+
+        `read(rel_path)` must yield DataFrames of the file's rows in order. Each file is
+        (re)indexed in its own transaction, so an interrupted sync keeps what it did.
+        """
+        report = SyncReport()
+        current = {rel: (size, mtime) for rel, size, mtime in files}
+        indexed = self.indexed_files()
+        for rel in sorted(set(indexed) - set(current)):
+            self._con.execute("BEGIN IMMEDIATE")
+            self._con.execute("DELETE FROM docs WHERE file = ?", (rel,))
+            self._con.execute("DELETE FROM files WHERE path = ?", (rel,))
+            self._con.execute("COMMIT")
+            report.files_removed += 1
+        placeholders = ", ".join("?" * (3 + len(self.columns)))
+        for rel, (size, mtime) in sorted(current.items()):
+            if indexed.get(rel) == (size, mtime):
+                continue
+            self._con.execute("BEGIN IMMEDIATE")
+            try:
+                self._con.execute("DELETE FROM docs WHERE file = ?", (rel,))
+                rows = 0
+                for df in read(rel):
+                    self._con.executemany(
+                        f"INSERT INTO docs VALUES ({placeholders})",
+                        self._doc_rows(df, rel, rows, key_column),
+                    )
+                    rows += len(df)
+                self._con.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (rel, size, mtime, rows)
+                )
+                self._con.execute("COMMIT")
+            except BaseException:
+                self._con.execute("ROLLBACK")
+                raise
+            report.files_added += 1
+            report.rows_added += rows
+        return report
+
+    def _doc_rows(
+        self, df: pd.DataFrame, rel: str, offset: int, key_column: Optional[str]
+    ) -> Iterator[Tuple[Any, ...]]:
+        keys: Iterable[Any] = (
+            df[key_column] if key_column and key_column in df.columns else [None] * len(df)
+        )
+        texts = [
+            df[c] if c in df.columns else pd.Series([None] * len(df), dtype=object)
+            for c in self.columns
+        ]
+        for i, (key, *values) in enumerate(zip(keys, *texts)):
+            yield (
+                None if pd.isna(key) else str(key),
+                rel,
+                offset + i,
+                *(None if pd.isna(v) else str(v) for v in values),
+            )
+
+    def search(self, query: str, *, limit: int = DEFAULT_SEARCH_LIMIT) -> pd.DataFrame:
+        """Top `limit` rows matching the FTS5 `query`, best first.
+
+        Columns: `score` (BM25, higher is better), `key`, the indexed text columns, a
+        highlighted `match` excerpt, and `file`/`row` locating the source row.
+        """
+        cols = ", ".join(self.columns)
+        # snippet(): -1 picks the best-matching column; 16 tokens of context
+        sql = (
+            f"SELECT -bm25(docs) AS score, key, {cols}, "
+            "snippet(docs, -1, '[', ']', '…', 16) AS match, file, row "
+            "FROM docs WHERE docs MATCH ? ORDER BY bm25(docs) LIMIT ?"
+        )
+        cur = self._con.execute(sql, (query, limit))
+        names = [d[0] for d in cur.description]
+        return pd.DataFrame(cur.fetchall(), columns=names)
+
+    def __len__(self) -> int:
+        return int(self._con.execute("SELECT count(*) FROM docs").fetchone()[0])
+
+
+def index_path(warehouse_root: Path, name: str) -> Path:
+    return Path(warehouse_root) / "search" / f"{name}.sqlite"
+
+
+__all__ = [
+    "DEFAULT_SEARCH_COLUMNS",
+    "DEFAULT_SEARCH_LIMIT",
+    "SyncReport",
+    "TextIndex",
+    "fts_query",
+    "index_path",
+]
@@ -0,0 +1,536 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import re
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from loguru import logger
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    Retrying,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+from .http_cache import CACHE_MODES, CachedResponse, ResponseCache
+
+DEFAULT_TIMEOUT_S = 30.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# methods safe to resend after the server may have acted on them (e.g. not POST)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# failures before the request left the client, so even a POST can be sent again
+_UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def limits_from_env() -> httpx.Limits:
+    """Connection pool limits; override with MCP_HTTP_MAX_CONNECTIONS,
+    MCP_HTTP_MAX_KEEPALIVE and MCP_HTTP_KEEPALIVE_EXPIRY (seconds)."""
+    return httpx.Limits(
+        max_connections=_env_int("MCP_HTTP_MAX_CONNECTIONS", 20),
+        max_keepalive_connections=_env_int("MCP_HTTP_MAX_KEEPALIVE", 10),
+        keepalive_expiry=_env_float("MCP_HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (`uv add 'httpx[http2]'`)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def rate_from_env() -> float:
+    """Requests per second allowed per endpoint (MCP_HTTP_RATE, default 5)."""
+    return max(_env_float("MCP_HTTP_RATE", 5.0), 0.01)
+
+
+def retries_from_env() -> int:
+    """Attempts per request including the first (MCP_HTTP_MAX_ATTEMPTS, default 5)."""
+    return max(_env_int("MCP_HTTP_MAX_ATTEMPTS", 5), 1)
+
+
+def _header_seconds(value: Optional[str], *, epoch_ok: bool = False) -> Optional[float]:
+    """Seconds from now encoded by a delay header (delta seconds, epoch or HTTP date)."""
+    if not value:
+        return None
+    try:
+        secs = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    # X-RateLimit-Reset is an epoch timestamp at some providers, a delta at others
+    if epoch_ok and secs > 1e9:
+        secs -= time.time()
+    return max(secs, 0.0)
+
+
+def retry_after(resp: httpx.Response) -> Optional[float]:
+    """Server-requested pause before the next request, if the response carries one."""
+    wait = _header_seconds(resp.headers.get("Retry-After"))
+    if wait is not None:
+        return wait
+    if resp.headers.get("X-RateLimit-Remaining", "").strip() == "0":
+        return _header_seconds(resp.headers.get("X-RateLimit-Reset"), epoch_ok=True)
+    return None
+
+
+class TokenBucket:
+    """Per-endpoint token bucket with AIMD rate adaptation.
+
+    Tokens refill at `rate` per second up to `burst`. A throttled response halves the
+    rate (down to `min_rate`) and pauses the bucket for the server's Retry-After; each
+    success adds back `max_rate / 20` so throughput climbs back to the provider's limit.
+    `reserve()` books a token and returns how long the caller must wait for it, so the
+    same bucket serves threads and event loops.
+    """
+
+    def __init__(self, rate: float, *, burst: Optional[float] = None, min_rate: float = 0.1):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def throttled(self, pause_s: Optional[float]) -> None:
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if pause_s:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause_s)
+
+    def succeeded(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    ok: int = 0
+    retries: int = 0
+    throttled: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    revalidated: int = 0
+    wait_s: float = 0.0
+    first: float = 0.0
+    last: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Successful requests per second over the endpoint's active window (>= 1s)."""
+        return self.ok / max(self.last - self.first, 1.0)
+
+
+class _Retryable(Exception):
+    def __init__(self, resp: httpx.Response) -> None:
+        super().__init__(f"HTTP {resp.status_code}")
+        self.response = resp
+
+
+_ID_SEGMENT_RE = re.compile(r"^(?:\d+|[0-9a-fA-F-]{16,})$")
+
+
+def _endpoint(method: str, url: str) -> str:
+    """Rate-limit/stats key: method, host and path with id-like segments collapsed.
+
+    Job status URLs such as `/v1/crawl/<uuid>` share one bucket, as providers limit
+    them per route.
+    """
+    parts = urlsplit(url)
+    segments = [":id" if _ID_SEGMENT_RE.match(seg) else seg for seg in parts.path.split("/")]
+    path = "/".join(segments).rstrip("/") or "/"
+    return f"{method.upper()} {parts.netloc.lower()}{path}"
+
+
+class HttpSession:
+    """Pooled, keep-alive HTTP clients shared by the MCP API clients.
+
+    One `httpx.Client` serves synchronous calls; async calls get one `httpx.AsyncClient`
+    per running event loop (httpx pools cannot cross loops). Both negotiate HTTP/2 when
+    `h2` is installed. Pass `transport`/`async_transport` (e.g. `httpx.MockTransport`)
+    to route requests to a fake server.
+
+    With a `cache`, requests made with `cacheable=True` go through it according to
+    `cache_mode`: `use` serves fresh entries and revalidates stale ones, `refresh`
+    always fetches and overwrites, `off` bypasses the cache.
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout_s: float = DEFAULT_TIMEOUT_S,
+        limits: Optional[httpx.Limits] = None,
+        http2: Optional[bool] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+        rate: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        cache_mode: str = "use",
+    ) -> None:
+        if cache_mode not in CACHE_MODES:
+            raise ValueError(
+                f"Unknown cache mode: {cache_mode} (choose from {', '.join(CACHE_MODES)})"
+            )
+        self.timeout = httpx.Timeout(timeout_s)
+        self.limits = limits or limits_from_env()
+        self.http2 = http2_available() if http2 is None else http2
+        self._transport = transport
+        self._async_transport = async_transport
+        self._client: Optional[httpx.Client] = None
+        self._async: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.rate = rate or rate_from_env()
+        self.max_attempts = max_attempts or retries_from_env()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, EndpointStats] = {}
+        self.cache = cache
+        self.cache_mode = cache_mode
+
+    def client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None or self._client.is_closed:
+                self._client = httpx.Client(
+                    timeout=self.timeout,
+                    limits=self.limits,
+                    http2=self.http2,
+                    transport=self._transport,
+                )
+            return self._client
+
+    def async_client(self) -> httpx.AsyncClient:
+        """The AsyncClient bound to the running event loop (created on first use)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=self.limits,
+                    http2=self.http2,
+                    transport=self._async_transport,
+                )
+                self._async[loop] = client
+            return client
+
+    def _endpoint_state(self, endpoint: str) -> Tuple[TokenBucket, EndpointStats]:
+        with self._lock:
+            if endpoint not in self._buckets:
+                self._buckets[endpoint] = TokenBucket(self.rate)
+                self._stats[endpoint] = EndpointStats()
+            return self._buckets[endpoint], self._stats[endpoint]
+
+    def _before(self, endpoint: str) -> float:
+        """Book a rate-limit token; returns the wait before sending."""
+        bucket, stats = self._endpoint_state(endpoint)
+        wait = bucket.reserve()
+        with self._lock:
+            stats.requests += 1
+            stats.wait_s += wait
+            stats.first = stats.first or time.monotonic() + wait
+        return wait
+
+    def _after(
+        self, endpoint: str, resp: httpx.Response, *, idempotent: bool = True
+    ) -> httpx.Response:
+        """Feed the response back into the limiter; raise `_Retryable` to send it again.
+
+        429 (refused, not processed) is always retried, 5xx only for idempotent requests.
+        Only successes speed the bucket up; any other final status counts as an error.
+        """
+        bucket, stats = self._endpoint_state(endpoint)
+        if resp.status_code in RETRY_STATUSES:
+            pause = retry_after(resp)
+            if resp.status_code == 429:
+                bucket.throttled(pause)
+                with self._lock:
+                    stats.throttled += 1
+            elif pause:
+                bucket.throttled(pause)
+            if resp.status_code == 429 or idempotent:
+                raise _Retryable(resp)
+        with self._lock:
+            if resp.status_code < 400:
+                stats.ok += 1
+                stats.last = time.monotonic()
+            else:  # a final error response: nothing to retry, but the request failed
+                stats.errors += 1
+        if resp.status_code < 400:
+            bucket.succeeded()
+        return resp
+
+    def _retry_kwargs(self, endpoint: str, *, idempotent: bool = True) -> Dict[str, Any]:
+        stats = self._endpoint_state(endpoint)[1]
+        retryable = (
+            (_Retryable, httpx.TransportError) if idempotent else (_Retryable, *_UNSENT_ERRORS)
+        )
+
+        def should_retry(state: RetryCallState) -> bool:
+            exc = state.outcome.exception() if state.outcome else None
+            if isinstance(exc, retryable):
+                return True
+            if isinstance(exc, httpx.TransportError):  # may have reached the server
+                with self._lock:
+                    stats.errors += 1
+            return False
+
+        def before_sleep(state: RetryCallState) -> None:
+            with self._lock:
+                stats.retries += 1
+            exc = state.outcome.exception() if state.outcome else None
+            logger.debug(f"Retrying {endpoint} after {exc} (attempt {state.attempt_number})")
+
+        def give_up(state: RetryCallState) -> httpx.Response:
+            with self._lock:
+                stats.errors += 1
+            exc = state.outcome.exception() if state.outcome else None
+            if isinstance(exc, _Retryable):
+                return exc.response
+            assert exc is not None
+            raise exc
+
+        # the limiter already honours Retry-After, so backoff only adds jittered spacing
+        return dict(
+            retry=should_retry,
+            wait=wait_random_exponential(multiplier=0.5, max=30),
+            stop=stop_after_attempt(self.max_attempts),
+            before_sleep=before_sleep,
+            retry_error_callback=give_up,
+        )
+
+    def _cache_lookup(
+        self, method: str, url: str, kwargs: Dict[str, Any]
+    ) -> Tuple[Optional[str], Optional[CachedResponse], bool]:
+        """Resolve the cache entry for a request: (key, entry, fresh).
+
+        Adds conditional headers to `kwargs` when a stale entry can be revalidated.
+        """
+        if self.cache is None or self.cache_mode == "off":
+            return None, None, False
+        key = self.cache.key(
+            method,
+            url,
+            params=kwargs.get("params"),
+            json_body=kwargs.get("json"),
+            content=kwargs.get("content"),
+        )
+        if self.cache_mode == "refresh":
+            return key, None, False
+        entry = self.cache.get(key)
+        if entry is None:
+            return key, None, False
+        if entry.age() < self.cache.ttl(url):
+            return key, entry, True
+        conditional = {}
+        if entry.etag:
+            conditional["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            conditional["If-Modified-Since"] = entry.last_modified
+        if not conditional:
+            return key, None, False
+        kwargs["headers"] = {**(kwargs.get("headers") or {}), **conditional}
+        return key, entry, False
+
+    def _cache_store(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        key: Optional[str],
+        entry: Optional[CachedResponse],
+        resp: httpx.Response,
+    ) -> httpx.Response:
+        if key is None or self.cache is None:
+            return resp
+        if resp.status_code == 304 and entry is not None:
+            self.cache.touch(key, entry, resp)
+            with self._lock:
+                self._stats[endpoint].revalidated += 1
+            return entry.to_response(method, url)
+        self.cache.put(key, resp)
+        return resp
+
+    def _cache_hit(
+        self, endpoint: str, method: str, url: str, entry: CachedResponse
+    ) -> httpx.Response:
+        self._endpoint_state(endpoint)
+        with self._lock:
+            self._stats[endpoint].cache_hits += 1
+        return entry.to_response(method, url)
+
+    def cached_result(self, method: str, url: str, **kwargs: Any) -> Optional[httpx.Response]:
+        """A fresh cached response for the request without sending it (`use` mode only).
+
+        Pairs with `store_result` for results that are not the response of one request,
+        e.g. the pages of a finished crawl job keyed by the submission that started it.
+        """
+        if self.cache is None or self.cache_mode != "use":
+            return None
+        key = self.cache.key(method, url, params=kwargs.get("params"), json_body=kwargs.get("json"))
+        entry = self.cache.get(key)
+        if entry is None or entry.age() >= self.cache.ttl(url):
+            return None
+        return self._cache_hit(_endpoint(method, url), method, url, entry)
+
+    def store_result(self, method: str, url: str, data: Any, **kwargs: Any) -> None:
+        """Cache `data` as the JSON response to the request (unless the cache is off)."""
+        if self.cache is None or self.cache_mode == "off":
+            return
+        key = self.cache.key(method, url, params=kwargs.get("params"), json_body=kwargs.get("json"))
+        resp = httpx.Response(200, json=data, request=httpx.Request(method, url))
+        self.cache.put(key, resp)
+
+    def request(
+        self, method: str, url: str, *, cacheable: bool = False, **kwargs: Any
+    ) -> httpx.Response:
+        """Rate-limited request on the pooled client, retrying 429/5xx and transport errors.
+
+        Non-idempotent methods (POST, PATCH) are only retried on 429 and on failures to
+        connect, so a request the server may have acted on (e.g. a crawl submission) is
+        never sent twice. After the last attempt a retryable error response is returned
+        as-is; transport errors are raised. `cacheable=True` routes the request through
+        `cache`.
+        """
+        endpoint = _endpoint(method, url)
+        key, entry, fresh = (
+            self._cache_lookup(method, url, kwargs) if cacheable else (None, None, False)
+        )
+        if entry is not None and fresh:
+            return self._cache_hit(endpoint, method, url, entry)
+        client = self.client()
+
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        def attempt() -> httpx.Response:
+            time.sleep(self._before(endpoint))
+            resp = client.request(method, url, **kwargs)
+            return self._after(endpoint, resp, idempotent=idempotent)
+
+        retrying = Retrying(**self._retry_kwargs(endpoint, idempotent=idempotent))
+        resp: httpx.Response = retrying(attempt)
+        return self._cache_store(endpoint, method, url, key, entry, resp)
+
+    async def arequest(
+        self, method: str, url: str, *, cacheable: bool = False, **kwargs: Any
+    ) -> httpx.Response:
+        """Async `request` on the running loop's AsyncClient."""
+        endpoint = _endpoint(method, url)
+        key, entry, fresh = (
+            self._cache_lookup(method, url, kwargs) if cacheable else (None, None, False)
+        )
+        if entry is not None and fresh:
+            return self._cache_hit(endpoint, method, url, entry)
+        client = self.async_client()
+
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        async def attempt() -> httpx.Response:
+            await asyncio.sleep(self._before(endpoint))
+            resp = await client.request(method, url, **kwargs)
+            return self._after(endpoint, resp, idempotent=idempotent)
+
+        retrying = AsyncRetrying(**self._retry_kwargs(endpoint, idempotent=idempotent))
+        resp: httpx.Response = await retrying(attempt)
+        return self._cache_store(endpoint, method, url, key, entry, resp)
+
+    def stats(self) -> Dict[str, EndpointStats]:
+        with self._lock:
+            return dict(self._stats)
+
+    def log_stats(self) -> None:
+        for endpoint, st in self.stats().items():
+            logger.info(
+                f"{endpoint}: {st.ok} ok / {st.requests} sent, {st.retries} retries, "
+                f"{st.throttled} throttled, {st.errors} failed, {st.throughput:.2f} req/s, "
+                f"{st.wait_s:.1f}s rate-limited, {st.cache_hits} cache hits, "
+                f"{st.revalidated} revalidated"
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        """Close the running loop's AsyncClient; call before the loop ends."""
+        client = self._async.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def __enter__(self) -> HttpSession:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+_default: Optional[HttpSession] = None
+_default_lock = threading.Lock()
+
+
+def default_session() -> HttpSession:
+    """Process-wide session used when a client function gets no `session`."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HttpSession()
+        return _default
+
+
+__all__ = [
+    "EndpointStats",
+    "HttpSession",
+    "TokenBucket",
+    "default_session",
+    "http2_available",
+    "limits_from_env",
+    "rate_from_env",
+    "retries_from_env",
+    "retry_after",
+]
@@ -1,22 +1,617 @@
 from __future__ import annotations
 
+import glob
+import hashlib
 import json
-from dataclasses import dataclass
+import operator
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, cast
+from types import TracebackType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    cast,
+    overload,
+)
 
 import duckdb
 import pandas as pd
+from loguru import logger
+
+from .dedupe import (
+    DEFAULT_TEXT_COLUMNS,
+    DEFAULT_THRESHOLD,
+    NearDupIndex,
+    index_path,
+    page_text,
+    remove_index,
+)
+from .file_stats import (
+    ColumnStats,
+    arrow_stats,
+    can_skip,
+    entry_is_current,
+    file_entry,
+    frame_stats,
+    merge_stats,
+    parquet_stats,
+    typed_value,
+)
+from .search import DEFAULT_SEARCH_COLUMNS, DEFAULT_SEARCH_LIMIT, TextIndex, fts_query
+from .search import index_path as search_index_path
+
+if sys.platform != "win32":
+    import fcntl
 
 DEFAULT_DATASET_FORMAT = "csv"  # csv | jsonl | parquet (requires pyarrow)
 TIMESTAMP_FMT = "%Y%m%d_%H%M%S%f"
+DEFAULT_BATCH_ROWS = 65_536
+DEFAULT_TARGET_FILE_BYTES = 256 * 1024 * 1024
+DEFAULT_ROW_GROUP_ROWS = 128 * 1024
+VIEW_PREFIX = "ds_"
+HIVE_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+TMP_SUFFIX = ".tmp"  # in-progress files; never matched by the `*.<ext>` scans
+COMPACTION_MARKER = "_compaction.json"
+DEFAULT_SQL_CACHE_BYTES = 512 * 1024 * 1024
+DEFAULT_FLUSH_BYTES = 64 * 1024 * 1024
+# string columns with at most this share of distinct values get a Parquet dictionary
+DICTIONARY_MAX_RATIO = 0.2
+PARQUET_CODECS = ("zstd", "snappy", "gzip", "brotli", "lz4", "none")
+
+# functions (and bare keywords like current_date) whose result changes between runs
+_VOLATILE_SQL = frozenset(
+    {
+        "now",
+        "today",
+        "current_date",
+        "current_time",
+        "current_timestamp",
+        "get_current_time",
+        "get_current_timestamp",
+        "localtime",
+        "localtimestamp",
+        "transaction_timestamp",
+        "random",
+        "setseed",
+        "uuid",
+        "gen_random_uuid",
+        "nextval",
+        "currval",
+        "getenv",
+    }
+)
+# flock does not see holders in the same process (each open() is its own lock), so
+# dataset lock holders are also tracked here: lock path -> thread id -> (shared, exclusive)
+_LOCK_HOLDERS: Dict[str, Dict[int, List[int]]] = {}
+_LOCK_HOLDERS_CHANGED = threading.Condition()
+# how long a conflicting request waits for other threads of this process to let go
+IN_PROCESS_LOCK_WAIT_S = 30.0
+_VIEW_REF_RE = re.compile(rf"\b{VIEW_PREFIX}(\w+)", re.IGNORECASE)
+# quoted literals/identifiers are kept verbatim when normalizing query text
+_SQL_TOKEN_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(\s+)")
+
+# (relative path, size, mtime_ns) for every file backing a view
+FileSignature = Tuple[Tuple[str, int, int], ...]
+# (column, op, value), e.g. ("date", ">=", "2025-01-01") or ("source", "in", ["a", "b"])
+Filter = Tuple[str, str, Any]
+
+_COMPARE_OPS: Dict[str, Callable[[Any, Any], Any]] = {
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+_FILTER_OPS = set(_COMPARE_OPS) | {"in", "not in"}
+# json_serialize_sql comparison node types -> filter operators (column on the left)
+_SQL_COMPARE_OPS = {
+    "COMPARE_EQUAL": "=",
+    "COMPARE_NOTEQUAL": "!=",
+    "COMPARE_LESSTHAN": "<",
+    "COMPARE_LESSTHANOREQUALTO": "<=",
+    "COMPARE_GREATERTHAN": ">",
+    "COMPARE_GREATERTHANOREQUALTO": ">=",
+}
+_FLIPPED_OPS = {"=": "=", "!=": "!=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+# aggregates whose partial results merge with another aggregate (count partials add up)
+_MERGE_AGGREGATES = {"count_star": "sum", "count": "sum", "sum": "sum", "min": "min", "max": "max"}
+_SQL_CONSTANT_TYPES = {"BOOLEAN", "TINYINT", "SMALLINT", "INTEGER", "BIGINT", "DOUBLE", "VARCHAR"}
 
 
 def _now_stamp() -> str:
     return datetime.utcnow().strftime(TIMESTAMP_FMT)
 
 
+def _sql_str(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _normalize_sql(query: str) -> str:
+    """Collapse whitespace outside quotes and drop trailing semicolons (cache key text)."""
+    text = _SQL_TOKEN_RE.sub(lambda m: m.group(1) or " ", query.strip())
+    return text.rstrip("; ")
+
+
+def _scan_sql(fmt: str, source: str, *, hive: Optional[bool] = None, union: bool = False) -> str:
+    """Return a DuckDB table function call reading `source` (a SQL path/glob/list literal).
+
+    With `hive=True` the `key=value` directories become columns DuckDB can prune on,
+    `hive=False` keeps them out (None leaves DuckDB's auto-detection on);
+    `union=True` matches columns across files by name instead of position.
+    """
+    opts = "" if hive is None else f", hive_partitioning = {str(hive).lower()}"
+    opts += ", union_by_name = true" if union else ""
+    if fmt == "parquet":
+        return f"read_parquet({source}{opts})"
+    if fmt == "csv":
+        return f"read_csv_auto({source}{opts})"
+    if fmt == "jsonl":
+        return f"read_json({source}, format='newline_delimited'{opts})"
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _hive_partition(rel: Path) -> Dict[str, str]:
+    """Parse `key=value` directory components of a path relative to the dataset root."""
+    part = {}
+    for comp in rel.parent.parts:
+        if "=" in comp:
+            k, v = comp.split("=", 1)
+            part[k] = v
+    return part
+
+
+def _partition_value(value: Any) -> str:
+    """Directory-safe string for a partition value (Hive's default name for nulls).
+
+    Dates stay ISO (`2025-01-01`); times drop their colons (`2025-01-01T093000+0000`), which
+    are not allowed in Windows paths and are glob-special, and still parse with
+    `datetime.fromisoformat`.
+    """
+    if value is None or (isinstance(value, float) and value != value) or value is pd.NaT:
+        return HIVE_NULL_PARTITION
+    text = value.isoformat().replace(":", "") if hasattr(value, "isoformat") else str(value)
+    if "/" in text or "\\" in text or text in ("", ".", ".."):
+        raise ValueError(f"Invalid partition value: {value!r}")
+    return text
+
+
+def _validate_filters(filters: List[Filter]) -> None:
+    for col, op, _ in filters:
+        if op not in _FILTER_OPS:
+            raise ValueError(f"Unsupported filter operator for '{col}': {op}")
+
+
+def _coerce_like(raw: str, value: Any) -> Any:
+    """Convert a partition path value to the type of the filter operand when possible."""
+    sample = next(iter(value), None) if isinstance(value, (list, tuple, set)) else value
+    if isinstance(sample, bool) or not isinstance(sample, (int, float)):
+        return raw
+    try:
+        return type(sample)(raw)
+    except ValueError:
+        return raw
+
+
+def _match_value(left: Any, op: str, right: Any) -> bool:
+    if op == "in":
+        return left in right
+    if op == "not in":
+        return left not in right
+    try:
+        return bool(_COMPARE_OPS[op](left, right))
+    except TypeError:
+        return False
+
+
+# raw partition directory value, op, filter operand -> can the directory hold matches?
+PartitionMatcher = Callable[[str, str, Any], bool]
+
+
+def _partition_matches(raw: str, op: str, value: Any) -> bool:
+    """`iter_batches` semantics: the directory value converted to the operand's type."""
+    return _match_value(_coerce_like(raw, value), op, value)
+
+
+def _hive_typed(text: str) -> Any:
+    """A partition value as DuckDB's hive type detection reads it (the text if untyped)."""
+    for parse in (int, float):
+        try:
+            return parse(text)
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _sql_partition_may_match(raw: str, op: str, value: Any) -> bool:
+    """Whether a `ds_` view query could match rows under a `key=raw` directory.
+
+    DuckDB types hive columns and casts operands to them, so the directory is only ruled
+    out when Python compares the same way: both untyped text, both numbers, or
+    timestamps spelled in the same format. Anything else may match.
+    """
+    left = _hive_typed(raw)
+    operands = list(value) if op in ("in", "not in") else [value]
+
+    def comparable(v: Any) -> Any:
+        right = _hive_typed(v) if isinstance(v, str) else v
+        if isinstance(left, str) and isinstance(v, str):
+            return v
+        if isinstance(right, bool) or isinstance(left, str):
+            return None
+        if isinstance(left, (int, float)) and isinstance(right, (int, float)):
+            return right
+        if isinstance(left, datetime) and isinstance(right, datetime):
+            return right if isinstance(v, str) and len(v) == len(raw) else None
+        return None
+
+    converted = [comparable(v) for v in operands]
+    if any(v is None for v in converted):
+        return True
+    right = converted if op in ("in", "not in") else converted[0]
+    return _match_value(raw if isinstance(left, str) else left, op, right)
+
+
+def _arrow_operand(value: Any, column_type: Any) -> Any:
+    """Cast a string operand to a temporal column's type (Arrow has no mixed kernels)."""
+    import pyarrow as pa
+
+    if not isinstance(value, str) or column_type is None:
+        return value
+    if not (pa.types.is_timestamp(column_type) or pa.types.is_date(column_type)):
+        return value
+    try:
+        return pa.scalar(value).cast(column_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return value
+
+
+def _arrow_expression(filters: List[Filter], schema: Any = None) -> Any:
+    """Translate filters into a pyarrow compute expression (None when empty).
+
+    With the file's `schema`, string operands on timestamp/date columns are parsed
+    into that type (ISO strings with a `T` or a space both work).
+    """
+    import pyarrow.compute as pc
+
+    expr = None
+    for col, op, value in filters:
+        field = pc.field(col)
+        if schema is not None and col in schema.names:
+            kind = schema.field(col).type
+            if op in ("in", "not in"):
+                value = [_arrow_operand(v, kind) for v in value]
+            else:
+                value = _arrow_operand(value, kind)
+        if op == "in":
+            term = field.isin(list(value))
+        elif op == "not in":
+            term = ~field.isin(list(value))
+        else:
+            term = _COMPARE_OPS[op](field, value)
+        expr = term if expr is None else expr & term
+    return expr
+
+
+def _finish_batch(
+    batch: Any, part: Dict[str, str], columns: Optional[List[str]], arrow: bool
+) -> Any:
+    """Attach partition columns, apply the projection and convert to the output type."""
+    if arrow:
+        import pyarrow as pa
+
+        if isinstance(batch, pd.DataFrame):
+            batch = pa.RecordBatch.from_pandas(batch, preserve_index=False)
+        for k, v in part.items():
+            if k not in batch.schema.names:
+                batch = batch.append_column(k, pa.array([v] * batch.num_rows, pa.string()))
+        return batch.select(columns) if columns else batch
+    df = batch if isinstance(batch, pd.DataFrame) else batch.to_pandas()
+    for k, v in part.items():
+        if k not in df.columns:
+            df[k] = v
+    return df[columns] if columns else df
+
+
+def _arrow_reader(rel: duckdb.DuckDBPyRelation, batch_rows: int) -> Any:
+    # DuckDB 1.5 renamed fetch_arrow_reader to to_arrow_reader
+    to_reader = getattr(rel, "to_arrow_reader", None) or rel.fetch_arrow_reader
+    return to_reader(batch_rows)
+
+
+def _file_columns(
+    columns: Optional[List[str]], part: Dict[str, str], row_filters: List[Filter], fmt: str
+) -> Optional[List[str]]:
+    """Columns to read from a file's payload for `columns`, or None to read all of them.
+
+    Partition keys come from the path. The Parquet scanner evaluates filters on columns
+    outside the projection; CSV/JSONL need the filter columns parsed as well.
+    """
+    if not columns:
+        return None
+    needed = [c for c in columns if c not in part]
+    if fmt != "parquet":
+        needed += [col for col, _, _ in row_filters if col not in needed]
+    return needed or None
+
+
+def _sql_constant(node: Dict[str, Any]) -> Tuple[bool, Any]:
+    if node.get("class") != "CONSTANT":
+        return False, None
+    value = node["value"]
+    if value.get("is_null") or value["type"]["id"] not in _SQL_CONSTANT_TYPES:
+        return False, None
+    return True, value["value"]
+
+
+def _sql_column(node: Dict[str, Any]) -> Optional[str]:
+    if node.get("class") != "COLUMN_REF":
+        return None
+    return cast(str, node["column_names"][-1])
+
+
+def _ast_nodes(node: Any) -> Iterator[Dict[str, Any]]:
+    """Every JSON object in a serialized SQL AST, depth first."""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _ast_nodes(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _ast_nodes(item)
+
+
+def _where_filters(node: Optional[Dict[str, Any]]) -> List[Filter]:
+    """Collect `column op constant` terms from the top-level AND chain of a WHERE clause."""
+    if not node:
+        return []
+    if node.get("type") == "CONJUNCTION_AND":
+        return [f for child in node["children"] for f in _where_filters(child)]
+    kind = node.get("type")
+    if kind in _SQL_COMPARE_OPS:
+        op = _SQL_COMPARE_OPS[kind]
+        col, (is_const, value) = _sql_column(node["left"]), _sql_constant(node["right"])
+        if col is None:
+            col, (is_const, value) = _sql_column(node["right"]), _sql_constant(node["left"])
+            op = _FLIPPED_OPS[op]
+        return [(col, op, value)] if col and is_const else []
+    if kind == "COMPARE_BETWEEN":
+        col = _sql_column(node["input"])
+        (lo_ok, lo), (hi_ok, hi) = _sql_constant(node["lower"]), _sql_constant(node["upper"])
+        return [(col, ">=", lo), (col, "<=", hi)] if col and lo_ok and hi_ok else []
+    if kind == "COMPARE_IN":
+        col = _sql_column(node["children"][0])
+        consts = [_sql_constant(c) for c in node["children"][1:]]
+        if col and consts and all(ok for ok, _ in consts):
+            return [(col, "in", [v for _, v in consts])]
+    return []
+
+
+def _strip_locations(node: Any) -> Any:
+    """An AST node without aliases/source positions, for structural comparison."""
+    if isinstance(node, dict):
+        return {
+            k: _strip_locations(v) for k, v in node.items() if k not in ("alias", "query_location")
+        }
+    if isinstance(node, list):
+        return [_strip_locations(v) for v in node]
+    return node
+
+
+def _merge_plan(node: Dict[str, Any]) -> Optional[List[Optional[str]]]:
+    """How to merge partial results of an aggregate SELECT, per output column.
+
+    Returns None for a group key column or the merging aggregate (`sum`/`min`/`max`),
+    or None overall when the query is not a plain GROUP BY over mergeable aggregates.
+    """
+    if node.get("type") != "SELECT_NODE" or (node.get("cte_map") or {}).get("map"):
+        return None
+    if (node.get("from_table") or {}).get("type") != "BASE_TABLE":
+        return None
+    if node.get("having") or node.get("qualify") or node.get("sample"):
+        return None
+    if node.get("aggregate_handling") != "STANDARD_HANDLING" or len(node["group_sets"]) > 1:
+        return None
+    if any(m.get("type") != "ORDER_MODIFIER" for m in node.get("modifiers") or []):
+        return None  # LIMIT/DISTINCT results cannot be combined
+    groups = [_strip_locations(g) for g in node.get("group_expressions") or []]
+    plan: List[Optional[str]] = []
+    seen = []
+    for item in node["select_list"]:
+        stripped = _strip_locations(item)
+        if stripped in groups:
+            plan.append(None)
+            seen.append(stripped)
+            continue
+        merge = _MERGE_AGGREGATES.get(item.get("function_name", ""))
+        if item.get("class") != "FUNCTION" or merge is None:
+            return None
+        if (
+            item.get("distinct")
+            or item.get("filter")
+            or (item.get("order_bys") or {}).get("orders")
+        ):
+            return None
+        plan.append(merge)
+    # every group key must be an output column, or merged rows would collapse groups
+    if any(g not in seen for g in groups) or not any(plan):
+        return None
+    return plan
+
+
+def _sql_literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return _sql_str(str(value))
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_name(path.name + TMP_SUFFIX)
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _conform(batch: Any, schema: Any) -> Any:
+    """Cast a RecordBatch to `schema`, filling columns it lacks with nulls."""
+    import pyarrow as pa
+
+    arrays = []
+    for f in schema:
+        idx = batch.schema.get_field_index(f.name)
+        if idx < 0:
+            arrays.append(pa.nulls(batch.num_rows, f.type))
+        else:
+            arrays.append(batch.column(idx).cast(f.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+@contextmanager
+def _discard_uncommitted(out_dir: Path, prefix: str) -> Iterator[Callable[[], None]]:
+    """Delete `<prefix>*.tmp` outputs in `out_dir` if the block fails before `commit()`.
+
+    Call `commit()` once the swap marker naming the outputs is written; from then on
+    an interrupted swap is completed by recovery, so the outputs must stay.
+    """
+    committed = False
+
+    def commit() -> None:
+        nonlocal committed
+        committed = True
+
+    try:
+        yield commit
+    except BaseException:
+        if not committed:
+            for p in out_dir.glob(f"{prefix}*{TMP_SUFFIX}"):
+                p.unlink(missing_ok=True)
+        raise
+
+
+def _write_parquet_files(
+    batches: Iterable[Any],
+    schema: Any,
+    out_dir: Path,
+    prefix: str,
+    *,
+    target_bytes: int,
+    row_group_rows: int,
+    **write_opts: Any,
+) -> List[str]:
+    """Write `batches` into `<prefix>_NNNN.parquet.tmp` files of about `target_bytes` each.
+
+    Batches are buffered into row groups of `row_group_rows` rows. Returns the final
+    (non-tmp) file names; the caller makes them visible by renaming.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    names: List[str] = []
+    writer: Any = None
+    tmp: Optional[Path] = None
+    buffered: List[Any] = []
+    rows = 0
+
+    def flush() -> None:
+        nonlocal writer, tmp, buffered, rows
+        if not buffered:
+            return
+        if writer is None:
+            names.append(f"{prefix}_{len(names):04d}.parquet")
+            tmp = out_dir / (names[-1] + TMP_SUFFIX)
+            writer = pq.ParquetWriter(str(tmp), schema, **write_opts)
+        writer.write_table(pa.Table.from_batches(buffered, schema), row_group_size=row_group_rows)
+        buffered, rows = [], 0
+        if tmp is not None and tmp.stat().st_size >= target_bytes:
+            writer.close()
+            writer = None
+
+    try:
+        for batch in batches:
+            batch = _conform(batch, schema)
+            while batch.num_rows:
+                take = min(batch.num_rows, row_group_rows - rows)
+                buffered.append(batch.slice(0, take))
+                rows += take
+                batch = batch.slice(take)
+                if rows >= row_group_rows:
+                    flush()
+        flush()
+    finally:
+        if writer is not None:
+            writer.close()
+    return names
+
+
+def _arrow_batches(data: Any, batch_rows: int) -> Tuple[Any, Iterator[Any]]:
+    """Normalize Arrow-compatible input into `(schema, iterator of RecordBatches)`.
+
+    Accepts a `pyarrow.Table`, a `RecordBatch`, a `RecordBatchReader`, a DuckDB relation
+    or any iterable of RecordBatches (whose schema is taken from the first batch).
+    """
+    import pyarrow as pa
+
+    if isinstance(data, duckdb.DuckDBPyRelation):
+        data = _arrow_reader(data, batch_rows)
+    if isinstance(data, pa.Table):
+        return data.schema, iter(data.to_batches(max_chunksize=batch_rows))
+    if isinstance(data, pa.RecordBatch):
+        return data.schema, iter([data])
+    if isinstance(data, pa.RecordBatchReader):
+        return data.schema, iter(data)
+    it = iter(data)
+    first = next(it, None)
+    if first is None:
+        raise ValueError("No record batches to write")
+
+    def chained() -> Iterator[Any]:
+        yield first
+        yield from it
+
+    return first.schema, chained()
+
+
+def _filter_mask(df: pd.DataFrame, filters: List[Filter]) -> pd.Series:
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        if col not in df.columns:
+            raise KeyError(f"Filter column '{col}' not found")
+        series = df[col]
+        if op == "in":
+            mask &= series.isin(list(value))
+        elif op == "not in":
+            mask &= ~series.isin(list(value))
+        else:
+            mask &= _COMPARE_OPS[op](series, value)
+    return mask
+
+
 @dataclass
 class Dataset:
     name: str
@@ -30,25 +625,191 @@ class Dataset:
         }
 
 
+@dataclass
+class DatasetStats:
+    name: str
+    files: int = 0
+    rows: int = 0
+    bytes: int = 0
+
+
+@dataclass
+class CompactionReport:
+    name: str
+    partitions: int = 0
+    files_before: int = 0
+    bytes_before: int = 0
+    files_after: int = 0
+    bytes_after: int = 0
+    rewritten: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ConversionReport:
+    name: str
+    from_format: str
+    to_format: str
+    partitions: int = 0
+    rows: int = 0
+    files_before: int = 0
+    bytes_before: int = 0
+    files_after: int = 0
+    bytes_after: int = 0
+    scan_seconds_before: float = 0.0
+    scan_seconds_after: float = 0.0
+
+
+@dataclass
+class DedupeReport:
+    name: str
+    rows: int = 0
+    duplicates: int = 0
+    removed: int = 0
+    files: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class MaterializeReport:
+    name: str
+    mode: str  # "full" | "incremental"
+    files_scanned: int = 0
+    rows: int = 0
+    watermark: Any = None
+
+
 class Warehouse:
     """Filesystem-backed data warehouse with simple manifest and partitions.
 
     Layout:
     - warehouse/
       - manifest.json
+      - stats/<name>.json   (per-file rows, bytes and column min/max/null counts)
+      - cache/sql/<key>.parquet   (opt-in `sql(..., cache=True)` results)
       - datasets/
         - <name>/
           - key=value/ ... / file.ext
+
+    SQL runs on a long-lived DuckDB connection owned by the instance. `ds_<name>`
+    views are created lazily for the datasets a query references and rebuilt only
+    when the dataset's manifest entry or backing files change. Use the warehouse as
+    a context manager (or call `close()`) to release the connection.
+
+    Readers hold a shared per-dataset lock (`warehouse/locks/<name>.lock`) while they
+    list and scan files; maintenance such as `compact` swaps files under the exclusive
+    lock, so a reader sees either the old or the new file set, never a mix.
     """
 
-    def __init__(self, base_path: Path | str = Path("warehouse")) -> None:
+    def __init__(
+        self,
+        base_path: Path | str = Path("warehouse"),
+        *,
+        cache_max_bytes: int = DEFAULT_SQL_CACHE_BYTES,
+    ) -> None:
         self.base_path = Path(base_path)
         self.datasets_path = self.base_path / "datasets"
         self.manifest_path = self.base_path / "manifest.json"
+        self.stats_path = self.base_path / "stats"
+        self.sql_cache_path = self.base_path / "cache" / "sql"
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.base_path.mkdir(parents=True, exist_ok=True)
         self.datasets_path.mkdir(parents=True, exist_ok=True)
         if not self.manifest_path.exists():
             self._write_manifest({"datasets": {}})
+        self._con: Optional[duckdb.DuckDBPyConnection] = None
+        self._views: Dict[str, Tuple[Any, ...]] = {}
+        self._lock = threading.RLock()
+
+    def __enter__(self) -> Warehouse:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the DuckDB connection and forget the view catalog."""
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+            self._con = None
+            self._views.clear()
+
+    @contextmanager
+    def _dataset_lock(
+        self, name: str, *, exclusive: bool = False, kind: str = "lock"
+    ) -> Iterator[None]:
+        """Hold an inter-process file lock on `name` (no-op on Windows, which lacks flock).
+
+        A request that conflicts with a lock this thread already holds (e.g. compacting
+        while one of its own readers is open) raises `RuntimeError` instead of blocking
+        forever; one held by another thread of the process is waited for, up to
+        `IN_PROCESS_LOCK_WAIT_S`.
+        """
+        if sys.platform == "win32":
+            yield
+            return
+        path = self.base_path / "locks" / f"{name}.{kind}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        key, me = str(path.resolve()), threading.get_ident()
+        with _LOCK_HOLDERS_CHANGED:
+
+            def conflicts(holders: Dict[int, List[int]]) -> bool:
+                return any(excl or (exclusive and shared) for shared, excl in holders.values())
+
+            holders = _LOCK_HOLDERS.setdefault(key, {})
+            if me in holders and conflicts({me: holders[me]}):
+                raise RuntimeError(self._lock_conflict(name, exclusive))
+            if not _LOCK_HOLDERS_CHANGED.wait_for(
+                lambda: not conflicts(holders), timeout=IN_PROCESS_LOCK_WAIT_S
+            ):
+                raise RuntimeError(self._lock_conflict(name, exclusive))
+            holders = _LOCK_HOLDERS.setdefault(key, holders)  # may have been dropped meanwhile
+            counts = holders.setdefault(me, [0, 0])
+            counts[exclusive] += 1
+        try:
+            with path.open("a") as fh:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+        finally:
+            with _LOCK_HOLDERS_CHANGED:
+                counts[exclusive] -= 1
+                if counts == [0, 0]:
+                    del holders[me]
+                    if not holders:
+                        _LOCK_HOLDERS.pop(key, None)
+                _LOCK_HOLDERS_CHANGED.notify_all()
+
+    def _check_lock(self, name: str, *, exclusive: bool = True, kind: str = "lock") -> None:
+        """Raise the error `_dataset_lock` would raise if this thread asked for it now.
+
+        Maintenance calls this before rewriting files, so a swap that cannot take the
+        exclusive lock fails before the work instead of after it.
+        """
+        if sys.platform == "win32":
+            return
+        key = str((self.base_path / "locks" / f"{name}.{kind}").resolve())
+        with _LOCK_HOLDERS_CHANGED:
+            mine = _LOCK_HOLDERS.get(key, {}).get(threading.get_ident())
+            if mine and (mine[1] or (exclusive and mine[0])):
+                raise RuntimeError(self._lock_conflict(name, exclusive))
+
+    @staticmethod
+    def _lock_conflict(name: str, exclusive: bool) -> str:
+        action = "modify" if exclusive else "read"
+        return (
+            f"Cannot {action} dataset '{name}': it is in use elsewhere in this process "
+            "(e.g. an unfinished iter_batches/sql_batches iterator). Finish or close it first."
+        )
 
     # Manifest handling
     def _read_manifest(self) -> Dict[str, Any]:
@@ -59,8 +820,7 @@ class Warehouse:
             return {"datasets": {}}
 
     def _write_manifest(self, manifest: Dict[str, Any]) -> None:
-        with self.manifest_path.open("w", encoding="utf-8") as f:
-            json.dump(manifest, f, indent=2)
+        _write_json_atomic(self.manifest_path, manifest)
 
     def list_datasets(self) -> Dict[str, Dataset]:
         manifest = self._read_manifest()
@@ -96,6 +856,62 @@ class Warehouse:
         (self.datasets_path / name).mkdir(parents=True, exist_ok=True)
         return ds
 
+    # Per-file statistics index
+    def _read_stats(self, name: str) -> Dict[str, Any]:
+        path = self.stats_path / f"{name}.json"
+        try:
+            return cast(Dict[str, Any], json.loads(path.read_text(encoding="utf-8")))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"files": {}}
+
+    def _update_stats(self, name: str, changes: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        """Apply `{relative path: entry}` changes to the index; a None entry removes the file."""
+        if not changes:
+            return
+        self.stats_path.mkdir(parents=True, exist_ok=True)
+        with self._dataset_lock(name, exclusive=True, kind="stats"):
+            index = self._read_stats(name)
+            files = index.setdefault("files", {})
+            for rel, entry in changes.items():
+                if entry is None:
+                    files.pop(rel, None)
+                else:
+                    files[rel] = entry
+            _write_json_atomic(self.stats_path / f"{name}.json", index)
+
+    def _stats_key(self, name: str, path: Path) -> str:
+        return path.relative_to(self.datasets_path / name).as_posix()
+
+    def dataset_stats(self, name: str) -> DatasetStats:
+        """Totals from the statistics index alone; no data file is opened or stat'ed."""
+        files = self._read_stats(name).get("files", {})
+        return DatasetStats(
+            name=name,
+            files=len(files),
+            rows=sum(e.get("rows", 0) for e in files.values()),
+            bytes=sum(e.get("bytes", 0) for e in files.values()),
+        )
+
+    def reindex(self, name: str) -> DatasetStats:
+        """Rebuild the statistics index of `name` by reading every file once."""
+        datasets = self.list_datasets()
+        if name not in datasets:
+            raise KeyError(f"Dataset '{name}' not registered")
+        fmt = datasets[name].format
+        changes: Dict[str, Optional[Dict[str, Any]]] = {
+            rel: None for rel in self._read_stats(name).get("files", {})
+        }
+        with self._dataset_lock(name):
+            for p in self._dataset_files(name, fmt):
+                if fmt == "parquet":
+                    rows, cols = parquet_stats(p)
+                else:
+                    df = pd.concat(list(self._iter_file(p, fmt, [], DEFAULT_BATCH_ROWS)))
+                    rows, cols = len(df), frame_stats(df)
+                changes[self._stats_key(name, p)] = file_entry(p, rows, cols)
+        self._update_stats(name, changes)
+        return self.dataset_stats(name)
+
     # Paths and IO
     def dataset_dir(self, name: str, partition: Optional[Dict[str, str]] = None) -> Path:
         d = self.datasets_path / name
@@ -116,29 +932,46 @@ class Warehouse:
         except Exception:
             return False
 
-    def write_df(
+    def _prepare_write(
         self,
         name: str,
-        df: pd.DataFrame,
-        *,
-        format: Optional[str] = None,
-        partition: Optional[Dict[str, str]] = None,
-        filename: Optional[str] = None,
-        mode: str = "append",
-    ) -> Path:
-        datasets = self.list_datasets()
-        ds = datasets.get(name) or self.register_dataset(
-            name, format=format or DEFAULT_DATASET_FORMAT
+        format: Optional[str],
+        keys: List[str],
+    ) -> str:
+        """Resolve the write format, registering `name` on first write and checking keys."""
+        ds = self.list_datasets().get(name) or self.register_dataset(
+            name, format=format or DEFAULT_DATASET_FORMAT, partitioning=keys
         )
+        if ds.partitioning and keys != ds.partitioning:
+            raise ValueError(
+                f"Dataset '{name}' is partitioned by {ds.partitioning}; got {keys or 'none'}"
+            )
         fmt = format or ds.format
         if fmt == "parquet" and not self._parquet_available():
             raise RuntimeError(
                 "Parquet requested but pyarrow not installed. Install with `uv add pyarrow`."
             )
+        return fmt
+
+    def _write_file(
+        self,
+        name: str,
+        df: pd.DataFrame,
+        fmt: str,
+        partition: Optional[Dict[str, str]],
+        filename: Optional[str],
+        mode: str,
+    ) -> Tuple[Path, Optional[Dict[str, Any]]]:
+        """Write one file and return it with its statistics entry (index not updated)."""
         target_dir = self.dataset_dir(name, partition)
         if filename is None:
             filename = f"batch_{_now_stamp()}" + self._ext_for_format(fmt)
         path = target_dir / filename
+        appending = fmt == "csv" and mode == "append" and path.exists()
+        prior = (
+            self._read_stats(name)["files"].get(self._stats_key(name, path)) if appending else None
+        )
+        prior_ok = entry_is_current(prior, path)
 
         if fmt == "csv":
             header = True
@@ -151,87 +984,1612 @@ class Warehouse:
             df.to_parquet(path, index=False)
         else:
             raise ValueError(f"Unsupported format: {fmt}")
+
+        entry: Optional[Dict[str, Any]] = file_entry(path, len(df), frame_stats(df))
+        if appending:
+            if prior is not None and entry is not None and prior_ok:
+                entry["rows"] += prior["rows"]
+                entry["columns"] = merge_stats(prior["columns"], entry["columns"])
+            else:
+                entry = None  # file predates the index; leave it unindexed
+        return path, entry
+
+    @overload
+    def write_df(
+        self,
+        name: str,
+        df: pd.DataFrame,
+        *,
+        format: Optional[str] = None,
+        partition: Optional[Dict[str, str]] = None,
+        filename: Optional[str] = None,
+        mode: str = "append",
+        partition_by: None = None,
+        max_workers: Optional[int] = None,
+    ) -> Path: ...
+
+    @overload
+    def write_df(
+        self,
+        name: str,
+        df: pd.DataFrame,
+        *,
+        format: Optional[str] = None,
+        partition: Optional[Dict[str, str]] = None,
+        filename: Optional[str] = None,
+        mode: str = "append",
+        partition_by: List[str],
+        max_workers: Optional[int] = None,
+    ) -> List[Path]: ...
+
+    def write_df(
+        self,
+        name: str,
+        df: pd.DataFrame,
+        *,
+        format: Optional[str] = None,
+        partition: Optional[Dict[str, str]] = None,
+        filename: Optional[str] = None,
+        mode: str = "append",
+        partition_by: Optional[List[str]] = None,
+        max_workers: Optional[int] = None,
+    ) -> Path | List[Path]:
+        """Write a DataFrame as a new batch file and return its path.
+
+        - `partition` writes the whole frame to one `key=value/...` directory.
+        - `partition_by` instead groups the frame by those columns and writes each
+          group to its own directory concurrently (`max_workers` threads), dropping the
+          partition columns from the payload; returns the written paths.
+        - A dataset registered with `partitioning` only accepts exactly those keys, in
+          order. A new dataset is registered with the keys of its first write.
+        """
+        if partition_by is not None:
+            if partition:
+                raise ValueError("Pass either `partition` or `partition_by`, not both")
+            return self._write_partitioned(
+                name, df, partition_by, format=format, filename=filename, max_workers=max_workers
+            )
+        fmt = self._prepare_write(name, format, list(partition or {}))
+        path, entry = self._write_file(name, df, fmt, partition, filename, mode)
+        self._update_stats(name, {self._stats_key(name, path): entry})
         return path
 
-    def read_df(
+    def _write_partitioned(
+        self,
+        name: str,
+        df: pd.DataFrame,
+        partition_by: List[str],
+        *,
+        format: Optional[str],
+        filename: Optional[str],
+        max_workers: Optional[int],
+    ) -> List[Path]:
+        missing = [c for c in partition_by if c not in df.columns]
+        if not partition_by or missing:
+            raise ValueError(f"partition_by columns not in frame: {missing or partition_by}")
+        fmt = self._prepare_write(name, format, list(partition_by))
+        payload_cols = [c for c in df.columns if c not in partition_by]
+        jobs = []
+        for key, group in df.groupby(partition_by, dropna=False, sort=True):
+            values = key if isinstance(key, tuple) else (key,)
+            part = {k: _partition_value(v) for k, v in zip(partition_by, values)}
+            jobs.append((part, group[payload_cols].reset_index(drop=True)))
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(self._write_file, name, g, fmt, part, filename, "overwrite")
+                for part, g in jobs
+            ]
+            written = [f.result() for f in futures]
+        self._update_stats(name, {self._stats_key(name, p): e for p, e in written})
+        return [p for p, _ in written]
+
+    def write_arrow(
         self,
         name: str,
+        data: Any,
         *,
         format: Optional[str] = None,
         partition: Optional[Dict[str, str]] = None,
+        filename: Optional[str] = None,
+        batch_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    ) -> Path:
+        """Write Arrow data as a new batch file without converting to pandas.
+
+        `data` may be a `pyarrow.Table`, a `RecordBatch`, a `RecordBatchReader`, an
+        iterable of RecordBatches or a DuckDB relation; it is streamed batch by batch.
+        Parquet output is buffered into row groups of `batch_rows` rows. The file is
+        written under a `.tmp` name and renamed once complete.
+        """
+        fmt = self._prepare_write(name, format, list(partition or {}))
+        if not self._parquet_available():
+            raise RuntimeError("Arrow ingest requires pyarrow. Install with `uv add pyarrow`.")
+        schema, batches = _arrow_batches(data, batch_rows)
+        target_dir = self.dataset_dir(name, partition)
+        stamp = f"batch_{_now_stamp()}"
+        path = target_dir / (filename or stamp + self._ext_for_format(fmt))
+        tmp = path.with_name(path.name + TMP_SUFFIX)
+        rows = 0
+        cols: ColumnStats = {}
+
+        def counted(with_stats: bool) -> Iterator[Any]:
+            nonlocal rows, cols
+            for b in batches:
+                rows += b.num_rows
+                if with_stats:
+                    cols = merge_stats(cols, arrow_stats(b)) if cols else arrow_stats(b)
+                yield b
+
+        try:
+            if fmt == "parquet":
+                import pyarrow.parquet as pq
+
+                names = _write_parquet_files(
+                    counted(False),
+                    schema,
+                    target_dir,
+                    stamp,
+                    target_bytes=sys.maxsize,
+                    row_group_rows=batch_rows,
+                )
+                if names:
+                    os.replace(target_dir / (names[0] + TMP_SUFFIX), tmp)
+                else:
+                    pq.write_table(schema.empty_table(), str(tmp))
+            elif fmt == "csv":
+                import pyarrow.csv as pacsv
+
+                with pacsv.CSVWriter(str(tmp), schema) as writer:
+                    for b in counted(True):
+                        writer.write_batch(b)
+            elif fmt == "jsonl":
+                with tmp.open("w", encoding="utf-8") as f:
+                    for b in counted(True):
+                        for rec in b.to_pylist():
+                            f.write(json.dumps(rec, default=str) + "\n")
+            else:
+                raise ValueError(f"Unsupported format: {fmt}")
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        if fmt == "parquet":
+            rows, cols = parquet_stats(path)
+        self._update_stats(name, {self._stats_key(name, path): file_entry(path, rows, cols)})
+        return path
+
+    def writer(
+        self,
+        name: str,
+        *,
+        partition_by: Optional[List[str]] = None,
+        partition: Optional[Dict[str, str]] = None,
+        flush_rows: int = DEFAULT_ROW_GROUP_ROWS,
+        flush_bytes: int = DEFAULT_FLUSH_BYTES,
+        max_file_bytes: int = DEFAULT_TARGET_FILE_BYTES,
+    ) -> DatasetWriter:
+        """Open a buffered Parquet writer for incremental ingest.
+
+        ```
+        with wh.writer("events", partition_by=["date"]) as w:
+            for rows in source:
+                w.append(rows)
+        ```
+
+        Appended rows are buffered per partition and flushed as row groups into one open
+        file per partition; see `DatasetWriter`.
+        """
+        return DatasetWriter(
+            self,
+            name,
+            partition_by=partition_by,
+            partition=partition,
+            flush_rows=flush_rows,
+            flush_bytes=flush_bytes,
+            max_file_bytes=max_file_bytes,
+        )
+
+    def iter_batches(
+        self,
+        name: str,
+        *,
+        batch_rows: int = DEFAULT_BATCH_ROWS,
+        columns: Optional[List[str]] = None,
+        format: Optional[str] = None,
+        partition: Optional[Dict[str, str]] = None,
+        filters: Optional[List[Filter]] = None,
         limit: Optional[int] = None,
-    ) -> pd.DataFrame:
+        arrow: bool = False,
+    ) -> Iterator[Any]:
+        """Stream a dataset file by file in batches of at most `batch_rows` rows.
+
+        Parquet files are scanned row group by row group; CSV/JSONL files are parsed
+        in chunks. Yields DataFrames, or `pyarrow.RecordBatch`es with `arrow=True`.
+        Iteration stops as soon as `limit` rows have been produced, so peak memory is
+        bounded by the batch size rather than the dataset size. The dataset's shared
+        lock is held until the iterator is exhausted or closed.
+
+        - `columns` selects (and orders) output columns; partition keys may be included.
+          Only these columns (plus any filter columns) are read from the files.
+        - `partition` pins one exact partition directory.
+        - `filters` are ANDed `(column, op, value)` predicates with op in
+          `= == != < <= > >= in, not in`. Filters on partition keys prune whole
+          directories before any file is opened; filters on regular columns skip files
+          whose indexed min/max ranges cannot match, are pushed into the Parquet scanner
+          and applied to CSV/JSONL chunks after parsing.
+        - Partition keys are returned as (string) columns, mirroring the `ds_<name>` views.
+        """
         datasets = self.list_datasets()
         if name not in datasets:
             raise KeyError(f"Dataset '{name}' not registered")
         fmt = format or datasets[name].format
-        base = self.dataset_dir(name, partition)
-        files = sorted([p for p in base.glob(f"**/*{self._ext_for_format(fmt)}") if p.is_file()])
-        if not files:
+        filters = list(filters or [])
+        _validate_filters(filters)
+        if batch_rows <= 0:
+            raise ValueError("batch_rows must be positive")
+        if (fmt == "parquet" or arrow) and not self._parquet_available():
+            raise RuntimeError(
+                "Parquet requested but pyarrow not installed. Install with `uv add pyarrow`."
+            )
+        remaining = limit
+        if remaining is not None and remaining <= 0:
+            return
+        root = self.datasets_path / name
+        index = self._read_stats(name).get("files", {}) if filters else {}
+        with self._dataset_lock(name):
+            for p in self._dataset_files(name, fmt, partition, filters):
+                part = _hive_partition(p.relative_to(root))
+                if not all(
+                    _match_value(_coerce_like(part[col], value), op, value)
+                    for col, op, value in filters
+                    if col in part
+                ):
+                    continue
+                row_filters = [f for f in filters if f[0] not in part]
+                entry = index.get(self._stats_key(name, p))
+                if row_filters and can_skip(entry, p, row_filters):
+                    continue
+                read_cols = _file_columns(columns, part, row_filters, fmt)
+                for batch in self._iter_file(p, fmt, row_filters, batch_rows, read_cols):
+                    if remaining is not None and len(batch) > remaining:
+                        batch = (
+                            batch[:remaining]
+                            if isinstance(batch, pd.DataFrame)
+                            else batch.slice(0, remaining)
+                        )
+                    if len(batch) == 0:
+                        continue
+                    yield _finish_batch(batch, part, columns, arrow)
+                    if remaining is not None:
+                        remaining -= len(batch)
+                        if remaining <= 0:
+                            return
+
+    def read_df(
+        self,
+        name: str,
+        *,
+        format: Optional[str] = None,
+        partition: Optional[Dict[str, str]] = None,
+        filters: Optional[List[Filter]] = None,
+        columns: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """Read a dataset into a DataFrame (see `iter_batches` for the options).
+
+        With `limit`, reading stops once enough rows are collected.
+        """
+        batch_rows = DEFAULT_BATCH_ROWS if limit is None else max(1, min(limit, DEFAULT_BATCH_ROWS))
+        frames = list(
+            self.iter_batches(
+                name,
+                batch_rows=batch_rows,
+                columns=columns,
+                format=format,
+                partition=partition,
+                filters=filters,
+                limit=limit,
+            )
+        )
+        if not frames:
             return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def _iter_file(
+        self,
+        path: Path,
+        fmt: str,
+        row_filters: List[Filter],
+        batch_rows: int,
+        read_cols: Optional[List[str]] = None,
+    ) -> Iterator[Any]:
+        """Yield DataFrames or RecordBatches from one file, reading only `read_cols`.
+
+        Parquet reads just the selected column chunks and CSV skips converting other
+        columns. JSONL is always parsed by pandas (so values get the same types with or
+        without a projection) and unselected columns are dropped chunk by chunk.
+        """
+        if fmt == "parquet":
+            import pyarrow.dataset as pads
+
+            dataset = pads.dataset(str(path), format="parquet")
+            scanner = dataset.scanner(
+                columns=read_cols,
+                filter=_arrow_expression(row_filters, dataset.schema),
+                batch_size=batch_rows,
+            )
+            yield from scanner.to_batches()
+            return
+        if fmt == "csv":
+            reader = pd.read_csv(path, chunksize=batch_rows, usecols=read_cols)
+        elif fmt == "jsonl":
+            reader = pd.read_json(path, lines=True, chunksize=batch_rows)
+        else:
+            raise ValueError(f"Unsupported format: {fmt}")
+        with reader:
+            for chunk in reader:
+                if row_filters:
+                    chunk = chunk[_filter_mask(chunk, row_filters)]
+                if fmt == "jsonl" and read_cols:
+                    chunk = chunk[[c for c in read_cols if c in chunk.columns]]
+                yield chunk.reset_index(drop=True)
+
+    def _dataset_files(
+        self,
+        name: str,
+        fmt: str,
+        partition: Optional[Dict[str, str]] = None,
+        filters: Optional[List[Filter]] = None,
+        match: PartitionMatcher = _partition_matches,
+    ) -> List[Path]:
+        """Data files of `name` (under one `partition` if given), in path order.
+
+        A `key=value` directory failing one of the `filters` on `key` (as judged by
+        `match`) is skipped without being listed, so reading a few partitions does not
+        walk the whole history of the dataset.
+        """
+        base = self.datasets_path / name
+        for k, v in (partition or {}).items():
+            base = base / f"{k}={v}"
+        ext = self._ext_for_format(fmt)
+        by_key: Dict[str, List[Filter]] = {}
+        for f in filters or []:
+            by_key.setdefault(f[0], []).append(f)
+        files = set()
+        markers = []
+        pending = [base]
+        while pending:
+            try:
+                entries = list(os.scandir(pending.pop()))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    key, eq, raw = entry.name.partition("=")
+                    if eq and not all(match(raw, op, v) for _, op, v in by_key.get(key, ())):
+                        continue
+                    pending.append(Path(entry.path))
+                elif entry.name == COMPACTION_MARKER:
+                    markers.append(Path(entry.path))
+                elif entry.name.endswith(ext) and entry.is_file():
+                    files.add(Path(entry.path))
+        # A marker left by an interrupted compaction: its plan is already committed
+        for marker in markers:
+            plan = json.loads(marker.read_text(encoding="utf-8"))
+            files -= {marker.parent / n for n in plan["remove"]}
+            for n in plan["add"]:
+                final = marker.parent / n
+                files.add(final if final.exists() else final.with_name(n + TMP_SUFFIX))
+        return sorted(files)
 
-        frames = []
+    def _files_signature(self, files: List[Path]) -> FileSignature:
+        sig = []
         for p in files:
+            st = p.stat()
+            sig.append((str(p.relative_to(self.datasets_path)), st.st_size, st.st_mtime_ns))
+        return tuple(sig)
+
+    # Compaction
+    def _apply_compaction(self, marker: Path) -> None:
+        """Roll a committed compaction plan forward (idempotent)."""
+        plan = json.loads(marker.read_text(encoding="utf-8"))
+        d = marker.parent
+        for n in plan["remove"]:
+            (d / n).unlink(missing_ok=True)
+        for n in plan["add"]:
+            tmp = d / (n + TMP_SUFFIX)
+            if tmp.exists():
+                os.replace(tmp, d / n)
+        marker.unlink()
+
+    def _recover_compactions(self, name: str) -> None:
+        """Finish interrupted compactions and drop uncommitted compaction output."""
+        base = self.datasets_path / name
+        markers = list(base.glob(f"**/{COMPACTION_MARKER}"))
+        if markers:
+            with self._dataset_lock(name, exclusive=True):
+                for marker in markers:
+                    logger.warning(f"Completing interrupted compaction: {marker.parent}")
+                    self._apply_compaction(marker)
+        for tmp in base.glob(f"**/compact_*{TMP_SUFFIX}"):
+            tmp.unlink(missing_ok=True)
+
+    def compact(
+        self,
+        name: str,
+        *,
+        partition: Optional[Dict[str, str]] = None,
+        target_bytes: int = DEFAULT_TARGET_FILE_BYTES,
+        row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    ) -> CompactionReport:
+        """Merge each partition's small Parquet files into a few files of ~`target_bytes`.
+
+        Files at or above `target_bytes` are left alone. New files are written with a
+        `.tmp` suffix, then a commit marker is written and the old/new files are swapped
+        under the dataset's exclusive lock. A crash after the marker is written is
+        completed by the next `compact`; one before it leaves the old files untouched.
+        """
+        datasets = self.list_datasets()
+        if name not in datasets:
+            raise KeyError(f"Dataset '{name}' not registered")
+        if datasets[name].format != "parquet":
+            raise ValueError(
+                f"Dataset '{name}' is stored as {datasets[name].format}; "
+                "compaction rewrites Parquet datasets only (see `warehouse convert`)."
+            )
+        if not self._parquet_available():
+            raise RuntimeError(
+                "Parquet requested but pyarrow not installed. Install with `uv add pyarrow`."
+            )
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        report = CompactionReport(name=name)
+        self._check_lock(name)
+        with self._dataset_lock(name, exclusive=True, kind="maintenance"):
+            self._recover_compactions(name)
+            by_dir: Dict[Path, List[Path]] = {}
+            for p in self._dataset_files(name, "parquet", partition):
+                by_dir.setdefault(p.parent, []).append(p)
+            for d, files in sorted(by_dir.items()):
+                sizes = {p: p.stat().st_size for p in files}
+                report.files_before += len(files)
+                report.bytes_before += sum(sizes.values())
+                small = [p for p in files if sizes[p] < target_bytes]
+                if len(small) < 2:
+                    report.files_after += len(files)
+                    report.bytes_after += sum(sizes.values())
+                    continue
+                schema = pa.unify_schemas(
+                    [pq.read_schema(p) for p in small], promote_options="permissive"
+                )
+                batches = (b for p in small for b in pq.ParquetFile(p).iter_batches(row_group_rows))
+                prefix = f"compact_{_now_stamp()}"
+                with _discard_uncommitted(d, prefix) as commit:
+                    added = _write_parquet_files(
+                        batches,
+                        schema,
+                        d,
+                        prefix,
+                        target_bytes=target_bytes,
+                        row_group_rows=row_group_rows,
+                    )
+                    marker = d / COMPACTION_MARKER
+                    with self._dataset_lock(name, exclusive=True):
+                        _write_json_atomic(
+                            marker, {"add": added, "remove": [p.name for p in small]}
+                        )
+                        commit()
+                        self._apply_compaction(marker)
+                changes: Dict[str, Optional[Dict[str, Any]]] = {
+                    self._stats_key(name, p): None for p in small
+                }
+                for n in added:
+                    rows, cols = parquet_stats(d / n)
+                    changes[self._stats_key(name, d / n)] = file_entry(d / n, rows, cols)
+                self._update_stats(name, changes)
+                kept = [p for p in files if p not in small] + [d / n for n in added]
+                report.partitions += 1
+                report.files_after += len(kept)
+                report.bytes_after += sum(p.stat().st_size for p in kept)
+                report.rewritten.append(str(d.relative_to(self.datasets_path)))
+        return report
+
+    # Row removal
+    def _rewrite_without(
+        self, path: Path, fmt: str, drop: Set[int], new_name: str
+    ) -> Tuple[int, int]:
+        """Write `path` minus the rows at positions `drop` to `new_name` + `.tmp`.
+
+        Returns (rows kept, rows before); nothing is written when no row is kept.
+        """
+        tmp = path.parent / (new_name + TMP_SUFFIX)
+        if fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            pf = pq.ParquetFile(path)
+            meta = pf.metadata
+            codec = (
+                meta.row_group(0).column(0).compression.lower()
+                if meta.num_row_groups and meta.num_columns
+                else "snappy"
+            )
+            kept = 0
+
+            def batches() -> Iterator[Any]:
+                nonlocal kept
+                offset = 0
+                for b in pf.iter_batches(DEFAULT_ROW_GROUP_ROWS):
+                    mask = [offset + i not in drop for i in range(b.num_rows)]
+                    offset += b.num_rows
+                    out = b.filter(pa.array(mask))
+                    kept += out.num_rows
+                    yield out
+
+            names = _write_parquet_files(
+                batches(),
+                pf.schema_arrow,
+                path.parent,
+                new_name.removesuffix(".parquet"),
+                target_bytes=sys.maxsize,
+                row_group_rows=DEFAULT_ROW_GROUP_ROWS,
+                compression=codec if codec in PARQUET_CODECS else "snappy",
+            )
+            if names:
+                os.replace(path.parent / (names[0] + TMP_SUFFIX), tmp)
+            return kept, meta.num_rows
+        if fmt == "csv":
+            df = pd.read_csv(path)
+        elif fmt == "jsonl":
+            df = pd.read_json(path, lines=True)
+        else:
+            raise ValueError(f"Unsupported format: {fmt}")
+        total = len(df)
+        df = df[[i not in drop for i in range(total)]]
+        if len(df):
             if fmt == "csv":
-                frames.append(pd.read_csv(p))
-            elif fmt == "jsonl":
-                frames.append(pd.read_json(p, lines=True))
-            elif fmt == "parquet":
-                if not self._parquet_available():
-                    raise RuntimeError(
-                        "Parquet requested but pyarrow not installed. "
-                        "Install with `uv add pyarrow`."
+                df.to_csv(tmp, index=False)
+            else:
+                df.to_json(tmp, orient="records", lines=True)
+        return len(df), total
+
+    def drop_rows(self, name: str, rows: Mapping[Path, Iterable[int]]) -> int:
+        """Rewrite dataset files without the given 0-based row positions; returns rows removed.
+
+        Positions count rows in file order, as `iter_batches` yields them. Each rewritten
+        file is swapped in like a compaction (commit marker under the exclusive lock), so
+        readers see the old or the new file and an interrupted run is completed by the
+        next maintenance command. A file that loses every row is deleted.
+        """
+        datasets = self.list_datasets()
+        if name not in datasets:
+            raise KeyError(f"Dataset '{name}' not registered")
+        fmt = datasets[name].format
+        removed = 0
+        self._check_lock(name)
+        with self._dataset_lock(name, exclusive=True, kind="maintenance"):
+            self._recover_compactions(name)
+            for path, positions in sorted(rows.items()):
+                drop = set(positions)
+                if not drop or not path.exists():
+                    continue
+                d = path.parent
+                prefix = f"compact_{_now_stamp()}"
+                new_name = prefix + self._ext_for_format(fmt)
+                with _discard_uncommitted(d, prefix) as commit:
+                    kept, total = self._rewrite_without(path, fmt, drop, new_name)
+                    added = [new_name] if kept else []
+                    marker = d / COMPACTION_MARKER
+                    with self._dataset_lock(name, exclusive=True):
+                        _write_json_atomic(marker, {"add": added, "remove": [path.name]})
+                        commit()
+                        self._apply_compaction(marker)
+                changes: Dict[str, Optional[Dict[str, Any]]] = {self._stats_key(name, path): None}
+                if added:
+                    new = d / new_name
+                    if fmt == "parquet":
+                        n, cols = parquet_stats(new)
+                    else:
+                        df = pd.read_csv(new) if fmt == "csv" else pd.read_json(new, lines=True)
+                        n, cols = len(df), frame_stats(df)
+                    changes[self._stats_key(name, new)] = file_entry(new, n, cols)
+                self._update_stats(name, changes)
+                removed += total - kept
+        return removed
+
+    def dedupe(
+        self,
+        name: str,
+        *,
+        columns: Iterable[str] = DEFAULT_TEXT_COLUMNS,
+        key_column: str = "url",
+        threshold: float = DEFAULT_THRESHOLD,
+        dry_run: bool = False,
+    ) -> DedupeReport:
+        """Collapse rows of `name` whose `columns` text is a near-duplicate of an earlier row.
+
+        Rows are visited in file order (partition path, then batch file name, so oldest
+        first) and compared by MinHash; the first row of each group is kept and the
+        others are removed with `drop_rows`. The near-duplicate index ingest uses
+        (`dedupe/<name>.sqlite`) is rebuilt from the surviving rows. `dry_run` only counts.
+        """
+        start = time.perf_counter()
+        ds = self.list_datasets().get(name)
+        if ds is None:
+            raise KeyError(f"Dataset '{name}' not registered")
+        columns = list(columns)
+        report = DedupeReport(name=name)
+        drop: Dict[Path, List[int]] = {}
+        path = index_path(self.base_path, name)
+        scratch = path.with_name(path.name + ".rebuild")
+        remove_index(scratch)
+        with self._dataset_lock(name), NearDupIndex(scratch, threshold=threshold) as index:
+            for f in self._dataset_files(name, ds.format):
+                offset = 0
+                for chunk in self._iter_file(f, ds.format, [], DEFAULT_BATCH_ROWS):
+                    df = chunk if isinstance(chunk, pd.DataFrame) else chunk.to_pandas()
+                    present = [c for c in columns if c in df.columns]
+                    texts = [
+                        page_text(*(None if pd.isna(v) else str(v) for v in row))
+                        for row in df[present].itertuples(index=False, name=None)
+                    ]
+                    keys = (
+                        df[key_column].astype(str).tolist()
+                        if key_column in df.columns
+                        else [f"{f.name}:{offset + i}" for i in range(len(df))]
                     )
-                frames.append(pd.read_parquet(p))
-        df = pd.concat(frames, ignore_index=True)
-        if limit is not None:
-            df = df.head(limit)
-        return df
+                    for i, match in enumerate(index.check(texts, keys)):
+                        if match is not None:
+                            drop.setdefault(f, []).append(offset + i)
+                    offset += len(df)
+                report.rows += offset
+        report.duplicates = sum(len(v) for v in drop.values())
+        report.files = len(drop)
+        if dry_run:
+            remove_index(scratch)
+        else:
+            report.removed = self.drop_rows(name, drop)
+            remove_index(path)
+            scratch.replace(path)
+        report.seconds = time.perf_counter() - start
+        return report
+
+    # Full-text search
+    def search(
+        self,
+        name: str,
+        query: str,
+        *,
+        columns: Iterable[str] = DEFAULT_SEARCH_COLUMNS,
+        key_column: str = "url",
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        raw: bool = False,
+    ) -> pd.DataFrame:
+        """BM25-ranked rows of `name` whose `columns` text matches `query`.
+
+        The full-text index (`search/<name>.sqlite`) is brought up to date first: only
+        batch files added or rewritten since the last search are read, and rows of
+        removed files are dropped. By default every word of `query` must appear
+        (stemmed, any order); `raw=True` passes it through as FTS5 syntax
+        (`"exact phrase"`, `OR`, `NOT`, `title:word`, `prefix*`).
+        """
+        ds = self.list_datasets().get(name)
+        if ds is None:
+            raise KeyError(f"Dataset '{name}' not registered")
+        match = query if raw else fts_query(query)
+        if not match:
+            raise ValueError("Search query has no words")
+        base = self.datasets_path / name
+        with self._dataset_lock(name):
+            files = self._dataset_files(name, ds.format)
+            with TextIndex(search_index_path(self.base_path, name), list(columns)) as index:
+                keys = []
+                for f in files:
+                    st = f.stat()
+                    keys.append((f.relative_to(base).as_posix(), st.st_size, st.st_mtime_ns))
+
+                def read(rel: str) -> Iterator[pd.DataFrame]:
+                    for chunk in self._iter_file(base / rel, ds.format, [], DEFAULT_BATCH_ROWS):
+                        yield chunk if isinstance(chunk, pd.DataFrame) else chunk.to_pandas()
+
+                start = time.perf_counter()
+                synced = index.sync(keys, read, key_column=key_column)
+                if synced.files_added or synced.files_removed:
+                    logger.info(
+                        f"Search index for '{name}': indexed {synced.rows_added} rows from "
+                        f"{synced.files_added} file(s), dropped {synced.files_removed} "
+                        f"file(s) in {time.perf_counter() - start:.2f}s"
+                    )
+                return index.search(match, limit=limit)
+
+    # Format conversion
+    def _scan_seconds(self, fmt: str, files: List[Path]) -> float:
+        """Wall time of a full DuckDB scan over `files` (what a `ds_<name>` query pays)."""
+        if not files:
+            return 0.0
+        source = "[" + ", ".join(_sql_str(str(p.resolve())) for p in files) + "]"
+        con = duckdb.connect()
+        try:
+            start = time.perf_counter()
+            reader = _arrow_reader(
+                con.sql(f"SELECT * FROM {_scan_sql(fmt, source, hive=False, union=True)}"),
+                DEFAULT_BATCH_ROWS,
+            )
+            for _ in reader:
+                pass
+            return time.perf_counter() - start
+        finally:
+            con.close()
+
+    def _dictionary_columns(self, con: duckdb.DuckDBPyConnection, scan: str) -> List[str]:
+        """Columns to dictionary-encode: everything but high-cardinality strings."""
+        described = con.sql(f"DESCRIBE SELECT * FROM {scan}").fetchall()
+        strings = [str(r[0]) for r in described if str(r[1]) == "VARCHAR"]
+        others = [str(r[0]) for r in described if str(r[1]) != "VARCHAR"]
+        if not strings:
+            return others
+        exprs = ", ".join(f'approx_count_distinct("{c}")' for c in strings)
+        row = con.sql(f"SELECT count(*), {exprs} FROM {scan}").fetchone()
+        total = row[0] if row else 0
+        low = [
+            c for c, n in zip(strings, row[1:] if row else []) if n <= total * DICTIONARY_MAX_RATIO
+        ]
+        return others + low
+
+    def _convert_dir(
+        self,
+        con: duckdb.DuckDBPyConnection,
+        d: Path,
+        files: List[Path],
+        src_fmt: str,
+        to: str,
+        prefix: str,
+        write_opts: Dict[str, Any],
+        row_group_rows: int,
+    ) -> Tuple[List[str], Dict[str, Tuple[int, ColumnStats]]]:
+        """Rewrite one directory's files as `<prefix>_NNNN.<ext>.tmp`.
+
+        Returns the final file names and, for CSV/JSONL output, their rows and stats.
+        Raises RuntimeError when the output does not hold exactly the source rows.
+        """
+        source = "[" + ", ".join(_sql_str(str(p.resolve())) for p in files) + "]"
+        scan = _scan_sql(src_fmt, source, hive=False, union=True)
+        row = con.sql(f"SELECT count(*) FROM {scan}").fetchone()
+        expected = row[0] if row else 0
+        # side queries must run before the stream is opened: a new query on the
+        # connection ends the pending result
+        opts = dict(write_opts)
+        if to == "parquet":
+            opts["use_dictionary"] = self._dictionary_columns(con, scan)
+        reader = _arrow_reader(con.sql(f"SELECT * FROM {scan}"), row_group_rows)
+        stats: Dict[str, Tuple[int, ColumnStats]] = {}
+        if to == "parquet":
+            import pyarrow.parquet as pq
+
+            names = _write_parquet_files(
+                reader,
+                reader.schema,
+                d,
+                prefix,
+                target_bytes=DEFAULT_TARGET_FILE_BYTES,
+                row_group_rows=row_group_rows,
+                **opts,
+            )
+            rows = sum(pq.read_metadata(d / (n + TMP_SUFFIX)).num_rows for n in names)
+        else:
+            names = [f"{prefix}_0000{self._ext_for_format(to)}"]
+            tmp = d / (names[0] + TMP_SUFFIX)
+            rows = 0
+            cols: ColumnStats = {}
+            if to == "csv":
+                import pyarrow.csv as pacsv
+
+                with pacsv.CSVWriter(str(tmp), reader.schema) as writer:
+                    for b in reader:
+                        rows += b.num_rows
+                        cols = merge_stats(cols, arrow_stats(b)) if cols else arrow_stats(b)
+                        writer.write_batch(b)
+            else:
+                with tmp.open("w", encoding="utf-8") as f:
+                    for b in reader:
+                        rows += b.num_rows
+                        cols = merge_stats(cols, arrow_stats(b)) if cols else arrow_stats(b)
+                        for rec in b.to_pylist():
+                            f.write(json.dumps(rec, default=str) + "\n")
+            stats[names[0]] = (rows, cols)
+        if rows != expected:
+            raise RuntimeError(f"Conversion of {d} wrote {rows} of {expected} rows; aborted")
+        return names, stats
+
+    def convert(
+        self,
+        name: str,
+        *,
+        to: str = "parquet",
+        codec: str = "zstd",
+        level: Optional[int] = None,
+        row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    ) -> ConversionReport:
+        """Rewrite every file of `name` in format `to` and switch the manifest to it.
+
+        Files are rewritten directory by directory into `.tmp` files (Parquet with `codec`
+        at `level`, dictionary-encoding low-cardinality strings). Only once every
+        partition succeeded are they renamed into place, the manifest flipped (atomically)
+        and the old files deleted, all under the dataset's exclusive lock; a failure
+        before that leaves the dataset untouched. Converting Parquet to Parquet re-encodes
+        each directory with a compaction-style swap instead. Pause ingest while it runs.
+        """
+        datasets = self.list_datasets()
+        if name not in datasets:
+            raise KeyError(f"Dataset '{name}' not registered")
+        ds = datasets[name]
+        if to not in ("csv", "jsonl", "parquet"):
+            raise ValueError(f"Unsupported format: {to}")
+        if to == ds.format and to != "parquet":
+            raise ValueError(f"Dataset '{name}' is already stored as {to}")
+        if codec not in PARQUET_CODECS:
+            raise ValueError(
+                f"Unsupported codec: {codec} (choose from {', '.join(PARQUET_CODECS)})"
+            )
+        if not self._parquet_available():
+            raise RuntimeError("Conversion requires pyarrow. Install with `uv add pyarrow`.")
+        write_opts: Dict[str, Any] = {"compression": codec}
+        if level is not None:
+            write_opts["compression_level"] = level
+
+        report = ConversionReport(name=name, from_format=ds.format, to_format=to)
+        base = self.datasets_path / name
+        new_ext = self._ext_for_format(to)
+        prefix = f"convert_{_now_stamp()}"
+        self._check_lock(name)
+        with self._dataset_lock(name, exclusive=True, kind="maintenance"):
+            self._recover_compactions(name)
+            # leftovers of an interrupted conversion are never live while the manifest
+            # still names another format
+            stale = list(base.glob(f"**/convert_*{TMP_SUFFIX}"))
+            if to != ds.format:
+                stale += list(base.glob(f"**/convert_*{new_ext}"))
+            for p in stale:
+                p.unlink(missing_ok=True)
+            old_files = self._dataset_files(name, ds.format)
+            by_dir: Dict[Path, List[Path]] = {}
+            for p in old_files:
+                by_dir.setdefault(p.parent, []).append(p)
+            report.files_before = len(old_files)
+            report.bytes_before = sum(p.stat().st_size for p in old_files)
+            report.scan_seconds_before = self._scan_seconds(ds.format, old_files)
+
+            written: Dict[Path, List[str]] = {}
+            committed: Set[Path] = set()  # directories whose swap marker is written
+            text_stats: Dict[Path, Tuple[int, ColumnStats]] = {}
+            con = duckdb.connect()
+            try:
+                for d, files in sorted(by_dir.items()):
+                    names, stats = self._convert_dir(
+                        con, d, files, ds.format, to, prefix, write_opts, row_group_rows
+                    )
+                    written[d] = names
+                    text_stats.update({d / n: st for n, st in stats.items()})
+                    if to == ds.format:
+                        # same format: swap this directory now, like compaction
+                        marker = d / COMPACTION_MARKER
+                        with self._dataset_lock(name, exclusive=True):
+                            _write_json_atomic(
+                                marker, {"add": names, "remove": [p.name for p in files]}
+                            )
+                            committed.add(d)
+                            self._apply_compaction(marker)
+                    report.partitions += 1
+                if to != ds.format:
+                    with self._dataset_lock(name, exclusive=True):
+                        # from the first rename on, the new files are the dataset
+                        committed.update(written)
+                        for d, names in written.items():
+                            for n in names:
+                                os.replace(d / (n + TMP_SUFFIX), d / n)
+                        manifest = self._read_manifest()
+                        manifest["datasets"][name]["format"] = to
+                        self._write_manifest(manifest)
+                        for p in old_files:
+                            p.unlink(missing_ok=True)
+            except BaseException:
+                # a committed swap is completed by recovery; everything else is dropped
+                for d, names in written.items():
+                    if d not in committed:
+                        for n in names:
+                            (d / (n + TMP_SUFFIX)).unlink(missing_ok=True)
+                for p in base.glob(f"**/{prefix}_*{TMP_SUFFIX}"):
+                    if p.parent not in committed:
+                        p.unlink(missing_ok=True)
+                raise
+            finally:
+                con.close()
+
+            new_files = [d / n for d, names in written.items() for n in names]
+            changes: Dict[str, Optional[Dict[str, Any]]] = {
+                self._stats_key(name, p): None for p in old_files
+            }
+            for p in new_files:
+                rows, cols = parquet_stats(p) if to == "parquet" else text_stats[p]
+                report.rows += rows
+                changes[self._stats_key(name, p)] = file_entry(p, rows, cols)
+            self._update_stats(name, changes)
+            report.files_after = len(new_files)
+            report.bytes_after = sum(p.stat().st_size for p in new_files)
+            report.scan_seconds_after = self._scan_seconds(to, new_files)
+        return report
 
     # DuckDB SQL over datasets
-    def sql(self, query: str, register: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    def _connection(self) -> duckdb.DuckDBPyConnection:
+        if self._con is None:
+            self._con = duckdb.connect()
+        return self._con
+
+    def _ensure_view(self, view: str, scan: str, signature: Tuple[Any, ...]) -> None:
+        """(Re)create `view` over `scan` unless the catalog already holds it for `signature`."""
+        if self._views.get(view) == signature:
+            return
+        self._connection().execute(f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM {scan}")
+        self._views[view] = signature
+
+    def _referenced_datasets(self, query: str, datasets: Dict[str, Dataset]) -> List[str]:
+        by_lower = {name.lower(): name for name in datasets}
+        found = []
+        for ref in _VIEW_REF_RE.findall(query):
+            name = by_lower.get(ref.lower())
+            if name and name not in found:
+                found.append(name)
+        return found
+
+    def _select_node(self, query: str) -> Dict[str, Any]:
+        """Parsed AST of a single-statement query (empty when it does not parse)."""
+        try:
+            row = self._connection().execute("SELECT json_serialize_sql(?)", [query]).fetchone()
+            tree = json.loads(row[0]) if row else {}
+        except duckdb.Error:
+            return {}
+        statements = tree.get("statements") or []
+        if tree.get("error") or len(statements) != 1:
+            return {}
+        return cast(Dict[str, Any], statements[0].get("node", {}))
+
+    def _sql_filters(self, query: str) -> List[Filter]:
+        """Top-level WHERE predicates of a single-table SELECT (empty when not applicable).
+
+        Pruning rewrites the shared `ds_<name>` view, so it is only safe when that view
+        is read exactly once: one base table and no subqueries or CTEs anywhere.
+        """
+        node = self._select_node(query)
+        if node.get("type") != "SELECT_NODE":
+            return []
+        if (node.get("from_table") or {}).get("type") != "BASE_TABLE":
+            return []
+        tables = 0
+        for sub in _ast_nodes(node):
+            kind = sub.get("type") or sub.get("class")
+            if kind == "BASE_TABLE":
+                tables += 1
+            elif kind == "SUBQUERY" or sub.get("class") == "SUBQUERY":
+                return []
+            elif (sub.get("cte_map") or {}).get("map"):
+                return []
+        if tables != 1:
+            return []
+        return _where_filters(node.get("where_clause"))
+
+    def _ensure_dataset_view(self, ds: Dataset, filters: Optional[List[Filter]] = None) -> bool:
+        files = self._dataset_files(
+            ds.name, ds.format, filters=filters, match=_sql_partition_may_match
+        )
+        if filters and not files:
+            # no partition can match; one file still lets the view (and the query) bind
+            files = self._dataset_files(ds.name, ds.format)[:1]
+        if not files:
+            return False
+        if filters:
+            index = self._read_stats(ds.name).get("files", {})
+            kept = [
+                p for p in files if not can_skip(index.get(self._stats_key(ds.name, p)), p, filters)
+            ]
+            logger.debug(f"{ds.name}: zone maps skip {len(files) - len(kept)}/{len(files)} files")
+            # keep one file so the view still binds (and yields no rows) when all are skipped
+            files = kept or files[:1]
+        signature = (ds.format, tuple(ds.partitioning or []), self._files_signature(files))
+        self._ensure_view(f"{VIEW_PREFIX}{ds.name}", self._dataset_scan(ds, files), signature)
+        return True
+
+    def _dataset_scan(self, ds: Dataset, files: List[Path]) -> str:
+        source = "[" + ", ".join(_sql_str(str(p.resolve())) for p in files) + "]"
+        # Expose key=value directories as columns only when every file agrees on the keys;
+        # DuckDB then skips files whose partition values fail the query's filters.
+        root = self.datasets_path / ds.name
+        keys = {tuple(_hive_partition(p.relative_to(root))) for p in files}
+        hive = len(keys) == 1 and keys != {()}
+        # `writer()` starts a new file when columns are added or types widen, so Parquet
+        # files of one dataset may differ in schema; match their columns by name
+        return _scan_sql(ds.format, source, hive=hive, union=ds.format == "parquet")
+
+    def _uncacheable(self, query: str, views: List[str]) -> Optional[str]:
+        """Why a query's result cannot be keyed by its sources' files (None if it can)."""
+        node = self._select_node(query)
+        if not node:
+            return "query could not be parsed as a single statement"
+        allowed = {v.lower() for v in views}
+        for sub in _ast_nodes(node):
+            for cte in (sub.get("cte_map") or {}).get("map") or []:
+                allowed.add(str(cte.get("key", "")).lower())
+        for sub in _ast_nodes(node):
+            kind = sub.get("type")
+            if kind == "TABLE_FUNCTION":
+                return "reads a table function"
+            if kind == "BASE_TABLE":
+                table = str(sub.get("table_name", ""))
+                if sub.get("schema_name") or table.lower() not in allowed:
+                    return f"reads {table!r}, which is not a ds_ view"
+            if sub.get("class") == "FUNCTION" and sub.get("function_name") in _VOLATILE_SQL:
+                return f"calls {sub['function_name']}()"
+            if sub.get("class") == "COLUMN_REF" and [
+                str(c).lower() for c in sub.get("column_names") or []
+            ] in ([c] for c in _VOLATILE_SQL):
+                return f"uses {sub['column_names'][0]}"
+        return None
+
+    def _cache_key(
+        self, query: str, datasets: Dict[str, Dataset], register: Optional[Dict[str, str]]
+    ) -> str:
+        """Hash of the normalized query and the files every referenced source resolves to."""
+        sources: Dict[str, Any] = {}
+        for name, ds in datasets.items():
+            sources[f"ds:{name}"] = [
+                ds.to_dict(),
+                self._files_signature(self._dataset_files(name, ds.format)),
+            ]
+        for view, pattern in sorted((register or {}).items()):
+            files = []
+            for f in sorted(glob.glob(pattern, recursive=True)):
+                st = os.stat(f)
+                files.append((f, st.st_size, st.st_mtime_ns))
+            sources[f"glob:{view}"] = [pattern, files]
+        payload = json.dumps({"query": _normalize_sql(query), "sources": sources}, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[pd.DataFrame]:
+        path = self.sql_cache_path / f"{key}.parquet"
+        try:
+            df = pd.read_parquet(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # corrupt or unreadable entry: treat as a miss
+            logger.debug(f"Dropping unreadable SQL cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        os.utime(path)  # mtime doubles as the LRU clock
+        return df
+
+    def _cache_put(self, key: str, df: pd.DataFrame) -> None:
+        self.sql_cache_path.mkdir(parents=True, exist_ok=True)
+        path = self.sql_cache_path / f"{key}.parquet"
+        tmp = path.with_name(path.name + TMP_SUFFIX)
+        try:
+            df.to_parquet(tmp, index=False)
+        except Exception as e:  # e.g. mixed-type object columns Parquet cannot hold
+            tmp.unlink(missing_ok=True)
+            logger.debug(f"SQL result not cached: {e}")
+            return
+        os.replace(tmp, path)
+        self._evict_cache()
+
+    def _evict_cache(self) -> None:
+        """Delete least recently used results until the cache fits `cache_max_bytes`."""
+        entries = []
+        for p in self.sql_cache_path.glob("*.parquet"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries, key=lambda e: e[0]):
+            if total <= self.cache_max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+
+    def clear_sql_cache(self) -> int:
+        """Remove every cached SQL result; returns the number of entries deleted."""
+        removed = 0
+        for p in self.sql_cache_path.glob("*.parquet*"):
+            p.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def sql(
+        self, query: str, register: Optional[Dict[str, str]] = None, *, cache: bool = False
+    ) -> pd.DataFrame:
         """Execute a DuckDB SQL query.
 
-        - Registers each dataset as a view `ds_<name>` scanning files of its default format.
+        - Creates a view `ds_<name>` for each registered dataset referenced by the query,
+          scanning files of its default format. Views persist on the warehouse connection
+          and are rebuilt only when the dataset's manifest entry or files change.
+        - For a single-dataset SELECT, `column op constant` terms of the top-level WHERE
+          drop files whose indexed min/max ranges cannot match before DuckDB scans them.
         - Optionally pass `register` to map additional views to glob paths
           (e.g., {"extra": "path/to/*.parquet"}).
+        - With `cache=True` the result is stored under `cache/sql/` keyed by the normalized
+          query and the paths, sizes and mtimes of every file it reads; an unchanged rerun
+          is served from there. Queries reading anything the key cannot fingerprint (table
+          functions, file paths, other tables) or calling volatile functions such as
+          `now()`/`random()` are always run and never cached.
         """
-        con = duckdb.connect()
-        # Register datasets
-        datasets = self.list_datasets()
-        for name, meta in datasets.items():
-            ext = self._ext_for_format(meta.format)
-            glob = str((self.datasets_path / name / "**" / f"*{ext}").resolve())
-            view = f"ds_{name}"
-            if meta.format == "parquet":
-                con.execute(
-                    f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM read_parquet('{glob}')"
+        with self._lock, ExitStack() as locks:
+            datasets = self.list_datasets()
+            referenced = sorted(self._referenced_datasets(query, datasets))
+            for name in referenced:
+                locks.enter_context(self._dataset_lock(name))
+            key = None
+            if cache:
+                blocker = self._uncacheable(
+                    query, [f"{VIEW_PREFIX}{n}" for n in referenced] + list(register or {})
                 )
-            elif meta.format == "csv":
-                con.execute(
-                    f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM read_csv_auto('{glob}')"
-                )
-            elif meta.format == "jsonl":
-                sql = (
-                    f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM read_json("
-                    f"'{glob}', format='newline_delimited')"
+                if blocker:
+                    logger.debug(f"SQL result not cached: {blocker}")
+                    cache = False
+            if cache:
+                key = self._cache_key(query, {n: datasets[n] for n in referenced}, register)
+                hit = self._cache_get(key)
+                if hit is not None:
+                    self.cache_hits += 1
+                    logger.debug(
+                        f"SQL cache hit {key[:12]} "
+                        f"(hits={self.cache_hits} misses={self.cache_misses})"
+                    )
+                    return hit
+                self.cache_misses += 1
+                logger.debug(
+                    f"SQL cache miss {key[:12]} (hits={self.cache_hits} misses={self.cache_misses})"
                 )
-                con.execute(sql)
+            self._prepare_views(query, datasets, referenced, register)
+            df = self._connection().execute(query).df()
+            if key is not None:
+                self._cache_put(key, df)
+            return df
+
+    def _prepare_views(
+        self,
+        query: str,
+        datasets: Dict[str, Dataset],
+        referenced: List[str],
+        register: Optional[Dict[str, str]],
+    ) -> None:
+        # Zone-map pruning is only safe when one dataset is the whole FROM clause
+        filters = self._sql_filters(query) if len(referenced) == 1 else []
+        for name in referenced:
+            if not self._ensure_dataset_view(datasets[name], filters):
+                logger.warning(f"Dataset '{name}' has no files; view not created")
         # Extra registrations
         if register:
-            for view, glob in register.items():
-                if glob.endswith(".parquet") or glob.endswith("*.parquet"):
-                    con.execute(
-                        f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM read_parquet('{glob}')"
-                    )
-                elif glob.endswith(".csv") or glob.endswith("*.csv"):
-                    con.execute(
-                        f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM read_csv_auto('{glob}')"
-                    )
-                elif glob.endswith(".jsonl") or glob.endswith("*.jsonl"):
-                    sql = (
-                        f"CREATE OR REPLACE VIEW {view} AS SELECT * FROM read_json("
-                        f"'{glob}', format='newline_delimited')"
+            for view, glob_path in register.items():
+                for fmt in ("parquet", "csv", "jsonl"):
+                    if glob_path.endswith(self._ext_for_format(fmt)):
+                        self._ensure_view(
+                            view, _scan_sql(fmt, _sql_str(glob_path)), ("glob", glob_path)
+                        )
+                        break
+
+    def sql_batches(
+        self,
+        query: str,
+        register: Optional[Dict[str, str]] = None,
+        *,
+        batch_rows: int = DEFAULT_BATCH_ROWS,
+    ) -> Iterator[Any]:
+        """Execute a DuckDB SQL query and stream its result as `pyarrow.RecordBatch`es.
+
+        Views are prepared as for `sql`, then the query runs on a cursor of the warehouse
+        connection, so only one batch of at most `batch_rows` rows is materialized in
+        Python at a time. Shared locks on the referenced datasets are held until the
+        iterator is exhausted or closed. Results are never cached.
+        """
+        if batch_rows <= 0:
+            raise ValueError("batch_rows must be positive")
+        with ExitStack() as locks:
+            with self._lock:
+                datasets = self.list_datasets()
+                referenced = sorted(self._referenced_datasets(query, datasets))
+                for name in referenced:
+                    locks.enter_context(self._dataset_lock(name))
+                self._prepare_views(query, datasets, referenced, register)
+                cur = self._connection().cursor()
+            locks.callback(cur.close)
+            yield from _arrow_reader(cur.sql(query), batch_rows)
+
+    # Materialized datasets
+    def _materialized(self, name: str) -> Optional[Dict[str, Any]]:
+        meta = self._read_manifest().get("datasets", {}).get(name) or {}
+        return cast(Optional[Dict[str, Any]], meta.get("materialized"))
+
+    def _save_materialized(self, name: str, definition: Dict[str, Any]) -> None:
+        with self._lock:
+            manifest = self._read_manifest()
+            manifest["datasets"][name]["materialized"] = definition
+            self._write_manifest(manifest)
+
+    def _snapshot_query(
+        self, source: Dataset, query: str, key: Optional[str], watermark: Any
+    ) -> Tuple[Any, Any, int]:
+        """Run `query` over the rows of `source` with `key > watermark` (all rows if None).
+
+        Uses a private connection whose `ds_<source>` view covers only the files whose
+        indexed `key` range reaches past the watermark. Returns the result table, the
+        new watermark (max `key` of the same snapshot) and the number of files scanned.
+        """
+        with self._dataset_lock(source.name):
+            files = self._dataset_files(source.name, source.format)
+            if key is not None and watermark is not None:
+                index = self._read_stats(source.name).get("files", {})
+                # the stored watermark is JSON; give it back the key's type for pruning
+                kinds = {e.get("columns", {}).get(key, {}).get("type") for e in index.values()} - {
+                    None
+                }
+                bound = typed_value(watermark, kinds.pop()) if len(kinds) == 1 else watermark
+                after: List[Filter] = [(key, ">", bound)]
+                files = [
+                    p
+                    for p in files
+                    if not can_skip(index.get(self._stats_key(source.name, p)), p, after)
+                ]
+            if not files:
+                return None, watermark, 0
+            con = duckdb.connect()
+            try:
+                cond = ""
+                if key is not None and watermark is not None:
+                    cond = f" WHERE {_quote_ident(key)} > {_sql_literal(watermark)}"
+                con.execute(
+                    f"CREATE VIEW {VIEW_PREFIX}{source.name} AS "
+                    f"SELECT * FROM {self._dataset_scan(source, files)}{cond}"
+                )
+                result = _arrow_reader(con.sql(query), DEFAULT_BATCH_ROWS).read_all()
+                if key is not None:
+                    row = con.execute(
+                        f"SELECT max({_quote_ident(key)}) FROM {VIEW_PREFIX}{source.name}"
+                    ).fetchone()
+                    latest = row[0] if row else None
+                    if latest is not None:
+                        watermark = latest.isoformat() if hasattr(latest, "isoformat") else latest
+            finally:
+                con.close()
+        return result, watermark, len(files)
+
+    def _merge_results(self, old: Any, delta: Any, plan: List[Optional[str]]) -> Any:
+        """Combine two partial aggregate results column by column according to `plan`."""
+        con = duckdb.connect()
+        try:
+            con.register("old_result", old)
+            con.register("delta_result", delta)
+            types = {r[0]: r[1] for r in con.sql("DESCRIBE SELECT * FROM old_result").fetchall()}
+            select, groups = [], []
+            for col, merge in zip(delta.schema.names, plan):
+                q = _quote_ident(col)
+                if merge is None:
+                    select.append(q)
+                    groups.append(q)
+                else:
+                    select.append(f"CAST({merge}({q}) AS {types[col]}) AS {q}")
+            group_by = f" GROUP BY {', '.join(groups)}" if groups else ""
+            union = "SELECT * FROM old_result UNION ALL BY NAME SELECT * FROM delta_result"
+            merged = con.sql(f"SELECT {', '.join(select)} FROM ({union}){group_by}")
+            return _arrow_reader(merged, DEFAULT_BATCH_ROWS).read_all().cast(old.schema)
+        finally:
+            con.close()
+
+    def _store_result(self, name: str, table: Any) -> Path:
+        """Replace `datasets/<name>/data.parquet` with `table` and index it."""
+        import pyarrow.parquet as pq
+
+        d = self.dataset_dir(name)
+        path = d / "data.parquet"
+        tmp = path.with_name(path.name + TMP_SUFFIX)
+        self._check_lock(name)
+        try:
+            pq.write_table(table, str(tmp), compression="zstd")
+            with self._dataset_lock(name, exclusive=True):
+                os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        rows, cols = parquet_stats(path)
+        self._update_stats(name, {self._stats_key(name, path): file_entry(path, rows, cols)})
+        return path
+
+    def materialize(
+        self, name: str, query: str, *, incremental_key: Optional[str] = None
+    ) -> MaterializeReport:
+        """Register `name` as a Parquet dataset holding the result of `query`, and fill it.
+
+        With `incremental_key` (a column of the single source dataset that only grows as
+        data lands, e.g. an ingest timestamp), later `refresh` calls aggregate just the
+        rows past the stored watermark and merge them into the result. That works for
+        a plain `GROUP BY` whose outputs are group keys and count/sum/min/max; any other
+        query is recomputed in full on refresh. Rows arriving with a key at or below the
+        watermark are not picked up until `refresh(name, full=True)`.
+        """
+        datasets = self.list_datasets()
+        if name in datasets and self._materialized(name) is None:
+            raise ValueError(f"Dataset '{name}' already exists and is not materialized")
+        sources = self._referenced_datasets(query, datasets)
+        if not sources:
+            raise ValueError("Query references no registered dataset (use ds_<name> views)")
+        if name in sources:
+            raise ValueError(f"Materialized dataset '{name}' cannot read from itself")
+        self.register_dataset(name, format="parquet", partitioning=[], overwrite=True)
+        self._save_materialized(
+            name,
+            {
+                "query": query,
+                "sources": sources,
+                "incremental_key": incremental_key,
+                "watermark": None,
+            },
+        )
+        return self.refresh(name, full=True)
+
+    def refresh(self, name: str, *, full: bool = False) -> MaterializeReport:
+        """Bring a materialized dataset up to date (incrementally when possible)."""
+        definition = self._materialized(name)
+        if definition is None:
+            raise KeyError(f"Dataset '{name}' is not a materialized dataset")
+        if not self._parquet_available():
+            raise RuntimeError(
+                "Materialized datasets require pyarrow. Install with `uv add pyarrow`."
+            )
+        query, key = definition["query"], definition.get("incremental_key")
+        datasets = self.list_datasets()
+        sources = self._referenced_datasets(query, datasets)
+        plan = _merge_plan(self._select_node(query)) if key and len(sources) == 1 else None
+        current = self.dataset_dir(name) / "data.parquet"
+        incremental = plan is not None and not full and current.exists()
+        if key and plan is None:
+            logger.info(f"{name}: query does not decompose into mergeable aggregates; full refresh")
+
+        if len(sources) == 1:
+            watermark = definition.get("watermark") if incremental else None
+            result, watermark, scanned = self._snapshot_query(
+                datasets[sources[0]], query, key, watermark
+            )
+        else:
+            import pyarrow as pa
+
+            result = pa.Table.from_pandas(self.sql(query), preserve_index=False)
+            watermark, scanned = (
+                None,
+                sum(len(self._dataset_files(s, datasets[s].format)) for s in sources),
+            )
+
+        report = MaterializeReport(
+            name=name, mode="incremental" if incremental else "full", files_scanned=scanned
+        )
+        if incremental and plan is not None:
+            import pyarrow.parquet as pq
+
+            old = pq.read_table(current)
+            if result is not None and result.num_rows:
+                result = self._merge_results(old, result, plan)
+                self._store_result(name, result)
+            report.rows = (result if result is not None else old).num_rows
+        elif result is not None:
+            self._store_result(name, result)
+            report.rows = result.num_rows
+        else:
+            logger.warning(f"{name}: source has no files; result not written")
+        definition["watermark"] = watermark if key else None
+        self._save_materialized(name, definition)
+        report.watermark = definition["watermark"]
+        return report
+
+
+@dataclass
+class _OpenPartition:
+    dir: Path
+    buffered: List[Any] = field(default_factory=list)
+    rows: int = 0
+    bytes: int = 0
+    writer: Any = None
+    schema: Any = None
+    tmp: Optional[Path] = None
+
+
+class DatasetWriter:
+    """Buffered Parquet writer for a dataset; create it with `Warehouse.writer`.
+
+    - `append` accepts a DataFrame, a list of row dicts or a pyarrow Table/RecordBatch.
+    - Rows are buffered per partition (`partition_by` columns, dropped from the payload,
+      or one fixed `partition`) and written as a row group once `flush_rows` rows or
+      `flush_bytes` bytes are pending.
+    - Each partition has one open `batch_*.parquet.tmp` file; it is renamed into place,
+      and its statistics indexed, when it reaches `max_file_bytes` or the writer closes.
+    - Rows that need a wider schema than the open file's (new columns, a null-only column
+      getting values, int -> float) finish that file and start one with the unified
+      schema; types that cannot be unified raise `ValueError`.
+    - Leaving the `with` block on an exception discards the unfinished files; files
+      already finalized stay.
+    """
+
+    def __init__(
+        self,
+        warehouse: Warehouse,
+        name: str,
+        *,
+        partition_by: Optional[List[str]] = None,
+        partition: Optional[Dict[str, str]] = None,
+        flush_rows: int = DEFAULT_ROW_GROUP_ROWS,
+        flush_bytes: int = DEFAULT_FLUSH_BYTES,
+        max_file_bytes: int = DEFAULT_TARGET_FILE_BYTES,
+    ) -> None:
+        if partition_by is not None and partition:
+            raise ValueError("Pass either `partition` or `partition_by`, not both")
+        if partition_by is not None and not partition_by:
+            raise ValueError("partition_by needs at least one column")
+        self.warehouse = warehouse
+        self.name = name
+        self.partition_by = list(partition_by or [])
+        self.partition = dict(partition or {})
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+        self.max_file_bytes = max_file_bytes
+        keys = self.partition_by or list(self.partition)
+        fmt = warehouse._prepare_write(name, "parquet", keys)
+        registered = warehouse.list_datasets()[name].format
+        if registered != fmt:
+            raise ValueError(
+                f"Dataset '{name}' is registered as {registered}; writer() only writes Parquet "
+                "(see `warehouse convert`)"
+            )
+        self.paths: List[Path] = []
+        self.rows_written = 0
+        self._parts: Dict[Tuple[str, ...], _OpenPartition] = {}
+        self._seq = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> DatasetWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _to_table(self, data: Any) -> Any:
+        import pyarrow as pa
+
+        if isinstance(data, pa.Table):
+            return data
+        if isinstance(data, pa.RecordBatch):
+            return pa.Table.from_batches([data])
+        if isinstance(data, pd.DataFrame):
+            return pa.Table.from_pandas(data, preserve_index=False)
+        if isinstance(data, list):
+            return pa.Table.from_pylist(data)
+        raise TypeError(f"Cannot append {type(data).__name__}; pass a DataFrame, rows or Table")
+
+    def _split(self, table: Any) -> Iterator[Tuple[Dict[str, str], Any]]:
+        """Yield (partition, payload) pairs for an appended table."""
+        import pyarrow.compute as pc
+
+        if not self.partition_by:
+            yield self.partition, table
+            return
+        missing = [c for c in self.partition_by if c not in table.column_names]
+        if missing:
+            raise ValueError(f"partition_by columns not in rows: {missing}")
+        payload = table.drop_columns(self.partition_by)
+        for combo in table.group_by(self.partition_by).aggregate([]).to_pylist():
+            mask = None
+            for k in self.partition_by:
+                v = combo[k]
+                m = pc.is_null(table[k]) if v is None else pc.equal(table[k], v)
+                mask = m if mask is None else pc.and_(mask, m)
+            part = {k: _partition_value(combo[k]) for k in self.partition_by}
+            yield part, payload.filter(mask)
+
+    def append(self, data: Any) -> None:
+        """Buffer rows, flushing every partition whose buffer crossed a threshold."""
+        table = self._to_table(data)
+        if not table.num_rows:
+            return
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("DatasetWriter is closed")
+            for part, payload in self._split(table):
+                key = tuple(part.values())
+                op = self._parts.get(key)
+                if op is None:
+                    op = self._parts[key] = _OpenPartition(
+                        self.warehouse.dataset_dir(self.name, part or None)
                     )
-                    con.execute(sql)
-        return con.execute(query).df()
+                op.buffered.append(payload)
+                op.rows += payload.num_rows
+                op.bytes += payload.nbytes
+                if op.rows >= self.flush_rows or op.bytes >= self.flush_bytes:
+                    self._flush(op)
+
+    def flush(self) -> None:
+        """Write every pending buffer as a row group (files stay open)."""
+        with self._lock:
+            for op in self._parts.values():
+                self._flush(op)
+
+    def _flush(self, op: _OpenPartition) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not op.buffered:
+            return
+        try:
+            table = pa.concat_tables(op.buffered, promote_options="permissive")
+            schema = (
+                table.schema
+                if op.writer is None
+                else pa.unify_schemas([op.schema, table.schema], promote_options="permissive")
+            )
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ValueError(f"Rows appended to '{self.name}' have incompatible types: {e}")
+        op.buffered, op.rows, op.bytes = [], 0, 0
+        if op.writer is not None and not schema.equals(op.schema):
+            # new columns, or a type widened (null -> string, int -> float): the open file
+            # cannot hold these rows, so finish it and start one with the unified schema
+            self._finalize(op)
+        if op.writer is None:
+            self._seq += 1
+            path = op.dir / f"batch_{_now_stamp()}_{self._seq:04d}.parquet"
+            op.tmp = path.with_name(path.name + TMP_SUFFIX)
+            op.schema = schema
+            op.writer = pq.ParquetWriter(str(op.tmp), op.schema)
+        batches = [_conform(b, op.schema) for b in table.to_batches()]
+        op.writer.write_table(pa.Table.from_batches(batches, op.schema))
+        self.rows_written += table.num_rows
+        if op.tmp is not None and op.tmp.stat().st_size >= self.max_file_bytes:
+            self._finalize(op)
+
+    def _finalize(self, op: _OpenPartition) -> None:
+        """Close the partition's open file, rename it into place and index its stats."""
+        if op.writer is None or op.tmp is None:
+            return
+        op.writer.close()
+        path = op.tmp.with_name(op.tmp.name[: -len(TMP_SUFFIX)])
+        os.replace(op.tmp, path)
+        op.writer, op.tmp = None, None
+        rows, cols = parquet_stats(path)
+        wh = self.warehouse
+        wh._update_stats(self.name, {wh._stats_key(self.name, path): file_entry(path, rows, cols)})
+        self.paths.append(path)
+
+    def close(self) -> List[Path]:
+        """Flush all buffers, finalize open files and return every file written."""
+        with self._lock:
+            if not self._closed:
+                for op in self._parts.values():
+                    self._flush(op)
+                    self._finalize(op)
+                self._closed = True
+        return self.paths
+
+    def abort(self) -> None:
+        """Drop buffered rows and delete files that were not finalized yet."""
+        with self._lock:
+            for op in self._parts.values():
+                op.buffered = []
+                if op.writer is not None:
+                    op.writer.close()
+                if op.tmp is not None:
+                    op.tmp.unlink(missing_ok=True)
+                op.writer, op.tmp = None, None
+            self._closed = True